@@ -16,6 +16,8 @@ setuptools.setup(
     install_requires=[
         'pygame',
         'networkx',
+        'numpy',
+        'scipy',
         #'qiskit',  # not including for now, because of hard scikit learn reqirement
         #'qiskit_aqua',
     ],
@@ -31,6 +33,9 @@ setuptools.setup(
     entry_points={
         'console_scripts': [
             'vqe-playground = vqe_playground.command_line:main',
+            'vqe-playground-render = vqe_playground.command_line:render_main',
+            'vqe-playground-serve = vqe_playground.command_line:serve_main',
+            'vqe-playground-bench = vqe_playground.command_line:bench_main',
         ],
     },
 )
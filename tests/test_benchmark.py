@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import copy
+
+import numpy as np
+import pytest
+
+from vqe_playground.solver import generate_corpus, run_benchmark, compare_results, CVaR
+
+
+def test_corpus_is_reproducible_and_shares_instances_across_sizes():
+    corpus = generate_corpus(seed=3, min_nodes=5, max_nodes=7)
+    assert corpus == generate_corpus(seed=3, min_nodes=5, max_nodes=7)
+    assert corpus['instances'] != generate_corpus(seed=4, min_nodes=5, max_nodes=7)['instances']
+
+    smaller = generate_corpus(seed=3, min_nodes=5, max_nodes=6)
+    assert smaller['instances'] == corpus['instances'][:len(smaller['instances'])]
+    for instance in corpus['instances']:
+        adj_matrix = np.array(instance['adj_matrix'])
+        np.testing.assert_array_equal(adj_matrix, adj_matrix.T)
+        assert not np.any(np.diag(adj_matrix))
+
+
+def test_benchmark_records_every_instance():
+    corpus = generate_corpus(seed=0, min_nodes=5, max_nodes=5)
+    run = run_benchmark(corpus, measure_memory=False)
+
+    assert [result['name'] for result in run['results']] == [instance['name'] for instance in corpus['instances']]
+    for result in run['results']:
+        assert 0 < result['approximation_ratio'] <= 1 + 1e-9
+        assert result['evaluations'] > 0
+    assert run['totals']['evaluations'] == sum(result['evaluations'] for result in run['results'])
+
+
+def test_cvar_benchmarks_judge_the_expectation_value():
+    corpus = generate_corpus(seed=0, min_nodes=5, max_nodes=5, families=('erdos_renyi',))
+    plain = run_benchmark(corpus, measure_memory=False)
+    cvar = run_benchmark(corpus, measure_memory=False, cvar=CVaR(0.1, seed=0))
+
+    # The CVaR of the best tenth reaches the optimum long before the expectation value does
+    assert cvar['results'][0]['stop_reason'] == 'target_cost'
+    assert cvar['results'][0]['approximation_ratio'] < plain['results'][0]['approximation_ratio']
+
+
+def test_compare_reports_regressions_beyond_the_threshold():
+    corpus = generate_corpus(seed=0, min_nodes=5, max_nodes=5)
+    baseline = run_benchmark(corpus, measure_memory=False)
+    assert compare_results(baseline, baseline) == []
+
+    current = copy.deepcopy(baseline)
+    current['results'][0]['evaluations'] *= 2
+    current['results'][1]['approximation_ratio'] *= 0.95
+    current['results'][2]['evaluations'] = int(current['results'][2]['evaluations'] * 1.05)
+    del current['results'][-1]
+    regressions = compare_results(baseline, current, threshold=0.1)
+
+    assert {(regression['name'], regression['metric']) for regression in regressions} == {
+        (baseline['results'][0]['name'], 'evaluations'),
+        (baseline['results'][-1]['name'], 'missing'),
+    }
+    assert compare_results(baseline, current, threshold=0.01) != regressions
+
+    current['config'] = dict(current['config'], num_epochs=2)
+    with pytest.raises(ValueError):
+        compare_results(baseline, current)
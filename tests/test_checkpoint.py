@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import numpy as np
+
+from vqe_playground.model.ansatz import hardware_efficient_ansatz
+from vqe_playground.solver import CVaR, OptimizerState, SteppingOptimizer, load_matching_checkpoint, \
+    maxcut_eigenvalues, simulated_objective
+
+ADJ_MATRIX = np.array([
+    [0, 3, 1, 3, 0],
+    [3, 0, 0, 0, 2],
+    [1, 0, 0, 3, 0],
+    [3, 0, 3, 0, 2],
+    [0, 2, 0, 2, 0]
+])
+
+
+def _saved_state(tmp_path, cvar=None, symmetry=False):
+    gate_table = hardware_efficient_ansatz(5).gate_table()
+    state = OptimizerState(np.linspace(0, 1, 7), 3, np.pi / 8, target_cost=-6.0)
+    state.epoch = 1
+    state.rotation_num = 4
+    state.min_cost = -4.5
+    state.num_evaluations = 37
+    state.set_problem(ADJ_MATRIX, gate_table, cvar, symmetry)
+    path = str(tmp_path / 'run.npz')
+    state.save(path)
+    return state, gate_table, path
+
+
+def test_checkpoint_round_trip(tmp_path):
+    state, gate_table, path = _saved_state(tmp_path)
+    loaded = OptimizerState.load(path)
+
+    np.testing.assert_array_equal(loaded.rotations, state.rotations)
+    for field in OptimizerState.SCALAR_FIELDS:
+        assert getattr(loaded, field) == getattr(state, field), field
+    assert loaded.matches(ADJ_MATRIX, gate_table)
+    assert load_matching_checkpoint(path, ADJ_MATRIX, gate_table) is not None
+
+
+def test_checkpoint_only_matches_its_own_problem(tmp_path):
+    _, gate_table, path = _saved_state(tmp_path)
+    other_graph = ADJ_MATRIX.copy()
+    other_graph[0, 1] = other_graph[1, 0] = 1
+
+    assert load_matching_checkpoint(path, other_graph, gate_table) is None
+    assert load_matching_checkpoint(path, ADJ_MATRIX, hardware_efficient_ansatz(5, 2).gate_table()) is None
+    assert load_matching_checkpoint(path, ADJ_MATRIX, gate_table, cvar=CVaR(0.2)) is None
+    assert load_matching_checkpoint(path, ADJ_MATRIX, gate_table, symmetry=True) is None
+
+
+def test_cvar_checkpoint_only_resumes_the_same_cvar(tmp_path):
+    _, gate_table, path = _saved_state(tmp_path, cvar=CVaR(0.2, seed=1), symmetry=True)
+
+    assert load_matching_checkpoint(path, ADJ_MATRIX, gate_table) is None
+    assert load_matching_checkpoint(path, ADJ_MATRIX, gate_table, CVaR(0.5, seed=1), True) is None
+    assert load_matching_checkpoint(path, ADJ_MATRIX, gate_table, CVaR(0.2, seed=1), True) is not None
+
+
+def test_finished_checkpoints_are_not_resumed(tmp_path):
+    state, gate_table, path = _saved_state(tmp_path)
+    state.epoch = state.num_epochs
+    state.save(path)
+
+    assert load_matching_checkpoint(path, ADJ_MATRIX, gate_table) is None
+
+
+def test_resumed_search_finishes_like_an_uninterrupted_one(tmp_path):
+    ansatz = hardware_efficient_ansatz(5)
+    eigenvalues, _ = maxcut_eigenvalues(ADJ_MATRIX)
+    objective = simulated_objective(ansatz.gate_table(), 5, eigenvalues)
+    uninterrupted = SteppingOptimizer(ansatz.initial_parameters(), 2).run(objective)
+
+    interrupted = SteppingOptimizer(ansatz.initial_parameters(), 2)
+    interrupted.state.set_problem(ADJ_MATRIX, ansatz.gate_table())
+    steps = interrupted.steps(objective)
+    for _ in range(15):
+        next(steps)
+    path = interrupted.state.save(str(tmp_path / 'run.npz'))
+
+    state = load_matching_checkpoint(path, ADJ_MATRIX, ansatz.gate_table())
+    rotations, cost, num_evaluations = SteppingOptimizer(state=state).run(objective)
+    np.testing.assert_array_equal(rotations, uninterrupted[0])
+    assert cost == uninterrupted[1]
+    assert num_evaluations == uninterrupted[2]
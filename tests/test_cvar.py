@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import numpy as np
+import pytest
+
+from vqe_playground.solver import solve_maxcut, CVaR, sample_cvar, distribution_cvar, sample_basis_states
+from vqe_playground.solver.cvar import tail_basis_state
+
+ADJ_MATRIX = np.array([
+    [0, 3, 1, 3, 0],
+    [3, 0, 0, 0, 2],
+    [1, 0, 0, 3, 0],
+    [3, 0, 3, 0, 2],
+    [0, 2, 0, 2, 0]
+])
+
+
+def test_cvar_solve_is_judged_by_its_expectation_value():
+    result = solve_maxcut(ADJ_MATRIX, cvar=CVaR(0.2, seed=0), symmetry=True)
+
+    expected_ratio = -(result['expectation_value'] + result['maxcut_shift']) / result['optimal_cut_value']
+    assert result['approximation_ratio'] == expected_ratio
+    # The CVaR reaches the optimum long before the expectation value does
+    assert result['stop_reason'] == 'target_cost'
+    assert result['expectation_value'] > result['cost']
+    assert not result['reached_optimum']
+
+
+def test_sample_cvar_averages_the_lowest_fraction():
+    values = [5.0, -1.0, 3.0, -4.0, 0.0, 2.0, 1.0, -2.0, 4.0, -3.0]
+    assert sample_cvar(values, 0.3) == pytest.approx(-3.0)
+    assert sample_cvar(values, 0.25) == pytest.approx(-3.0)
+    assert sample_cvar(values, 0.01) == -4.0
+    assert sample_cvar(values, 1.0) == pytest.approx(np.mean(values))
+
+
+def test_distribution_cvar_splits_the_boundary_state():
+    eigenvalues = np.array([2.0, -1.0, 0.0, -3.0])
+    probabilities = np.array([0.4, 0.3, 0.2, 0.1])
+    # 0.1 at -3, then 0.15 of the 0.3 at -1
+    assert distribution_cvar(eigenvalues, probabilities, 0.25) == pytest.approx((0.1 * -3 + 0.15 * -1) / 0.25)
+    assert distribution_cvar(eigenvalues, probabilities, 1.0) == pytest.approx(np.dot(eigenvalues, probabilities))
+
+
+def test_sampled_cvar_converges_to_the_distribution_cvar():
+    rng = np.random.default_rng(0)
+    eigenvalues = rng.normal(size=32)
+    probabilities = rng.random(32)
+    probabilities /= probabilities.sum()
+    shots = sample_basis_states(probabilities, 200000, rng)
+
+    np.testing.assert_allclose(np.bincount(shots, minlength=32) / len(shots), probabilities, atol=0.005)
+    assert sample_cvar(eigenvalues[shots], 0.2) == pytest.approx(distribution_cvar(eigenvalues, probabilities, 0.2),
+                                                                 abs=0.02)
+
+
+def test_estimates_are_repeatable_with_a_seed():
+    eigenvalues = np.arange(8, dtype=float)
+    probabilities = np.full(8, 1 / 8)
+    first = CVaR(0.5, 64, seed=7).estimator(eigenvalues)
+    second = CVaR(0.5, 64, seed=7).estimator(eigenvalues)
+    assert [first(probabilities) for _ in range(3)] == [second(probabilities) for _ in range(3)]
+    assert CVaR(0.5, None).estimator(eigenvalues)(probabilities) == pytest.approx(1.5)
+
+
+def test_tail_basis_state_reads_out_an_optimal_cut():
+    eigenvalues = np.array([0.0, -2.0, 1.0, -2.0])
+    # The worst state is the most probable, but the best fifth is all optimal
+    probabilities = np.array([0.1, 0.15, 0.7, 0.05])
+    assert tail_basis_state(eigenvalues, probabilities, 0.2) == 1
+    assert int(np.argmax(probabilities)) == 2
+
+
+def test_alpha_and_shots_are_checked():
+    with pytest.raises(ValueError):
+        CVaR(0.0)
+    with pytest.raises(ValueError):
+        CVaR(0.5, num_shots=0)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import itertools
+
+import numpy as np
+import pytest
+
+from vqe_playground.solver import exact_maxcut, cut_value, maxcut_eigenvalues
+from vqe_playground.solver.exact import gray_code_maxcut, branch_and_bound_maxcut, clear_solution_cache
+
+
+def _random_graph(rng, num_nodes, density=0.6, weighted=True):
+    weights = rng.integers(1, 5, size=(num_nodes, num_nodes)) if weighted else np.ones((num_nodes, num_nodes))
+    weights = np.tril(weights * (rng.random((num_nodes, num_nodes)) < density), -1)
+    return (weights + weights.T).astype(float)
+
+
+def _brute_force_cut(adj_matrix):
+    num_nodes = adj_matrix.shape[0]
+    best = 0.0
+    for sides in itertools.product((0, 1), repeat=num_nodes):
+        sides = np.array(sides)
+        best = max(best, float(np.sum(np.tril(adj_matrix, -1) * (sides[:, None] != sides[None, :]))))
+    return best
+
+
+@pytest.mark.parametrize('num_nodes', [2, 3, 5, 8, 10])
+def test_both_methods_agree_with_brute_force(num_nodes):
+    rng = np.random.default_rng(num_nodes)
+    for _ in range(5):
+        adj_matrix = _random_graph(rng, num_nodes, weighted=num_nodes % 2 == 0)
+        expected = _brute_force_cut(adj_matrix)
+        for solve in (gray_code_maxcut, branch_and_bound_maxcut):
+            solution = solve(adj_matrix)
+            assert solution.cut_value == pytest.approx(expected)
+            # The reported sides really achieve the reported cut
+            assert cut_value(adj_matrix, solution.basis_state) == pytest.approx(expected)
+
+
+def test_lowest_eigenvalue_is_the_hamiltonians_minimum():
+    adj_matrix = _random_graph(np.random.default_rng(0), 6)
+    eigenvalues, shift = maxcut_eigenvalues(adj_matrix)
+    assert exact_maxcut(adj_matrix).lowest_eigenvalue(shift) == pytest.approx(eigenvalues.min())
+
+
+def test_solutions_are_cached_per_matrix():
+    clear_solution_cache()
+    adj_matrix = _random_graph(np.random.default_rng(1), 6)
+    assert exact_maxcut(adj_matrix) is exact_maxcut(adj_matrix.copy())
+    clear_solution_cache()
+    assert exact_maxcut(adj_matrix).cut_value == pytest.approx(_brute_force_cut(adj_matrix))
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import numpy as np
+
+from vqe_playground.model import GATE_TABLE_DTYPE
+from vqe_playground.model import circuit_node_types as node_types
+from vqe_playground.sim.noise import NoiseModel, simulate_trajectories
+
+
+def _gate_table(*gates):
+    table = np.zeros(len(gates), dtype=GATE_TABLE_DTYPE)
+    for column, (node_type, wire, ctrl_a) in enumerate(gates):
+        table[column] = (column, wire, node_type, ctrl_a, -1, -1, 0.0, -1)
+    return table
+
+
+def test_noisy_cx_damps_its_control_qubit():
+    # Y puts the control in |1>, then a CX whose errors always decay |1> to |0>
+    gate_table = _gate_table((node_types.Y, 0, -1), (node_types.X, 1, 0))
+    noise_model = NoiseModel().add_gate_error('x', amplitude_damping=1.0)
+    probabilities = simulate_trajectories(gate_table, 2, noise_model, 16, rng=np.random.default_rng(0))
+
+    # Qubit 0 is the least significant bit, so odd basis states have the control in |1>
+    control_excited = probabilities[:, 1::2].sum(axis=1)
+    np.testing.assert_allclose(control_excited, 0.0, atol=1e-12)
+
+
+def test_noiseless_cx_leaves_its_control_alone():
+    gate_table = _gate_table((node_types.Y, 0, -1), (node_types.X, 1, 0))
+    probabilities = simulate_trajectories(gate_table, 2, NoiseModel(), 4, rng=np.random.default_rng(0))
+    np.testing.assert_allclose(probabilities[:, 3], 1.0)
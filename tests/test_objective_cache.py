@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import numpy as np
+import pytest
+
+from vqe_playground.solver import solve_maxcut, OPTIMIZERS
+from vqe_playground.solver.objective_cache import ObjectiveCache
+
+ADJ_MATRIX = np.array([
+    [0, 3, 1, 3, 0],
+    [3, 0, 0, 0, 2],
+    [1, 0, 0, 3, 0],
+    [3, 0, 3, 0, 2],
+    [0, 2, 0, 2, 0]
+])
+
+
+@pytest.mark.parametrize('optimizer', OPTIMIZERS)
+def test_cache_does_not_change_the_result(optimizer):
+    uncached = solve_maxcut(ADJ_MATRIX, optimizer=optimizer, max_evaluations=200)
+    cache = ObjectiveCache()
+    cached = solve_maxcut(ADJ_MATRIX, optimizer=optimizer, max_evaluations=200, cache=cache)
+
+    assert cached['cost'] == uncached['cost']
+    assert cached['evaluations'] == uncached['evaluations']
+    assert cached['stop_reason'] == uncached['stop_reason']
+    np.testing.assert_array_equal(cached['rotations'], uncached['rotations'])
+    assert cache.misses > 0
+
+
+def test_hits_and_misses_are_counted():
+    cache = ObjectiveCache()
+    evaluations = []
+
+    def objective(rotations):
+        evaluations.append(rotations)
+        return float(np.sum(rotations))
+
+    cached_objective = cache.wrap(objective, ADJ_MATRIX, 'structure')
+    assert cached_objective([np.pi, 0.0]) == np.pi
+    # Within the quantization resolution, so the same key
+    assert cached_objective([np.pi + 1e-9, 0.0]) == np.pi
+    assert cached_objective([np.pi / 8, 0.0]) == np.pi / 8
+
+    assert len(evaluations) == 2
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_exact_keys_tell_nearby_angles_apart():
+    cache = ObjectiveCache()
+    cached_objective = cache.wrap(lambda rotations: float(np.sum(rotations)), ADJ_MATRIX, 'structure',
+                                  quantize=False)
+    assert cached_objective([np.pi, 0.0]) == np.pi
+    assert cached_objective([np.pi + 1e-9, 0.0]) == np.pi + 1e-9
+    assert cached_objective([np.pi, 0.0]) == np.pi
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_keys_depend_on_graph_and_structure():
+    cache = ObjectiveCache()
+    other_graph = ADJ_MATRIX * 2
+    cache.wrap(lambda rotations: 1.0, ADJ_MATRIX, 'structure')([0.0])
+
+    assert cache.wrap(lambda rotations: 2.0, other_graph, 'structure')([0.0]) == 2.0
+    assert cache.wrap(lambda rotations: 3.0, ADJ_MATRIX, 'other structure')([0.0]) == 3.0
+    assert cache.wrap(lambda rotations: 4.0, ADJ_MATRIX, 'structure')([0.0]) == 1.0
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ObjectiveCache(maxsize=2)
+    cached_objective = cache.wrap(lambda rotations: float(rotations[0]), ADJ_MATRIX, 'structure')
+    cached_objective([0.0])
+    cached_objective([1.0])
+    cached_objective([0.0])
+    cached_objective([2.0])
+
+    assert len(cache) == 2
+    misses = cache.misses
+    cached_objective([0.0])
+    cached_objective([1.0])
+    assert cache.misses == misses + 1
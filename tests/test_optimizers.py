@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import numpy as np
+import pytest
+
+from vqe_playground.model.ansatz import hardware_efficient_ansatz
+from vqe_playground.solver import ScipyOptimizer, SPSAOptimizer, StopCriteria, maxcut_eigenvalues, \
+    simulated_objective, make_optimizer, OPTIMIZERS
+
+ADJ_MATRIX = np.array([
+    [0, 3, 1, 3, 0],
+    [3, 0, 0, 0, 2],
+    [1, 0, 0, 3, 0],
+    [3, 0, 3, 0, 2],
+    [0, 2, 0, 2, 0]
+])
+
+
+def _objective():
+    ansatz = hardware_efficient_ansatz(5)
+    eigenvalues, _ = maxcut_eigenvalues(ADJ_MATRIX)
+    return ansatz, simulated_objective(ansatz.gate_table(), 5, eigenvalues)
+
+
+@pytest.mark.parametrize('name', OPTIMIZERS)
+def test_every_optimizer_gets_close_to_the_optimum(name):
+    ansatz, objective = _objective()
+    optimizer = make_optimizer(name, ansatz.initial_parameters(), max_evaluations=800, target_cost=-6.0)
+    rotations, cost, num_evaluations = optimizer.run(objective)
+
+    # From an initial cost of -1, with the best rotations found kept in the state
+    assert cost < -5.5
+    assert objective(rotations) == cost
+    assert num_evaluations <= 800
+    assert optimizer.stop_reason in ('target_cost', 'max_evaluations', 'converged')
+
+
+def test_spsa_gets_close_to_the_optimum():
+    ansatz, objective = _objective()
+    initial_cost = objective(ansatz.initial_parameters())
+
+    optimizer = SPSAOptimizer(ansatz.initial_parameters(), StopCriteria(max_evaluations=1000))
+    rotations, cost, num_evaluations = optimizer.run(objective)
+
+    # The optimum is -6, from an initial cost of -1
+    assert initial_cost == pytest.approx(-1.0)
+    assert cost < -5.5
+    assert num_evaluations == 1000
+
+
+def test_scipy_failures_are_raised_to_the_caller():
+    ansatz, objective = _objective()
+    optimizer = ScipyOptimizer(ansatz.initial_parameters(), method='no-such-method')
+
+    with pytest.raises(ValueError):
+        optimizer.run(objective)
+    assert optimizer.stop_reason is None
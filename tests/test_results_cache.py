@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import numpy as np
+
+from vqe_playground.model.ansatz import qaoa_ansatz
+from vqe_playground.solver import ResultsCache, solve_maxcut, cut_value, CVaR
+
+ADJ_MATRIX = np.array([
+    [0, 3, 1, 3, 0],
+    [3, 0, 0, 0, 2],
+    [1, 0, 0, 3, 0],
+    [3, 0, 3, 0, 2],
+    [0, 2, 0, 2, 0]
+])
+
+
+def _relabeled(adj_matrix, permutation):
+    return adj_matrix[np.ix_(permutation, permutation)]
+
+
+def test_second_solve_is_a_hit(tmp_path):
+    cache = ResultsCache(str(tmp_path / 'results.sqlite'))
+    first = solve_maxcut(ADJ_MATRIX, results_cache=cache)
+    second = solve_maxcut(ADJ_MATRIX, results_cache=cache)
+
+    assert not first['cached'] and second['cached']
+    assert second['evaluations'] == 0
+    assert second['cost'] == first['cost']
+    assert second['basis_state'] == first['basis_state']
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_different_setups_miss(tmp_path):
+    cache = ResultsCache(str(tmp_path / 'results.sqlite'))
+    solve_maxcut(ADJ_MATRIX, results_cache=cache)
+
+    assert not solve_maxcut(ADJ_MATRIX, num_epochs=2, results_cache=cache)['cached']
+    assert not solve_maxcut(ADJ_MATRIX, cvar=CVaR(0.5, seed=0), results_cache=cache)['cached']
+    assert not solve_maxcut(ADJ_MATRIX * 2, results_cache=cache)['cached']
+    # A layered ansatz depends on wire order, so a relabeled graph misses
+    assert not solve_maxcut(_relabeled(ADJ_MATRIX, [4, 2, 0, 1, 3]), results_cache=cache)['cached']
+    assert cache.hits == 0
+
+
+def test_qaoa_hits_relabelings_with_the_cut_on_their_labels(tmp_path):
+    cache = ResultsCache(str(tmp_path / 'results.sqlite'))
+    solve_maxcut(ADJ_MATRIX, qaoa_ansatz(ADJ_MATRIX), results_cache=cache)
+    relabeled = _relabeled(ADJ_MATRIX, [4, 2, 0, 1, 3])
+    result = solve_maxcut(relabeled, qaoa_ansatz(relabeled), results_cache=cache)
+
+    assert result['cached']
+    assert cut_value(relabeled, result['basis_state']) == result['cut_value']
+
+
+def test_results_persist_and_least_recently_used_are_evicted(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    cache = ResultsCache(path, max_entries=2)
+    result = {'rotations': [0.5], 'cost': -1.0, 'cut_value': 1.0, 'basis_state': '01'}
+    graphs = [np.array([[0, weight], [weight, 0]]) for weight in (1, 2, 3)]
+    cache.put(graphs[0], 'config', result)
+    cache.put(graphs[1], 'config', result)
+    assert cache.get(graphs[0], 'config') is not None
+    cache.put(graphs[2], 'config', result)
+
+    reopened = ResultsCache(path, max_entries=2)
+    assert len(reopened) == 2
+    assert reopened.get(graphs[0], 'config')['rotations'] == [0.5]
+    assert reopened.get(graphs[1], 'config') is None
+    assert reopened.get(graphs[0], 'other config') is None
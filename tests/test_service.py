@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import concurrent.futures
+import json
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from vqe_playground.model.ansatz import hardware_efficient_ansatz
+from vqe_playground.solver import solve_maxcut
+from vqe_playground.solver.service import SolveService
+
+ADJ_MATRIX = [
+    [0, 3, 1, 3, 0],
+    [3, 0, 0, 0, 2],
+    [1, 0, 0, 3, 0],
+    [3, 0, 3, 0, 2],
+    [0, 2, 0, 2, 0]
+]
+
+
+@pytest.fixture
+def service():
+    service = SolveService(port=0).start()
+    yield service
+    service.shutdown()
+
+
+def _post(service, body):
+    """POST a JSON body, or raw bytes, to /solve, returning (status, decoded reply)"""
+    data = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+    request = urllib.request.Request('http://{}:{}/solve'.format(*service.address), data=data,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read().decode('utf-8'))
+
+
+def test_concurrent_solves_match_direct_solves(service):
+    graphs = [np.array(ADJ_MATRIX), np.roll(np.roll(ADJ_MATRIX, 1, axis=0), 1, axis=1)]
+    with concurrent.futures.ThreadPoolExecutor(len(graphs)) as executor:
+        replies = list(executor.map(lambda graph: _post(service, {'adj_matrix': graph.tolist(), 'depth': 2}),
+                                    graphs))
+
+    for graph, (status, result) in zip(graphs, replies):
+        expected = solve_maxcut(graph, hardware_efficient_ansatz(5, 2))
+        assert status == 200
+        assert result['cost'] == pytest.approx(expected['cost'])
+        assert result['basis_state'] == expected['basis_state']
+    stats = service.stats()
+    assert stats['solved'] == len(graphs)
+    assert stats['mean_batch_size'] >= 1
+
+
+@pytest.mark.parametrize('body, message', [
+    ({'adj_matrix': [[0, 1], [1, 0, 2]]}, 'adj_matrix must be a square list of rows'),
+    ({'adj_matrix': [[0, 1, 1], [1, 0, 1]]}, 'adj_matrix must be a square list of rows'),
+    ({'adj_matrix': [[0, 'a'], ['a', 0]]}, 'adj_matrix must only contain numbers'),
+    ({'adj_matrix': [[0, 1], [2, 0]]}, 'adj_matrix must be symmetric'),
+    ({'adj_matrix': [[0]]}, 'adj_matrix must have between 2 and 16 nodes'),
+    ({'depth': 2}, 'The request has no adj_matrix'),
+    ([ADJ_MATRIX], 'The request must be a JSON object'),
+])
+def test_bad_requests_get_a_clear_400(service, body, message):
+    assert _post(service, body) == (400, {'error': message})
+
+
+def test_unreadable_json_gets_a_400(service):
+    status, reply = _post(service, b'{"adj_matrix": ')
+    assert status == 400
+    assert 'error' in reply
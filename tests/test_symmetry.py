@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import numpy as np
+import pytest
+
+from vqe_playground.model.ansatz import hardware_efficient_ansatz
+from vqe_playground.solver import solve_maxcut, maxcut_eigenvalues, reduced_maxcut_eigenvalues, expand_reduced
+from vqe_playground.solver.symmetry import wire_is_idle
+
+ADJ_MATRIX = np.array([
+    [0, 3, 1, 3, 0],
+    [3, 0, 0, 0, 2],
+    [1, 0, 0, 3, 0],
+    [3, 0, 3, 0, 2],
+    [0, 2, 0, 2, 0]
+])
+
+
+def test_reduced_eigenvalues_are_the_first_half_of_the_full_ones():
+    eigenvalues, shift = maxcut_eigenvalues(ADJ_MATRIX)
+    reduced, reduced_shift = reduced_maxcut_eigenvalues(ADJ_MATRIX)
+
+    np.testing.assert_allclose(reduced, eigenvalues[:16])
+    # Complements have the same cut, so the other half repeats it in reverse
+    np.testing.assert_allclose(eigenvalues[16:], eigenvalues[:16][::-1])
+    assert reduced_shift == shift
+
+
+def test_expanded_states_put_the_last_node_on_side_0():
+    probabilities = np.arange(1, 9) / 36.0
+    expanded = expand_reduced(probabilities)
+    np.testing.assert_array_equal(expanded[:8], probabilities)
+    np.testing.assert_array_equal(expanded[8:], 0)
+
+    batch = expand_reduced(np.ones((3, 4)))
+    assert batch.shape == (3, 8)
+    np.testing.assert_array_equal(batch[:, 4:], 0)
+
+
+def test_idle_wires_are_found():
+    gate_table = hardware_efficient_ansatz(4).gate_table()
+    assert not any(wire_is_idle(gate_table, wire) for wire in range(4))
+    assert wire_is_idle(gate_table, 4)
+
+
+def test_reduced_solve_finds_an_optimal_cut():
+    full = solve_maxcut(ADJ_MATRIX)
+    reduced = solve_maxcut(ADJ_MATRIX, symmetry=True)
+
+    assert len(reduced['rotations']) < len(full['rotations'])
+    assert reduced['basis_state'][0] == '0'
+    assert reduced['cut_value'] == full['optimal_cut_value']
+    assert reduced['cost'] == pytest.approx(-reduced['cut_value'] - reduced['maxcut_shift'])
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import numpy as np
+import pytest
+
+from vqe_playground.solver import TraceRecorder, consolidate_trace, read_run, read_runs
+
+
+def _record(path, num_runs=2, num_rows=7, num_params=3, num_states=8):
+    rng = np.random.default_rng(0)
+    recorded = []
+    # Fewer rows per chunk than per run, so each run spans several chunks
+    with TraceRecorder(path, chunk_rows=3) as recorder:
+        for run in range(num_runs):
+            recorder.start_run(optimizer='stepping', run=run)
+            params = rng.random((num_rows, num_params))
+            costs = -rng.random(num_rows)
+            probabilities = rng.dirichlet(np.ones(num_states), num_rows)
+            for row in range(num_rows):
+                recorder.record(params[row], costs[row], row % num_states, probabilities[row])
+            recorded.append((params, costs, probabilities))
+    return recorded
+
+
+def _assert_run(columns, params, costs, probabilities):
+    np.testing.assert_array_equal(columns['params'], params)
+    np.testing.assert_array_equal(columns['cost'], costs)
+    np.testing.assert_array_equal(columns['basis_state'], np.arange(len(costs)) % probabilities.shape[1])
+    np.testing.assert_array_equal(columns['probabilities'], probabilities.astype(np.float32))
+
+
+def test_trace_round_trip(tmp_path):
+    path = str(tmp_path / 'trace.zip')
+    recorded = _record(path)
+
+    runs = read_runs(path)
+    assert sorted(runs) == [0, 1]
+    assert runs[1]['optimizer'] == 'stepping'
+    for run, (params, costs, probabilities) in enumerate(recorded):
+        columns, metadata = read_run(path, run)
+        assert metadata['run'] == run
+        _assert_run(columns, params, costs, probabilities)
+
+
+def test_read_run_defaults_to_the_last_run(tmp_path):
+    path = str(tmp_path / 'trace.zip')
+    params, costs, probabilities = _record(path)[-1]
+    columns, _ = read_run(path)
+    _assert_run(columns, params, costs, probabilities)
+    with pytest.raises(ValueError):
+        read_run(path, 5)
+
+
+def test_consolidated_trace_matches_the_trace_file(tmp_path):
+    path = str(tmp_path / 'trace.zip')
+    out_dir = str(tmp_path / 'consolidated')
+    recorded = _record(path)
+
+    columns = consolidate_trace(path, out_dir)
+    assert isinstance(columns['cost'], np.memmap)
+    np.testing.assert_array_equal(columns['cost'], np.concatenate([costs for _, costs, _ in recorded]))
+    for run, (params, costs, probabilities) in enumerate(recorded):
+        run_columns, metadata = read_run(out_dir, run)
+        assert metadata['run'] == run
+        _assert_run(run_columns, params, costs, probabilities)
+
+
+def test_consolidation_pads_narrower_runs(tmp_path):
+    path = str(tmp_path / 'trace.zip')
+    with TraceRecorder(path, chunk_rows=4) as recorder:
+        recorder.start_run()
+        recorder.record([0.1, 0.2], -1.0, 0)
+        recorder.start_run()
+        recorder.record([0.3, 0.4, 0.5], -2.0, 1)
+
+    columns = consolidate_trace(path, str(tmp_path / 'consolidated'))
+    assert columns['params'].shape == (2, 3)
+    assert np.isnan(columns['params'][0, 2])
+    narrow, _ = read_run(str(tmp_path / 'consolidated'), 0)
+    np.testing.assert_array_equal(narrow['params'], [[0.1, 0.2]])
@@ -1,5 +1,189 @@
-from .vqe_main import VQEPlayground
+import argparse
+import json
+
+from .solver.optimizers import OPTIMIZERS
+from .solver.stop_criteria import StopCriteria
+from .solver.cvar import CVaR, DEFAULT_NUM_SHOTS
+
+
+def add_stop_arguments(parser):
+    parser.add_argument('--max-evaluations', type=int, help='most objective evaluations per optimization')
+    parser.add_argument('--max-seconds', type=float, help='most wall-clock seconds per optimization')
+    parser.add_argument('--tolerance', type=float,
+                        help='stop once the cost improves by no more than this fraction over --patience epochs')
+    parser.add_argument('--patience', type=int, default=1, help='epochs over which --tolerance applies (default 1)')
+    parser.add_argument('--stop-at-optimum', action='store_true',
+                        help='stop once the most probable basis state is an optimal cut')
+
+
+def stop_criteria_from_args(args):
+    return StopCriteria(args.max_evaluations, args.max_seconds, args.tolerance, args.patience, args.stop_at_optimum)
+
+
+def add_cvar_arguments(parser):
+    parser.add_argument('--cvar', type=float, metavar='ALPHA',
+                        help='minimize the mean of the best ALPHA fraction of sampled cut values')
+    parser.add_argument('--shots', type=int, default=DEFAULT_NUM_SHOTS,
+                        help='shots sampled per evaluation for --cvar, or 0 for the exact CVaR (default {})'.format(
+                            DEFAULT_NUM_SHOTS))
+    parser.add_argument('--cvar-seed', type=int, help='seed of the --cvar shots')
+
+
+def cvar_from_args(args):
+    if args.cvar is None:
+        return None
+    return CVaR(args.cvar, args.shots or None, args.cvar_seed)
 
 
 def main():
-    VQEPlayground().main()
+    parser = argparse.ArgumentParser(description='Demonstrate VQE concepts using Qiskit and Pygame')
+    parser.add_argument('--checkpoint', help='checkpoint optimizations to this file, resuming from it when it matches')
+    parser.add_argument('--qaoa', type=int, metavar='LAYERS', help='use a QAOA ansatz with this many layers')
+    parser.add_argument('--trace', help='record every objective evaluation to this trace file')
+    parser.add_argument('--results-cache', help='SQLite file of solved graphs, reused instead of optimizing again')
+    parser.add_argument('--optimizer', default='stepping', choices=OPTIMIZERS,
+                        help='optimizer of the rotation angles (default stepping)')
+    parser.add_argument('--epochs', type=int, default=1, help='epochs of the stepping search (default 1)')
+    add_stop_arguments(parser)
+    add_cvar_arguments(parser)
+    parser.add_argument('--symmetry', action='store_true',
+                        help='keep the last node on one side and simulate one qubit fewer')
+    parser.add_argument('--noise-model', type=json.loads, metavar='SPEC',
+                        help='simulate with a JSON NoiseModel spec, e.g. '
+                             '\'{"readout_error": 0.02, "gates": {"x": {"depolarizing": 0.01}}}\'')
+    parser.add_argument('--cold-start', action='store_true',
+                        help='start every optimization from the initial rotations, even after small graph edits')
+    parser.add_argument('--replay', help='play back a run from a trace file instead of optimizing')
+    parser.add_argument('--run', type=int, help='run of the --replay trace to play, by default the last')
+    parser.add_argument('--frame-budget', type=float, metavar='MS',
+                        help='milliseconds of each frame spent optimizing (default 20)')
+    parser.add_argument('--refresh-hz', type=float,
+                        help='how many times a second the display follows the optimizer (default 10)')
+    args = parser.parse_args()
+
+    from .vqe_main import VQEPlayground, INITIAL_ADJ_MATRIX
+    ansatz = None
+    if args.qaoa:
+        from .model.ansatz import qaoa_ansatz
+        ansatz = qaoa_ansatz(INITIAL_ADJ_MATRIX, args.qaoa)
+    replay = None
+    if args.replay:
+        from .solver.replay import TraceReplay
+        replay = TraceReplay.load(args.replay, args.run)
+    noise_model = None
+    if args.noise_model:
+        from .sim.noise import NoiseModel
+        noise_model = NoiseModel.from_spec(args.noise_model)
+    pacing = {}
+    if args.frame_budget is not None:
+        pacing['frame_budget_ms'] = args.frame_budget
+    if args.refresh_hz is not None:
+        pacing['viz_refresh_hz'] = args.refresh_hz
+    VQEPlayground(ansatz, checkpoint_path=args.checkpoint, trace_path=args.trace, replay=replay,
+                  results_cache_path=args.results_cache, warm_start=not args.cold_start,
+                  optimizer=args.optimizer, num_epochs=args.epochs, stop_criteria=stop_criteria_from_args(args),
+                  cvar=cvar_from_args(args), symmetry=args.symmetry, noise_model=noise_model, **pacing).main()
+
+
+def render_main():
+    parser = argparse.ArgumentParser(description='Render VQE Playground snapshots without a display')
+    parser.add_argument('input', help='JSON list of instances, or a script with a "steps" list')
+    parser.add_argument('--out-dir', default='snapshots', help='directory for exported PNGs')
+    parser.add_argument('--script', action='store_true', help='treat input as a scripted session')
+    parser.add_argument('--components', action='store_true', help='also export each component as a PNG')
+    parser.add_argument('--no-frames', action='store_true', help="don't export composite frames")
+    parser.add_argument('--checkpoint', help='checkpoint optimizations to this file, resuming from it when it matches')
+    parser.add_argument('--trace', help='record every objective evaluation to this trace file')
+    parser.add_argument('--results-cache', help='SQLite file of solved graphs, reused instead of optimizing again')
+    args = parser.parse_args()
+
+    from .headless import HeadlessPlayground, render_instances, run_script
+    playground = HeadlessPlayground(checkpoint_path=args.checkpoint, trace_path=args.trace,
+                                    results_cache_path=args.results_cache)
+    if args.script:
+        exported = run_script(args.input, args.out_dir, playground)
+    else:
+        with open(args.input) as instances_file:
+            instances = json.load(instances_file)
+        exported = render_instances(instances, args.out_dir, frames=not args.no_frames,
+                                    components=args.components, playground=playground)
+    playground.close_trace()
+    print('Exported', len(exported), 'images to', args.out_dir)
+
+
+def serve_main():
+    parser = argparse.ArgumentParser(description='Serve MaxCut solves over HTTP on a loopback address')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8642)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--results-cache', help='SQLite file of solved graphs, reused across restarts')
+    args = parser.parse_args()
+
+    from .solver.service import SolveService
+    service = SolveService(args.host, args.port, args.workers, results_cache_path=args.results_cache)
+    print('Serving MaxCut solves on http://{}:{}'.format(*service.address))
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        service.shutdown()
+
+
+def bench_main():
+    parser = argparse.ArgumentParser(description='Benchmark MaxCut solves for speed and quality')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    corpus_parser = subparsers.add_parser('corpus', help='generate a seeded corpus of graphs')
+    corpus_parser.add_argument('out', help='JSON file for the corpus')
+    corpus_parser.add_argument('--seed', type=int, default=0)
+    corpus_parser.add_argument('--min-nodes', type=int, default=5)
+    corpus_parser.add_argument('--max-nodes', type=int, help='largest graph size (default the most qubits supported)')
+    corpus_parser.add_argument('--per-size', type=int, default=1, help='instances of each family per size')
+
+    run_parser = subparsers.add_parser('run', help='solve every instance of a corpus, recording metrics')
+    run_parser.add_argument('corpus', help='corpus JSON file')
+    run_parser.add_argument('--out', required=True, help='JSON file for the results, e.g. a new baseline')
+    run_parser.add_argument('--qaoa', type=int, default=0, metavar='LAYERS',
+                            help='use a QAOA ansatz with this many layers')
+    run_parser.add_argument('--epochs', type=int, default=1)
+    run_parser.add_argument('--optimizer', default='stepping', choices=OPTIMIZERS)
+    add_stop_arguments(run_parser)
+    add_cvar_arguments(run_parser)
+    run_parser.add_argument('--symmetry', action='store_true', help='simulate one qubit fewer, fixing the last node')
+    run_parser.add_argument('--no-memory', action='store_true', help="don't solve again to measure peak memory")
+
+    compare_parser = subparsers.add_parser('compare', help='flag regressions of results against a baseline')
+    compare_parser.add_argument('baseline', help='baseline results JSON file')
+    compare_parser.add_argument('results', help='results JSON file')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='relative change flagged as a regression (default 0.1)')
+    args = parser.parse_args()
+
+    from .solver import benchmark
+    if args.command == 'corpus':
+        limits = {'max_nodes': args.max_nodes} if args.max_nodes is not None else {}
+        corpus = benchmark.generate_corpus(args.seed, args.min_nodes, instances_per_size=args.per_size, **limits)
+        benchmark.save_json(corpus, args.out)
+        print('Wrote', len(corpus['instances']), 'instances to', args.out)
+    elif args.command == 'run':
+        def progress(result):
+            print('{name}: {wall_time:.3f}s, {evaluations} evaluations, ratio {approximation_ratio:.3f}'.format(
+                **result))
+        results = benchmark.run_benchmark(benchmark.load_json(args.corpus), args.qaoa, args.epochs,
+                                          measure_memory=not args.no_memory, progress=progress,
+                                          optimizer=args.optimizer, stop_criteria=stop_criteria_from_args(args),
+                                          cvar=cvar_from_args(args), symmetry=args.symmetry)
+        benchmark.save_json(results, args.out)
+        print('Total {wall_time:.3f}s, {evaluations} evaluations, mean ratio {mean_approximation_ratio:.3f}'.format(
+            **results['totals']))
+    else:
+        regressions = benchmark.compare_results(benchmark.load_json(args.baseline),
+                                                benchmark.load_json(args.results), args.threshold)
+        for regression in regressions:
+            if regression['metric'] == 'missing':
+                print('{name}: missing from results'.format(**regression))
+            else:
+                print('{name}: {metric} {baseline} -> {value} ({change:+.1%})'.format(**regression))
+        if regressions:
+            raise SystemExit('{} regressions beyond {:.0%}'.format(len(regressions), args.threshold))
+        print('No regressions beyond {:.0%}'.format(args.threshold))
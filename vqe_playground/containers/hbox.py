@@ -25,12 +25,13 @@ class HBox(pygame.sprite.RenderPlain):
         self.ypos = ypos
         self.arrange()
 
-    def arrange(self):
+    def arrange(self, update_sprites=True):
         next_xpos = self.xpos
         next_ypos = self.ypos
         sprite_list = self.sprites()
         for sprite in sprite_list:
-            sprite.update()
+            if update_sprites:
+                sprite.update()
             sprite.rect.left = next_xpos
             sprite.rect.top = next_ypos
             next_xpos += sprite.rect.width
\ No newline at end of file
@@ -92,6 +92,15 @@ class AdjacencyMatrix(pygame.sprite.RenderPlain):
                 next_xpos += picker.rect.width
             next_ypos += picker.rect.height
 
+    def set_adj_matrix(self, adj_matrix):
+        """Replace every element of the matrix, e.g. when loading a saved graph"""
+        self.adj_matrix_numeric[:, :] = adj_matrix
+        for idx, picker in enumerate(self.number_pickers_list):
+            picker.set_number(self.adj_matrix_numeric[idx // self.num_nodes, idx % self.num_nodes])
+            picker.draw_number_picker()
+        self.adj_matrix_graph_dirty = True
+        self.arrange()
+
     def handle_element_clicked(self, picker):
         for idx, picker_in_list in enumerate(self.number_pickers_list):
             if picker == picker_in_list:
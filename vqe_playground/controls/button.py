@@ -17,6 +17,7 @@
 import pygame
 from vqe_playground.utils.colors import BLUE, BLACK, WHITE, LIGHT_GREY
 from vqe_playground.utils.fonts import *
+from vqe_playground.utils.surfaces import new_surface, render_text
 
 
 class Button(pygame.sprite.Sprite):
@@ -28,8 +29,7 @@ class Button(pygame.sprite.Sprite):
         self.height = height
         self._enabled = enabled
 
-        self.image = pygame.Surface([self.width, self.height])
-        self.image.convert()
+        self.image = new_surface([self.width, self.height])
         self.rect = self.image.get_rect()
         self.rectangle = pygame.Rect(0, 0, self.width, self.height)
 
@@ -56,7 +56,7 @@ class Button(pygame.sprite.Sprite):
         self.image.fill(BLUE if self._enabled else LIGHT_GREY)
         pygame.draw.rect(self.image, BLACK, self.rectangle, 1)
 
-        text_surface = self.font.render(self.label, False, self.font_color)
+        text_surface = render_text(self.font, self.label, self.font_color)
         text_xpos = (self.rect.width - text_surface.get_rect().width) / 2
         text_ypos = (self.rect.height - text_surface.get_rect().height) / 2
         self.image.blit(text_surface, (text_xpos, text_ypos))
@@ -19,6 +19,7 @@ import numpy as np
 from vqe_playground.utils.colors import *
 from vqe_playground.utils.navigation import *
 from vqe_playground.utils.resources import *
+from vqe_playground.utils.surfaces import new_surface
 from vqe_playground.model.circuit_grid_model import CircuitGridNode
 from vqe_playground.model import circuit_node_types as node_types
 
@@ -240,7 +241,9 @@ class CircuitGrid(pygame.sprite.RenderPlain):
 
         self.update()
 
-    def rotate_gate_absolute(self, gate_node, radians):
+    def rotate_gate_absolute(self, gate_node, radians, redraw=True):
+        """Set the angle of a rotation gate. Without redraw, only the model changes,
+        so that many gates can be set before one update()"""
         if gate_node.node_type == node_types.X or \
                 gate_node.node_type == node_types.Y or \
                 gate_node.node_type == node_types.Z:
@@ -253,7 +256,8 @@ class CircuitGrid(pygame.sprite.RenderPlain):
             # TODO: Handle crz correctly
             # elif selected_node_gate_part == node_types.Z:
 
-        self.update()
+        if redraw:
+            self.update()
 
     def place_ctrl_qubit(self, gate_wire_num, candidate_ctrl_wire_num):
         """Attempt to place a control qubit on a wire.
@@ -331,6 +335,8 @@ class CircuitGridGate(pygame.sprite.Sprite):
         self.circuit_grid_model = circuit_grid_model
         self.wire_num = wire_num
         self.column_num = column_num
+        # Rotation gates draw their angle over a copy of the gate image, made here once needed
+        self.rotation_image = None
 
         self.update()
 
@@ -338,68 +344,94 @@ class CircuitGridGate(pygame.sprite.Sprite):
         node_type = self.circuit_grid_model.get_node_gate_part(self.wire_num, self.column_num)
 
         if node_type == node_types.H:
-            self.image, self.rect = load_image('gate_images/h_gate.png', -1)
+            self.show_image('gate_images/h_gate.png')
         elif node_type == node_types.X:
             node = self.circuit_grid_model.get_node(self.wire_num, self.column_num)
             if node.ctrl_a >= 0 or node.ctrl_b >= 0:
                 # This is a control-X gate or Toffoli gate
                 # TODO: Handle Toffoli gates more completely
                 if self.wire_num > max(node.ctrl_a, node.ctrl_b):
-                    self.image, self.rect = load_image('gate_images/not_gate_below_ctrl.png', -1)
+                    self.show_image('gate_images/not_gate_below_ctrl.png')
                 else:
-                    self.image, self.rect = load_image('gate_images/not_gate_above_ctrl.png', -1)
+                    self.show_image('gate_images/not_gate_above_ctrl.png')
             elif node.radians != 0:
-                self.image, self.rect = load_image('gate_images/rx_gate.png', -1)
-                self.rect = self.image.get_rect()
-                pygame.draw.arc(self.image, MAGENTA, self.rect, 0, node.radians % (2 * np.pi), 6)
-                pygame.draw.arc(self.image, MAGENTA, self.rect, node.radians % (2 * np.pi), 2 * np.pi, 1)
+                self.show_rotation_image('gate_images/rx_gate.png', node.radians)
             else:
-                self.image, self.rect = load_image('gate_images/x_gate.png', -1)
+                self.show_image('gate_images/x_gate.png')
         elif node_type == node_types.Y:
             node = self.circuit_grid_model.get_node(self.wire_num, self.column_num)
             if node.radians != 0:
-                self.image, self.rect = load_image('gate_images/ry_gate.png', -1)
-                self.rect = self.image.get_rect()
-                pygame.draw.arc(self.image, MAGENTA, self.rect, 0, node.radians % (2 * np.pi), 6)
-                pygame.draw.arc(self.image, MAGENTA, self.rect, node.radians % (2 * np.pi), 2 * np.pi, 1)
+                self.show_rotation_image('gate_images/ry_gate.png', node.radians)
             else:
-                self.image, self.rect = load_image('gate_images/y_gate.png', -1)
+                self.show_image('gate_images/y_gate.png')
         elif node_type == node_types.Z:
             node = self.circuit_grid_model.get_node(self.wire_num, self.column_num)
             if node.radians != 0:
-                self.image, self.rect = load_image('gate_images/rz_gate.png', -1)
-                self.rect = self.image.get_rect()
-                pygame.draw.arc(self.image, MAGENTA, self.rect, 0, node.radians % (2 * np.pi), 6)
-                pygame.draw.arc(self.image, MAGENTA, self.rect, node.radians % (2 * np.pi), 2 * np.pi, 1)
+                self.show_rotation_image('gate_images/rz_gate.png', node.radians)
             else:
-                self.image, self.rect = load_image('gate_images/z_gate.png', -1)
+                self.show_image('gate_images/z_gate.png')
         elif node_type == node_types.S:
-            self.image, self.rect = load_image('gate_images/s_gate.png', -1)
+            self.show_image('gate_images/s_gate.png')
         elif node_type == node_types.SDG:
-            self.image, self.rect = load_image('gate_images/sdg_gate.png', -1)
+            self.show_image('gate_images/sdg_gate.png')
         elif node_type == node_types.T:
-            self.image, self.rect = load_image('gate_images/t_gate.png', -1)
+            self.show_image('gate_images/t_gate.png')
         elif node_type == node_types.TDG:
-            self.image, self.rect = load_image('gate_images/tdg_gate.png', -1)
+            self.show_image('gate_images/tdg_gate.png')
         elif node_type == node_types.IDEN:
-            self.image, self.rect = load_image('gate_images/iden_gate.png', -1)
+            self.show_image('gate_images/iden_gate.png')
         elif node_type == node_types.CTRL:
             # TODO: Handle Toffoli gates correctly
             if self.wire_num > \
                     self.circuit_grid_model.get_gate_wire_for_control_node(self.wire_num, self.column_num):
-                self.image, self.rect = load_image('gate_images/ctrl_gate_bottom_wire.png', -1)
+                self.show_image('gate_images/ctrl_gate_bottom_wire.png')
             else:
-                self.image, self.rect = load_image('gate_images/ctrl_gate_top_wire.png', -1)
+                self.show_image('gate_images/ctrl_gate_top_wire.png')
         elif node_type == node_types.TRACE:
-            self.image, self.rect = load_image('gate_images/trace_gate.png', -1)
+            self.show_image('gate_images/trace_gate.png')
         elif node_type == node_types.SWAP:
-            self.image, self.rect = load_image('gate_images/swap_gate.png', -1)
+            self.show_image('gate_images/swap_gate.png')
         else:
-            self.image = pygame.Surface([GATE_TILE_WIDTH, GATE_TILE_HEIGHT])
-            self.image.set_alpha(0)
+            self.image = empty_tile_image()
             self.rect = self.image.get_rect()
 
-        self.image.convert()
+    def show_image(self, name):
+        self.image = gate_image(name)
+        self.rect = self.image.get_rect()
+
+    def show_rotation_image(self, name, radians):
+        """Show a gate image with an arc for its angle, drawn onto this gate's own surface"""
+        base_image = gate_image(name)
+        if self.rotation_image is None or self.rotation_image.get_size() != base_image.get_size():
+            self.rotation_image = new_surface(base_image.get_size())
+        colorkey = base_image.get_colorkey()
+        self.rotation_image.fill(colorkey)
+        self.rotation_image.set_colorkey(colorkey)
+        self.rotation_image.blit(base_image, (0, 0))
+
+        self.image = self.rotation_image
+        self.rect = self.image.get_rect()
+        pygame.draw.arc(self.image, MAGENTA, self.rect, 0, radians % (2 * np.pi), 6)
+        pygame.draw.arc(self.image, MAGENTA, self.rect, radians % (2 * np.pi), 2 * np.pi, 1)
+
+
+# Gate images are loaded once and shared by every tile showing them, so they are never drawn on
+_gate_images = {}
+_empty_tile_image = None
+
+
+def gate_image(name):
+    if name not in _gate_images:
+        _gate_images[name] = load_image(name, -1)[0]
+    return _gate_images[name]
+
+
+def empty_tile_image():
+    global _empty_tile_image
+    if _empty_tile_image is None:
+        _empty_tile_image = new_surface([GATE_TILE_WIDTH, GATE_TILE_HEIGHT])
+        _empty_tile_image.set_alpha(0)
+    return _empty_tile_image
 
 
 class CircuitGridCursor(pygame.sprite.Sprite):
@@ -18,6 +18,7 @@ import pygame
 from cmath import isclose
 from vqe_playground.utils.colors import WHITE, BLACK, LIGHT_GREY
 from vqe_playground.utils.fonts import *
+from vqe_playground.utils.surfaces import new_surface, render_text
 
 
 class NumberPicker(pygame.sprite.Sprite):
@@ -29,8 +30,9 @@ class NumberPicker(pygame.sprite.Sprite):
         self.height = height
         self.enabled = enabled
 
-        self.image = None
-        self.rect = None
+        # Redrawn in place, so changing the number doesn't allocate
+        self.image = new_surface([self.width, self.height])
+        self.rect = self.image.get_rect()
         self.background_color = WHITE
         self.font_color = BLACK
         self.font = ARIAL_36
@@ -45,16 +47,13 @@ class NumberPicker(pygame.sprite.Sprite):
         self.number = number
 
     def draw_number_picker(self):
-        self.image = pygame.Surface([self.width, self.height])
-        self.image.convert()
         self.image.fill(WHITE if self.enabled else LIGHT_GREY)
-        self.rect = self.image.get_rect()
 
         rectangle = pygame.Rect(0, 0, self.width, self.height)
         pygame.draw.rect(self.image, BLACK, rectangle, 1)
 
         if not isclose(self.number, 0):
-            text_surface = self.font.render(str(self.number), False, BLACK)
+            text_surface = render_text(self.font, str(self.number), BLACK)
             text_xpos = (self.rect.width - text_surface.get_rect().width) / 2
             text_ypos = (self.rect.height - text_surface.get_rect().height) / 2
             self.image.blit(text_surface, (text_xpos, text_ypos))
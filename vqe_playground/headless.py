@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Render the playground without a display and export PNG snapshots"""
+import json
+import os
+
+import numpy as np
+import pygame
+
+from .sim.noise import NoiseModel
+from .solver.replay import TraceReplay
+from .utils.colors import WHITE
+from .utils.imports import lazy_import
+from .vqe_main import VQEPlayground, INITIAL_ADJ_MATRIX
+
+
+class HeadlessPlayground(VQEPlayground):
+    """Playground that renders into off-screen surfaces using SDL's dummy video driver.
+
+    Components are created once and reused for every instance rendered,
+    so thousands of graphs can be exported from one process.
+    """
+    def __init__(self, ansatz=None, layout_seed=0, checkpoint_path=None, trace_path=None,
+                 results_cache_path=None):
+        # matplotlib must not try to open windows of its own
+        lazy_import('matplotlib').use('Agg')
+        VQEPlayground.__init__(self, ansatz, headless=True, checkpoint_path=checkpoint_path,
+                               trace_path=trace_path, results_cache_path=results_cache_path)
+        self.init_display()
+        self.create_components(INITIAL_ADJ_MATRIX)
+        self.network_graph.layout_seed = layout_seed
+
+    def solve(self):
+        """Run the optimizer to completion without drawing intermediate frames,
+        resuming from the checkpoint if one matches the current graph and circuit"""
+        self.optimization_desired = True
+        while self.optimization_desired:
+            self.step_optimization()
+
+    def render(self):
+        """Draw every component into the off-screen screen surface"""
+        self.refresh_basis_state()
+        # Snapshots must show the latest graph, so wait for its render to finish
+        self.network_graph.receive_render(wait=True)
+        self.top_sprites.arrange(update_sprites=False)
+        self.right_sprites.arrange()
+        self.adjacency_matrix.arrange()
+        self.draw_all()
+        self.circ_viz_dirty = False
+
+    def apply_step(self, step):
+        """Apply one scripted step: adj_matrix, noise_model, rotations, optimize,
+        replay and/or replay_frame.
+
+        noise_model is a NoiseModel spec, or null to go back to ideal simulation.
+        replay is a trace file whose run 'run' (by default the last) is shown
+        from then on, and replay_frame shows one of its recorded evaluations.
+        """
+        if 'noise_model' in step:
+            spec = step['noise_model']
+            self.circuit_grid_model.noise_model = NoiseModel.from_spec(spec) if spec else None
+            self.show_circuit_state()
+        if 'adj_matrix' in step:
+            self.set_adj_matrix(np.array(step['adj_matrix']))
+        if 'rotations' in step:
+            self.set_rotations(np.array(step['rotations'], dtype=float))
+        if step.get('optimize'):
+            self.solve()
+        if 'replay' in step:
+            self.start_replay(TraceReplay.load(step['replay'], step.get('run')))
+        if 'replay_frame' in step:
+            self.replay.seek(step['replay_frame'])
+            self.step_replay(0.0)
+
+    def export_frame(self, path):
+        pygame.image.save(self.screen, path)
+        return path
+
+    def export_components(self, out_dir, prefix=''):
+        """Save each component as its own PNG, returning a dict of paths by component"""
+        components = {
+            'network_graph': self.network_graph.image,
+            'expectation_grid': self.expectation_grid.image,
+            'adjacency_matrix': group_surface(self.adjacency_matrix),
+            'circuit_grid': group_surface(self.circuit_grid),
+        }
+        paths = {}
+        for name, surface in components.items():
+            paths[name] = os.path.join(out_dir, prefix + name + '.png')
+            pygame.image.save(surface, paths[name])
+        return paths
+
+
+def group_surface(group):
+    """Composite the sprites of a group onto a surface just big enough to hold them"""
+    sprites = group.sprites()
+    bounds = sprites[0].rect.unionall([sprite.rect for sprite in sprites[1:]])
+    surface = pygame.Surface(bounds.size)
+    surface.fill(WHITE)
+    for sprite in sprites:
+        surface.blit(sprite.image, sprite.rect.move(-bounds.left, -bounds.top))
+    return surface
+
+
+def render_instances(instances, out_dir, frames=True, components=False, playground=None):
+    """Render solved instances, each a dict with adj_matrix and optional name,
+    rotations and optimize entries, returning the exported paths"""
+    playground = playground or HeadlessPlayground()
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+
+    exported = []
+    for idx, instance in enumerate(instances):
+        name = instance.get('name', 'graph_{:05d}'.format(idx))
+        playground.apply_step(instance)
+        playground.render()
+        if frames:
+            exported.append(playground.export_frame(os.path.join(out_dir, name + '.png')))
+        if components:
+            exported.extend(playground.export_components(out_dir, name + '_').values())
+    return exported
+
+
+def run_script(path, out_dir, playground=None):
+    """Run a JSON script of steps, exporting a frame or components where a step names them.
+
+    Besides the keys understood by apply_step, a step may have 'frame'
+    (a PNG file name) and 'components' (a file name prefix).
+    """
+    with open(path) as script_file:
+        script = json.load(script_file)
+
+    playground = playground or HeadlessPlayground()
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+
+    steps = script if isinstance(script, list) else script.get('steps', [])
+    exported = []
+    for step in steps:
+        playground.apply_step(step)
+        if 'frame' in step or 'components' in step:
+            playground.render()
+        if 'frame' in step:
+            exported.append(playground.export_frame(os.path.join(out_dir, step['frame'])))
+        if 'components' in step:
+            exported.extend(playground.export_components(out_dir, step['components']).values())
+    return exported
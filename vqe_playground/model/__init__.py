@@ -14,5 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-from .circuit_grid_model import CircuitGridModel
+from .circuit_grid_model import CircuitGridModel, GATE_TABLE_DTYPE
+from .ansatz import AnsatzTemplate, hardware_efficient_ansatz, alternating_layers_ansatz, load_ansatz_spec, \
+    QAOATemplate, qaoa_ansatz
 from .circuit_node_types import *
\ No newline at end of file
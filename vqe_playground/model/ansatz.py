@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Declarative ansatz templates that are compiled once into gate tables"""
+import json
+
+import numpy as np
+from . import circuit_node_types as node_types
+from .circuit_grid_model import CircuitGridModel, GATE_TABLE_DTYPE, gate_table_structure_hash
+
+ROTATION_GATES = {
+    'x': node_types.X,
+    'y': node_types.Y,
+    'z': node_types.Z,
+}
+
+# Entangling layers are described by how they pair up (control, target) wires
+ENTANGLER_PATTERNS = ('ladder', 'alternating')
+
+DEFAULT_DEPTH = 4
+
+
+class AnsatzTemplate():
+    """Ansatz described as a list of layers, compiled into a gate table once.
+
+    Each layer is a dict, either {'rotation': 'x' | 'y' | 'z'} for a column
+    of rotation gates on every wire, or {'entangle': 'ladder' | 'alternating'}
+    for CNOTs. A ladder puts CNOT(i, i + 1) in its own column for each wire,
+    while alternating layers pack even then odd neighbouring pairs into two columns.
+    """
+    # Angles belong to particular wires, so they don't carry over to a relabeled graph
+    permutation_invariant = False
+
+    def __init__(self, num_qubits, layers, initial_radians=np.pi):
+        self.num_qubits = num_qubits
+        self.layers = list(layers)
+        self.initial_radians = initial_radians
+        self._gate_table = None
+
+        for layer in self.layers:
+            if 'rotation' in layer:
+                if layer['rotation'] not in ROTATION_GATES:
+                    raise ValueError('Unknown rotation gate: ' + str(layer['rotation']))
+            elif 'entangle' in layer:
+                if layer['entangle'] not in ENTANGLER_PATTERNS:
+                    raise ValueError('Unknown entangling pattern: ' + str(layer['entangle']))
+            else:
+                raise ValueError('Layer must specify rotation or entangle: ' + str(layer))
+
+    def __str__(self):
+        return 'AnsatzTemplate: qubits: ' + str(self.num_qubits) + ', layers: ' + str(self.layers)
+
+    @property
+    def num_columns(self):
+        return int(sum(self._layer_columns(layer) for layer in self.layers))
+
+    @property
+    def num_parameters(self):
+        return int(np.count_nonzero(self.gate_table()['param'] >= 0))
+
+    def _layer_columns(self, layer):
+        if 'rotation' in layer:
+            return 1
+        elif layer['entangle'] == 'ladder':
+            return self.num_qubits - 1
+        return min(2, self.num_qubits - 1)
+
+    def gate_table(self):
+        """Return the compiled GATE_TABLE_DTYPE array, building it on first use"""
+        if self._gate_table is None:
+            self._gate_table = self._compile()
+        return self._gate_table
+
+    def _compile(self):
+        n = self.num_qubits
+        tables = []
+        column = 0
+        num_params = 0
+        for layer in self.layers:
+            if 'rotation' in layer:
+                table = np.zeros(n, dtype=GATE_TABLE_DTYPE)
+                table['column'] = column
+                table['wire'] = np.arange(n)
+                table['node_type'] = ROTATION_GATES[layer['rotation']]
+                table['ctrl_a'] = -1
+                table['radians'] = self.initial_radians
+                table['param'] = np.arange(num_params, num_params + n)
+                num_params += n
+            else:
+                targets = np.arange(1, n)
+                if layer['entangle'] == 'ladder':
+                    columns = column + np.arange(n - 1)
+                else:
+                    # Even pairs (0,1), (2,3)... then odd pairs (1,2), (3,4)...
+                    columns = column + (targets + 1) % 2
+                order = np.lexsort((targets, columns))
+                table = np.zeros(n - 1, dtype=GATE_TABLE_DTYPE)
+                table['column'] = columns[order]
+                table['wire'] = targets[order]
+                table['node_type'] = node_types.X
+                table['ctrl_a'] = targets[order] - 1
+                table['radians'] = 0.0
+                table['param'] = -1
+            table['ctrl_b'] = -1
+            table['swap'] = -1
+            tables.append(table)
+            column += self._layer_columns(layer)
+
+        if not tables:
+            return np.zeros(0, dtype=GATE_TABLE_DTYPE)
+        return np.concatenate(tables)
+
+    def structure_hash(self):
+        return gate_table_structure_hash(self.gate_table())
+
+    def initial_parameters(self):
+        """Return the starting parameter vector, in get_rotation_gate_nodes() order"""
+        table = self.gate_table()
+        return table['radians'][table['param'] >= 0].copy()
+
+    def build_model(self, max_wires=None, max_columns=None):
+        """Create a CircuitGridModel populated with this ansatz"""
+        model = CircuitGridModel(max_wires or self.num_qubits,
+                                 max_columns or self.num_columns)
+        model.set_nodes_from_table(self.gate_table())
+        return model
+
+    def to_spec(self):
+        return {
+            'num_qubits': self.num_qubits,
+            'initial_radians': float(self.initial_radians),
+            'layers': self.layers,
+        }
+
+
+def hardware_efficient_ansatz(num_qubits, depth=DEFAULT_DEPTH, rotation='y', initial_radians=np.pi):
+    """Rotation layers interleaved with CNOT ladders, ending with a rotation layer"""
+    layers = [{'rotation': rotation}, {'entangle': 'ladder'}] * depth + [{'rotation': rotation}]
+    return AnsatzTemplate(num_qubits, layers, initial_radians)
+
+
+def alternating_layers_ansatz(num_qubits, depth=DEFAULT_DEPTH, rotation='y', initial_radians=np.pi):
+    """Rotation layers interleaved with brick-wall CNOT layers, ending with a rotation layer"""
+    layers = [{'rotation': rotation}, {'entangle': 'alternating'}] * depth + [{'rotation': rotation}]
+    return AnsatzTemplate(num_qubits, layers, initial_radians)
+
+
+def load_ansatz_spec(path, num_qubits=None):
+    """Load an ansatz from a JSON spec.
+
+    The spec has 'layers' (see AnsatzTemplate), optionally repeated 'repeat'
+    times and followed by 'final_layers'. 'num_qubits' may be overridden.
+    """
+    with open(path) as spec_file:
+        spec = json.load(spec_file)
+
+    layers = list(spec['layers']) * int(spec.get('repeat', 1)) + list(spec.get('final_layers', []))
+    return AnsatzTemplate(num_qubits or spec['num_qubits'], layers,
+                          spec.get('initial_radians', np.pi))
+
+
+class QAOATemplate():
+    """QAOA ansatz for MaxCut on one graph, with 2 parameters per layer.
+
+    The parameter vector is (gamma_1, beta_1, gamma_2, beta_2, ...). For
+    display, each layer is compiled into CNOT, RZ(gamma * w), CNOT on every
+    edge, followed by RX(2 * beta) on every wire, after an initial column
+    of Hadamards. Edges are packed into rounds whose wire spans don't
+    overlap, and every graph on num_qubits nodes gets the same number of
+    columns, so the grid doesn't change size when the graph is edited.
+    Simulation goes through sim.qaoa instead, as one diagonal phase and one
+    mixer per layer.
+    """
+    # The same gammas and betas give the relabeled state on a relabeled graph
+    permutation_invariant = True
+
+    def __init__(self, adj_matrix, num_layers=1, initial_radians=np.pi / 8):
+        self.adj_matrix = np.array(adj_matrix, dtype=float)
+        self.num_qubits = self.adj_matrix.shape[0]
+        self.num_layers = num_layers
+        self.initial_radians = initial_radians
+        self._gate_table = None
+        self._trace_table = None
+        self._rotation_sources = None
+        self._rotation_scales = None
+
+    def __str__(self):
+        return 'QAOATemplate: qubits: ' + str(self.num_qubits) + ', layers: ' + str(self.num_layers)
+
+    @property
+    def edges(self):
+        """(i, j, weight) for each edge, with i < j"""
+        weights = np.tril(self.adj_matrix, -1)
+        return [(int(i), int(j), float(weights[j, i])) for j, i in zip(*np.nonzero(weights))]
+
+    @property
+    def num_rounds(self):
+        # Edges of a complete graph that share a wire need this many rounds
+        n = self.num_qubits
+        return max((k + 1) * (n - k) - 1 for k in range(n)) if n > 1 else 0
+
+    @property
+    def num_columns(self):
+        return 1 + self.num_layers * (3 * self.num_rounds + 1)
+
+    @property
+    def num_parameters(self):
+        return 2 * self.num_layers
+
+    def initial_parameters(self):
+        return np.full(self.num_parameters, self.initial_radians, dtype=float)
+
+    def for_adj_matrix(self, adj_matrix):
+        """A template with the same layers for another graph"""
+        return QAOATemplate(adj_matrix, self.num_layers, self.initial_radians)
+
+    def gate_table(self):
+        if self._gate_table is None:
+            self._compile()
+        return self._gate_table
+
+    def _edge_rounds(self):
+        # Greedy interval colouring, optimal for intervals sorted by their start
+        rounds = []
+        for i, j, weight in sorted(self.edges):
+            for edge_round in rounds:
+                if edge_round[-1][1] < i:
+                    edge_round.append((i, j, weight))
+                    break
+            else:
+                rounds.append([(i, j, weight)])
+        return rounds
+
+    def _compile(self):
+        n = self.num_qubits
+        rows = []
+        traces = []
+        sources = {}
+
+        def add(column, wire, node_type, ctrl_a=-1, radians=0.0):
+            rows.append((column, wire, node_type, ctrl_a, -1, -1, radians, -1))
+
+        for wire in range(n):
+            add(0, wire, node_types.H)
+        rounds = self._edge_rounds()
+        for layer in range(self.num_layers):
+            first_column = 1 + layer * (3 * self.num_rounds + 1)
+            for round_num, edge_round in enumerate(rounds):
+                column = first_column + 3 * round_num
+                for i, j, weight in edge_round:
+                    add(column, j, node_types.X, ctrl_a=i)
+                    add(column + 1, j, node_types.Z, radians=self.initial_radians * weight)
+                    sources[(column + 1, j)] = (2 * layer, weight)
+                    add(column + 2, j, node_types.X, ctrl_a=i)
+                    for wire in range(i + 1, j):
+                        traces.append((column, wire, node_types.TRACE, -1, -1, -1, 0.0, -1))
+                        traces.append((column + 2, wire, node_types.TRACE, -1, -1, -1, 0.0, -1))
+            mixer_column = first_column + 3 * self.num_rounds
+            for wire in range(n):
+                add(mixer_column, wire, node_types.X, radians=2 * self.initial_radians)
+                sources[(mixer_column, wire)] = (2 * layer + 1, 2.0)
+
+        table = np.array(rows, dtype=GATE_TABLE_DTYPE)
+        table = table[np.lexsort((table['wire'], table['column']))]
+        is_rotation = np.array([(int(row['column']), int(row['wire'])) in sources for row in table], dtype=bool)
+        table['param'][is_rotation] = np.arange(np.count_nonzero(is_rotation))
+
+        rotation_keys = [(int(row['column']), int(row['wire'])) for row in table[is_rotation]]
+        self._rotation_sources = np.array([sources[key][0] for key in rotation_keys], dtype=int)
+        self._rotation_scales = np.array([sources[key][1] for key in rotation_keys])
+        self._gate_table = table
+        self._trace_table = np.array(traces, dtype=GATE_TABLE_DTYPE)
+
+    def structure_hash(self):
+        return gate_table_structure_hash(self.gate_table())
+
+    def parameters_to_rotations(self, params):
+        """Angles of the rotation gates, in get_rotation_gate_nodes() order, for a parameter vector"""
+        self.gate_table()
+        return np.asarray(params, dtype=float)[self._rotation_sources] * self._rotation_scales
+
+    def rotation_index_for_parameter(self, param_num):
+        """Index of the first rotation gate driven by a parameter, e.g. to highlight it"""
+        self.gate_table()
+        return int(np.flatnonzero(self._rotation_sources == param_num)[0])
+
+    def populate_model(self, model):
+        """Replace the contents of a model with this ansatz, including TRACE nodes for display"""
+        model.clear()
+        model.set_nodes_from_table(self.gate_table())
+        model.set_nodes_from_table(self._trace_table)
+        return model
+
+    def build_model(self, max_wires=None, max_columns=None):
+        model = CircuitGridModel(max_wires or self.num_qubits, max_columns or self.num_columns)
+        return self.populate_model(model)
+
+    def to_spec(self):
+        return {
+            'qaoa_layers': self.num_layers,
+            'adj_matrix': self.adj_matrix.tolist(),
+            'initial_radians': float(self.initial_radians),
+        }
+
+
+def qaoa_ansatz(adj_matrix, num_layers=1, initial_radians=np.pi / 8):
+    return QAOATemplate(adj_matrix, num_layers, initial_radians)
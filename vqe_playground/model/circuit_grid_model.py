@@ -13,26 +13,73 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import hashlib
+
 import numpy as np
-from qiskit import QuantumCircuit, QuantumRegister
 from . import circuit_node_types as node_types
+from vqe_playground.utils.imports import lazy_import
+
+# One row per gate in circuit order (column by column, top wire first).
+# Rows whose param is not -1 are rotation gates driven by that entry of a
+# parameter vector, numbered in the same order as get_rotation_gate_nodes()
+GATE_TABLE_DTYPE = np.dtype([
+    ('column', np.int16),
+    ('wire', np.int16),
+    ('node_type', np.int8),
+    ('ctrl_a', np.int16),
+    ('ctrl_b', np.int16),
+    ('swap', np.int16),
+    ('radians', np.float64),
+    ('param', np.int32),
+])
+
+
+def gate_table_structure_hash(gate_table):
+    """Hash a gate table, ignoring the angles of its parameterized rotation gates"""
+    table = np.array(gate_table, dtype=GATE_TABLE_DTYPE)
+    table['radians'][table['param'] >= 0] = 0
+    return hashlib.sha1(table.tobytes()).hexdigest()
 
 
 class CircuitGridModel():
-    """Grid-based model that is built when user interacts with circuit"""
+    """Grid-based model that is built when user interacts with circuit.
+
+    Nodes are stored as parallel (max_wires, max_columns) arrays of node
+    type, radians, ctrl_a, ctrl_b and swap, so whole-grid queries are
+    vectorized masks. get_node() returns a CircuitGridNode copied out of
+    the arrays; changes to it take effect when it is passed to set_node().
+    """
+    ROTATION_TYPES = (node_types.X, node_types.Y, node_types.Z)
+
     def __init__(self, max_wires, max_columns):
         self.max_wires = max_wires
         self.max_columns = max_columns
-        self.nodes = np.empty((max_wires, max_columns),
-                                dtype = CircuitGridNode)
+        shape = (max_wires, max_columns)
+        self.node_types = np.full(shape, node_types.EMPTY, dtype=np.int8)
+        self.radians = np.zeros(shape)
+        self.ctrl_a = np.full(shape, -1, dtype=np.int16)
+        self.ctrl_b = np.full(shape, -1, dtype=np.int16)
+        self.swap = np.full(shape, -1, dtype=np.int16)
+        # Cells that have never been set have no node at all, as distinct from an EMPTY node
+        self.occupied = np.zeros(shape, dtype=bool)
+        # Optional sim.noise.NoiseModel; when set, expectation values come from noisy trajectories
+        self.noise_model = None
         self.latest_computed_circuit = None
 
+    def clear(self):
+        """Remove every node from the grid"""
+        self.node_types[...] = node_types.EMPTY
+        self.radians[...] = 0
+        self.ctrl_a[...] = -1
+        self.ctrl_b[...] = -1
+        self.swap[...] = -1
+        self.occupied[...] = False
+
     def __str__(self):
         retval = ''
         for wire_num in range(self.max_wires):
             retval += '\n'
             for column_num in range(self.max_columns):
-                # retval += str(self.nodes[wire_num][column_num]) + ', '
                 retval += str(self.get_node_gate_part(wire_num, column_num)) + ', '
         return 'CircuitGridModel: ' + retval
 
@@ -40,160 +87,194 @@ class CircuitGridModel():
         # First, embed the wire and column locations in the node
         circuit_grid_node.wire_num = wire_num
         circuit_grid_node.column_num = column_num
-        self.nodes[wire_num][column_num] = circuit_grid_node
-
-        # self.nodes[wire_num][column_num] = \
-        #     CircuitGridNode(circuit_grid_node.node_type,
-        #                     circuit_grid_node.radians,
-        #                     circuit_grid_node.ctrl_a,
-        #                     circuit_grid_node.ctrl_b,
-        #                     circuit_grid_node.swap)
 
-        # TODO: Decide whether to protect as shown below
-        # if not self.nodes[wire_num][column_num]:
-        #     self.nodes[wire_num][column_num] = CircuitGridNode(node_type, radians)
-        # else:
-        #     print('Node ', wire_num, column_num, ' not empty')
+        self.node_types[wire_num, column_num] = circuit_grid_node.node_type
+        self.radians[wire_num, column_num] = circuit_grid_node.radians
+        self.ctrl_a[wire_num, column_num] = circuit_grid_node.ctrl_a
+        self.ctrl_b[wire_num, column_num] = circuit_grid_node.ctrl_b
+        self.swap[wire_num, column_num] = circuit_grid_node.swap
+        self.occupied[wire_num, column_num] = True
 
     def get_node(self, wire_num, column_num):
-        return self.nodes[wire_num][column_num]
+        if not self.occupied[wire_num, column_num]:
+            return None
+        node = CircuitGridNode(int(self.node_types[wire_num, column_num]),
+                               float(self.radians[wire_num, column_num]),
+                               int(self.ctrl_a[wire_num, column_num]),
+                               int(self.ctrl_b[wire_num, column_num]),
+                               int(self.swap[wire_num, column_num]))
+        node.wire_num = wire_num
+        node.column_num = column_num
+        return node
 
     def get_node_gate_part(self, wire_num, column_num):
-        requested_node = self.nodes[wire_num][column_num]
-        if requested_node and requested_node.node_type != node_types.EMPTY:
+        node_type = self.node_types[wire_num, column_num]
+        if self.occupied[wire_num, column_num] and node_type != node_types.EMPTY:
             # Node is occupied so return its gate
-            return requested_node.node_type
-        else:
-            # Check for control nodes from gates in other nodes in this column
-            nodes_in_column = self.nodes[:, column_num]
-            for idx in range(self.max_wires):
-                if idx != wire_num:
-                    other_node = nodes_in_column[idx]
-                    if other_node:
-                        if other_node.ctrl_a == wire_num or other_node.ctrl_b == wire_num:
-                            return node_types.CTRL
-                        elif other_node.swap == wire_num:
-                            return node_types.SWAP
+            return int(node_type)
 
+        # Check for control nodes from gates in other nodes in this column,
+        # the topmost match deciding between a control and a swap
+        others = self.occupied[:, column_num].copy()
+        others[wire_num] = False
+        is_ctrl = others & ((self.ctrl_a[:, column_num] == wire_num) | (self.ctrl_b[:, column_num] == wire_num))
+        is_swap = others & (self.swap[:, column_num] == wire_num)
+        matches = np.flatnonzero(is_ctrl | is_swap)
+        if len(matches) > 0:
+            return node_types.CTRL if is_ctrl[matches[0]] else node_types.SWAP
         return node_types.EMPTY
 
     def get_gate_wire_for_control_node(self, control_wire_num, column_num):
         """Get wire for gate that belongs to a control node on the given wire"""
-        gate_wire_num = -1
-        nodes_in_column = self.nodes[:, column_num]
-        for wire_idx in range(self.max_wires):
-            if wire_idx != control_wire_num:
-                other_node = nodes_in_column[wire_idx]
-                if other_node:
-                    if other_node.ctrl_a == control_wire_num or \
-                            other_node.ctrl_b == control_wire_num:
-                        gate_wire_num =  wire_idx
-                        # print("Found gate: ",
-                        #       self.get_node_gate_part(gate_wire_num, column_num),
-                        #       " on wire: " , gate_wire_num)
-        return gate_wire_num
+        others = self.occupied[:, column_num].copy()
+        others[control_wire_num] = False
+        gate_wires = np.flatnonzero(others & ((self.ctrl_a[:, column_num] == control_wire_num) |
+                                              (self.ctrl_b[:, column_num] == control_wire_num)))
+        return int(gate_wires[-1]) if len(gate_wires) > 0 else -1
+
+    def rotation_gate_mask(self):
+        """Mask of uncontrolled X, Y and Z gates, the ones the optimizer rotates"""
+        return self.occupied & (self.ctrl_a == -1) & np.isin(self.node_types, self.ROTATION_TYPES)
 
     def get_rotation_gate_nodes(self):
-        rot_gate_nodes = []
-        for column_num in range(self.max_columns):
-            for wire_num in range(self.max_wires):
-                node = self.nodes[wire_num][column_num]
-                if node and node.ctrl_a == -1:
-                    if node.node_type == node_types.X or \
-                            node.node_type == node_types.Y or \
-                            node.node_type == node_types.Z:
-                        rot_gate_nodes.append(node)
-        return rot_gate_nodes
+        column_nums, wire_nums = np.nonzero(self.rotation_gate_mask().T)
+        return [self.get_node(wire_num, column_num)
+                for column_num, wire_num in zip(column_nums.tolist(), wire_nums.tolist())]
+
+    def gate_table(self):
+        """Compile the grid into a GATE_TABLE_DTYPE array that simulators can consume directly"""
+        gate_mask = self.occupied & ~np.isin(self.node_types, (node_types.EMPTY, node_types.CTRL, node_types.TRACE))
+        column_nums, wire_nums = np.nonzero(gate_mask.T)
+        table = np.zeros(len(column_nums), dtype=GATE_TABLE_DTYPE)
+        table['column'] = column_nums
+        table['wire'] = wire_nums
+        for field in ('node_type', 'radians', 'ctrl_a', 'ctrl_b', 'swap'):
+            table[field] = getattr(self, field + 's' if field == 'node_type' else field)[wire_nums, column_nums]
 
+        is_rotation = self.rotation_gate_mask()[wire_nums, column_nums]
+        table['param'] = np.where(is_rotation, np.cumsum(is_rotation) - 1, -1)
+        return table
+
+    def structure_hash(self):
+        """Hash of the circuit structure, unchanged when only rotation angles change"""
+        return gate_table_structure_hash(self.gate_table())
+
+    def set_nodes_from_table(self, gate_table):
+        """Place every gate in a GATE_TABLE_DTYPE array onto the grid"""
+        wire_nums = gate_table['wire']
+        column_nums = gate_table['column']
+        self.node_types[wire_nums, column_nums] = gate_table['node_type']
+        self.radians[wire_nums, column_nums] = gate_table['radians']
+        self.ctrl_a[wire_nums, column_nums] = gate_table['ctrl_a']
+        self.ctrl_b[wire_nums, column_nums] = gate_table['ctrl_b']
+        self.swap[wire_nums, column_nums] = gate_table['swap']
+        self.occupied[wire_nums, column_nums] = True
 
     def compute_circuit(self):
-        qr = QuantumRegister(self.max_wires, 'q')
-        qc = QuantumCircuit(qr)
-
-        # Add a column of identity gates to protect simulators from an empty circuit
-        qc.iden(qr)
-
-        for column_num in range(self.max_columns):
-            for wire_num in range(self.max_wires):
-                node = self.nodes[wire_num][column_num]
-                if node:
-                    if node.node_type == node_types.IDEN:
-                        # Identity gate
-                        qc.iden(qr[wire_num])
-                    elif node.node_type == node_types.X:
-                        if node.radians == 0:
-                            if node.ctrl_a != -1:
-                                if node.ctrl_b != -1:
-                                    # Toffoli gate
-                                    qc.ccx(qr[node.ctrl_a], qr[node.ctrl_b], qr[wire_num])
-                                else:
-                                    # Controlled X gate
-                                    qc.cx(qr[node.ctrl_a], qr[wire_num])
-                            else:
-                                # Pauli-X gate
-                                qc.x(qr[wire_num])
-                        else:
-                            # Rotation around X axis
-                            qc.rx(node.radians, qr[wire_num])
-                    elif node.node_type == node_types.Y:
-                        if node.radians == 0:
-                            if node.ctrl_a != -1:
-                                # Controlled Y gate
-                                qc.cy(qr[node.ctrl_a], qr[wire_num])
-                            else:
-                                # Pauli-Y gate
-                                qc.y(qr[wire_num])
-                        else:
-                            # Rotation around Y axis
-                            qc.ry(node.radians, qr[wire_num])
-                    elif node.node_type == node_types.Z:
-                        if node.radians == 0:
-                            if node.ctrl_a != -1:
-                                # Controlled Z gate
-                                qc.cz(qr[node.ctrl_a], qr[wire_num])
-                            else:
-                                # Pauli-Z gate
-                                qc.z(qr[wire_num])
-                        else:
-                            if node.ctrl_a != -1:
-                                # Controlled rotation around the Z axis
-                                qc.crz(node.radians, qr[node.ctrl_a], qr[wire_num])
-                            else:
-                                # Rotation around Z axis
-                                qc.rz(node.radians, qr[wire_num])
-                    elif node.node_type == node_types.S:
-                        # S gate
-                        qc.s(qr[wire_num])
-                    elif node.node_type == node_types.SDG:
-                        # S dagger gate
-                        qc.sdg(qr[wire_num])
-                    elif node.node_type == node_types.T:
-                        # T gate
-                        qc.t(qr[wire_num])
-                    elif node.node_type == node_types.TDG:
-                        # T dagger gate
-                        qc.tdg(qr[wire_num])
-                    elif node.node_type == node_types.H:
-                        if node.ctrl_a != -1:
-                            # Controlled Hadamard
-                            qc.ch(qr[node.ctrl_a], qr[wire_num])
-                        else:
-                            # Hadamard gate
-                            qc.h(qr[wire_num])
-                    elif node.node_type == node_types.SWAP:
-                        if node.ctrl_a != -1:
-                            # Controlled Swap
-                            qc.cswap(qr[node.ctrl_a], qr[wire_num], qr[node.swap])
-                        else:
-                            # Swap gate
-                            qc.swap(qr[wire_num], qr[node.swap])
-
-        self.latest_computed_circuit = qc
-        return qc
+        self.latest_computed_circuit = gate_table_circuit(self.gate_table(), self.max_wires)
+        return self.latest_computed_circuit
+
+
+def gate_table_circuit(gate_table, num_qubits, parameters=None):
+    """Build a Qiskit circuit from a gate table.
+
+    parameters, if given, supplies the angle of each rotation gate by its
+    param number, e.g. Qiskit Parameters to be bound later. Whether a
+    gate is a Pauli gate still follows the table, where an angle of
+    exactly zero means the Pauli gate rather than a rotation.
+    """
+    qiskit = lazy_import('qiskit')
+    qr = qiskit.QuantumRegister(num_qubits, 'q')
+    qc = qiskit.QuantumCircuit(qr)
+
+    # Add a column of identity gates to protect simulators from an empty circuit
+    qc.iden(qr)
+
+    for row in gate_table:
+        node_type = int(row['node_type'])
+        wire_num = int(row['wire'])
+        ctrl_a = int(row['ctrl_a'])
+        ctrl_b = int(row['ctrl_b'])
+        radians = float(row['radians'])
+        angle = radians if parameters is None or row['param'] < 0 else parameters[int(row['param'])]
+        if node_type == node_types.IDEN:
+            # Identity gate
+            qc.iden(qr[wire_num])
+        elif node_type == node_types.X:
+            if radians == 0:
+                if ctrl_a != -1:
+                    if ctrl_b != -1:
+                        # Toffoli gate
+                        qc.ccx(qr[ctrl_a], qr[ctrl_b], qr[wire_num])
+                    else:
+                        # Controlled X gate
+                        qc.cx(qr[ctrl_a], qr[wire_num])
+                else:
+                    # Pauli-X gate
+                    qc.x(qr[wire_num])
+            else:
+                # Rotation around X axis
+                qc.rx(angle, qr[wire_num])
+        elif node_type == node_types.Y:
+            if radians == 0:
+                if ctrl_a != -1:
+                    # Controlled Y gate
+                    qc.cy(qr[ctrl_a], qr[wire_num])
+                else:
+                    # Pauli-Y gate
+                    qc.y(qr[wire_num])
+            else:
+                # Rotation around Y axis
+                qc.ry(angle, qr[wire_num])
+        elif node_type == node_types.Z:
+            if radians == 0:
+                if ctrl_a != -1:
+                    # Controlled Z gate
+                    qc.cz(qr[ctrl_a], qr[wire_num])
+                else:
+                    # Pauli-Z gate
+                    qc.z(qr[wire_num])
+            else:
+                if ctrl_a != -1:
+                    # Controlled rotation around the Z axis
+                    qc.crz(angle, qr[ctrl_a], qr[wire_num])
+                else:
+                    # Rotation around Z axis
+                    qc.rz(angle, qr[wire_num])
+        elif node_type == node_types.S:
+            # S gate
+            qc.s(qr[wire_num])
+        elif node_type == node_types.SDG:
+            # S dagger gate
+            qc.sdg(qr[wire_num])
+        elif node_type == node_types.T:
+            # T gate
+            qc.t(qr[wire_num])
+        elif node_type == node_types.TDG:
+            # T dagger gate
+            qc.tdg(qr[wire_num])
+        elif node_type == node_types.H:
+            if ctrl_a != -1:
+                # Controlled Hadamard
+                qc.ch(qr[ctrl_a], qr[wire_num])
+            else:
+                # Hadamard gate
+                qc.h(qr[wire_num])
+        elif node_type == node_types.SWAP:
+            if ctrl_a != -1:
+                # Controlled Swap
+                qc.cswap(qr[ctrl_a], qr[wire_num], qr[int(row['swap'])])
+            else:
+                # Swap gate
+                qc.swap(qr[wire_num], qr[int(row['swap'])])
+
+    return qc
 
 
 class CircuitGridNode():
     """Represents a node in the circuit grid"""
+    __slots__ = ('node_type', 'radians', 'ctrl_a', 'ctrl_b', 'swap', 'wire_num', 'column_num')
+
     def __init__(self, node_type, radians=0.0, ctrl_a=-1, ctrl_b=-1, swap=-1):
         self.node_type = node_type
         self.radians = radians
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Module for NumPy simulators that consume compiled gate tables"""
+from .statevector import simulate_statevector, statevector_probabilities
+from .pauli import PauliSum
+from .noise import NoiseModel, noisy_expectation, simulate_trajectories
+from .qaoa import qaoa_statevector, qaoa_objective
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Noisy simulation by Monte Carlo statevector trajectories.
+
+Each trajectory is a pure state that picks up random Pauli errors
+(depolarizing) and quantum jumps (amplitude damping) after the gates they
+are attached to. Averaging over trajectories reproduces the density matrix
+result, while memory stays at one statevector per trajectory. Readout
+error is applied exactly, to the measured probabilities.
+"""
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from vqe_playground.model import circuit_node_types as node_types
+from .statevector import PAULI_X, PAULI_Y, PAULI_Z, apply_gate, apply_single_qubit_gate, initial_states
+
+DEFAULT_NUM_TRAJECTORIES = 256
+
+# Gate types by the names used in noise model specs
+GATE_NAMES = {
+    'iden': node_types.IDEN,
+    'x': node_types.X,
+    'y': node_types.Y,
+    'z': node_types.Z,
+    's': node_types.S,
+    'sdg': node_types.SDG,
+    't': node_types.T,
+    'tdg': node_types.TDG,
+    'h': node_types.H,
+    'swap': node_types.SWAP,
+}
+
+# Identity followed by the Paulis that a depolarizing error picks from
+ERROR_PAULIS = np.array([np.eye(2), PAULI_X, PAULI_Y, PAULI_Z], dtype=complex)
+
+
+class NoiseModel():
+    """Depolarizing and amplitude damping errors per gate type, plus readout error.
+
+    A depolarizing probability p applies X, Y or Z, each with probability
+    p / 3, to every qubit a gate acts on. Amplitude damping with gamma
+    decays |1> to |0> with probability gamma on the same qubits. Each
+    measured bit is flipped with probability readout_error.
+    """
+    def __init__(self, readout_error=0.0):
+        self.readout_error = readout_error
+        self.gate_errors = {}
+
+    def __str__(self):
+        return 'NoiseModel: ' + json.dumps(self.to_spec(), sort_keys=True)
+
+    def add_gate_error(self, node_type, depolarizing=0.0, amplitude_damping=0.0):
+        if isinstance(node_type, str):
+            node_type = GATE_NAMES[node_type.lower()]
+        self.gate_errors[node_type] = (depolarizing, amplitude_damping)
+        return self
+
+    def gate_error(self, node_type):
+        return self.gate_errors.get(node_type, (0.0, 0.0))
+
+    @property
+    def is_ideal(self):
+        return self.readout_error == 0 and all(error == (0, 0) for error in self.gate_errors.values())
+
+    def to_spec(self):
+        names = {node_type: name for name, node_type in GATE_NAMES.items()}
+        return {
+            'readout_error': self.readout_error,
+            'gates': {names[node_type]: {'depolarizing': depolarizing, 'amplitude_damping': damping}
+                      for node_type, (depolarizing, damping) in self.gate_errors.items()},
+        }
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Build a model from a dict such as
+        {'readout_error': 0.02, 'gates': {'x': {'depolarizing': 0.01}}}"""
+        noise_model = cls(spec.get('readout_error', 0.0))
+        for name, error in spec.get('gates', {}).items():
+            noise_model.add_gate_error(name, error.get('depolarizing', 0.0), error.get('amplitude_damping', 0.0))
+        return noise_model
+
+    def fingerprint(self):
+        return hashlib.sha1(json.dumps(self.to_spec(), sort_keys=True).encode()).hexdigest()
+
+
+def _gate_qubits(row):
+    qubits = [int(row['wire'])]
+    if int(row['node_type']) == node_types.SWAP:
+        qubits.append(int(row['swap']))
+    # Controls are acted on too, so they pick up the gate's errors
+    qubits.extend(int(row[ctrl]) for ctrl in ('ctrl_a', 'ctrl_b') if int(row[ctrl]) != -1)
+    return tuple(qubits)
+
+
+def _apply_depolarizing(states, num_qubits, qubit, probability, rng):
+    errors = np.where(rng.random(len(states)) < probability, rng.integers(1, 4, len(states)), 0)
+    if np.any(errors):
+        apply_single_qubit_gate(states, num_qubits, qubit, ERROR_PAULIS[errors])
+
+
+def _apply_amplitude_damping(states, num_qubits, qubit, gamma, rng):
+    excited = ((np.arange(states.shape[1]) >> qubit) & 1).astype(bool)
+    prob_excited = np.sum(np.abs(states[:, excited]) ** 2, axis=1)
+    jumps = rng.random(len(states)) < gamma * prob_excited
+
+    # Kraus operators: a jump moves |1> to |0>, otherwise |1> is damped
+    kraus = np.zeros((len(states), 2, 2), dtype=complex)
+    kraus[jumps, 0, 1] = 1
+    kraus[~jumps, 0, 0] = 1
+    kraus[~jumps, 1, 1] = np.sqrt(1 - gamma)
+    apply_single_qubit_gate(states, num_qubits, qubit, kraus)
+    states /= np.linalg.norm(states, axis=1, keepdims=True)
+
+
+def apply_readout_error(probabilities, num_qubits, readout_error):
+    """Flip each measured bit with probability readout_error, exactly, on (batch, 2**n) probabilities"""
+    if readout_error == 0:
+        return probabilities
+    flip = np.array([[1 - readout_error, readout_error], [readout_error, 1 - readout_error]])
+    tensor = probabilities.reshape((len(probabilities),) + (2,) * num_qubits)
+    for axis in range(1, num_qubits + 1):
+        tensor = np.moveaxis(np.tensordot(tensor, flip, axes=([axis], [0])), -1, axis)
+    return tensor.reshape(probabilities.shape)
+
+
+def simulate_trajectories(gate_table, num_qubits, noise_model, num_trajectories, params=None, rng=None):
+    """Return the measured probabilities of each of num_trajectories noisy runs, readout error included"""
+    rng = rng or np.random.default_rng()
+    if params is not None:
+        params = np.broadcast_to(np.asarray(params, dtype=float), (num_trajectories, len(params)))
+
+    states = initial_states(num_qubits, num_trajectories)
+    for row in gate_table:
+        apply_gate(states, row, num_qubits, params)
+        depolarizing, damping = noise_model.gate_error(int(row['node_type']))
+        for qubit in _gate_qubits(row):
+            if depolarizing > 0:
+                _apply_depolarizing(states, num_qubits, qubit, depolarizing, rng)
+            if damping > 0:
+                _apply_amplitude_damping(states, num_qubits, qubit, damping, rng)
+
+    return apply_readout_error(np.abs(states) ** 2, num_qubits, noise_model.readout_error)
+
+
+def _trajectory_expectations(gate_table, num_qubits, eigenvalues, noise_model, num_trajectories, params, seed):
+    probabilities = simulate_trajectories(gate_table, num_qubits, noise_model, num_trajectories,
+                                          params, np.random.default_rng(seed))
+    return probabilities @ eigenvalues
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def trajectory_executor():
+    """Process pool shared by noisy expectations, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count())
+        return _executor
+
+
+def shutdown_trajectory_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+def noisy_expectation(gate_table, num_qubits, eigenvalues, noise_model, params=None,
+                      num_trajectories=DEFAULT_NUM_TRAJECTORIES, num_workers=None, seed=0):
+    """Estimate the expectation value of a diagonal Hamiltonian under noise.
+
+    Trajectories are split into one chunk per worker process, each with its
+    own independent stream spawned from seed, so a given seed always gives
+    the same estimate. num_workers=1 runs in this process. Returns the mean
+    over trajectories and its standard error.
+    """
+    num_workers = min(num_workers or os.cpu_count() or 1, num_trajectories)
+    chunk_sizes = np.full(num_workers, num_trajectories // num_workers)
+    chunk_sizes[:num_trajectories % num_workers] += 1
+    seeds = np.random.SeedSequence(seed).spawn(num_workers)
+    args = [(gate_table, num_qubits, eigenvalues, noise_model, int(size), params, chunk_seed)
+            for size, chunk_seed in zip(chunk_sizes, seeds)]
+
+    if num_workers == 1:
+        values = _trajectory_expectations(*args[0])
+    else:
+        executor = trajectory_executor()
+        futures = [executor.submit(_trajectory_expectations, *chunk_args) for chunk_args in args]
+        values = np.concatenate([future.result() for future in futures])
+
+    std_error = np.std(values, ddof=1) / np.sqrt(len(values)) if len(values) > 1 else 0.0
+    return float(np.mean(values)), float(std_error)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Qiskit circuits built and transpiled once per circuit structure, then bound per evaluation.
+
+Unlike the NumPy simulators in this package, these run on a Qiskit
+BasicAer backend, for when results should come from Qiskit itself.
+"""
+import collections
+import threading
+
+import numpy as np
+
+from vqe_playground.model.circuit_grid_model import gate_table_circuit, gate_table_structure_hash
+from vqe_playground.utils.imports import lazy_import
+
+DEFAULT_BACKEND = 'statevector_simulator'
+
+PARAMETRIC_CACHE_SIZE = 32
+
+# Statevectors are rounded as in ExpectationGrid.set_circuit
+STATEVECTOR_DECIMALS = 3
+
+
+class ParametricCircuit():
+    """A gate table's circuit with a Qiskit Parameter for each rotation angle.
+
+    The circuit is transpiled for its backend once, so an evaluation only
+    binds a parameter vector and runs. Rotations at an angle of exactly
+    zero are Pauli gates with no parameter, so a ParametricCircuit only
+    fits parameter vectors that are zero in the same places as its table.
+    """
+    def __init__(self, gate_table, num_qubits, backend_name=DEFAULT_BACKEND):
+        qiskit = lazy_import('qiskit')
+        self.num_qubits = num_qubits
+        self.backend = qiskit.BasicAer.get_backend(backend_name)
+        num_params = int(np.max(gate_table['param'], initial=-1)) + 1
+        self.parameters = [qiskit.circuit.Parameter('theta_' + str(idx)) for idx in range(num_params)]
+        circuit = gate_table_circuit(gate_table, num_qubits, self.parameters)
+        self.circuit = qiskit.transpile(circuit, self.backend)
+
+    def bind(self, params):
+        # Pauli gates have no parameter in the circuit, and binding one that is absent is an error
+        present = self.circuit.parameters
+        return self.circuit.bind_parameters({parameter: value for parameter, value
+                                             in zip(self.parameters, np.asarray(params, dtype=float).tolist())
+                                             if parameter in present})
+
+    def statevector(self, params, decimals=STATEVECTOR_DECIMALS):
+        qiskit = lazy_import('qiskit')
+        bound = self.bind(params)
+        # Already transpiled, so assemble and run rather than going through execute()
+        result = self.backend.run(qiskit.assemble(bound, self.backend)).result()
+        return result.get_statevector(bound, decimals=decimals)
+
+
+_circuit_cache = collections.OrderedDict()
+_circuit_cache_lock = threading.Lock()
+
+
+def table_parameters(gate_table):
+    """The angles of a gate table's rotation gates, in param order"""
+    is_rotation = gate_table['param'] >= 0
+    return gate_table['radians'][is_rotation][np.argsort(gate_table['param'][is_rotation])]
+
+
+def parametric_circuit(gate_table, num_qubits, params=None, backend_name=DEFAULT_BACKEND):
+    """Return the ParametricCircuit for a gate table's structure, building it on first use.
+
+    Which of params (by default the table's own angles) are zero is part
+    of the key, as those rotations are compiled as Pauli gates.
+    """
+    params = table_parameters(gate_table) if params is None else np.asarray(params, dtype=float)
+    key = (gate_table_structure_hash(gate_table), num_qubits, backend_name, np.flatnonzero(params == 0).tobytes())
+    with _circuit_cache_lock:
+        circuit = _circuit_cache.get(key)
+        if circuit is not None:
+            _circuit_cache.move_to_end(key)
+            return circuit
+
+    table = np.array(gate_table)
+    table['radians'][table['param'] >= 0] = params[table['param'][table['param'] >= 0]]
+    circuit = ParametricCircuit(table, num_qubits, backend_name)
+    with _circuit_cache_lock:
+        _circuit_cache[key] = circuit
+        while len(_circuit_cache) > PARAMETRIC_CACHE_SIZE:
+            _circuit_cache.popitem(last=False)
+    return circuit
+
+
+def parametric_statevector(gate_table, num_qubits, params=None, backend_name=DEFAULT_BACKEND):
+    """Simulate a gate table with params, by default its own angles, binding a cached circuit"""
+    params = table_parameters(gate_table) if params is None else np.asarray(params, dtype=float)
+    return parametric_circuit(gate_table, num_qubits, params, backend_name).statevector(params)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Expectation values of weighted Pauli sums, measured in qubit-wise commuting groups.
+
+Pauli labels follow Qiskit, with the highest qubit first, so 'IXZ' is Z on
+qubit 0 and X on qubit 1.
+"""
+import numpy as np
+
+from .statevector import HADAMARD, SDG_GATE, PAULI_X, PAULI_Y, PAULI_Z, apply_single_qubit_gate
+
+# Rotations into the Z basis, applied to a copy of the state before measuring a group
+BASIS_ROTATIONS = {
+    'X': HADAMARD,
+    'Y': HADAMARD @ SDG_GATE,
+}
+
+PAULI_MATRICES = {
+    'I': np.eye(2, dtype=complex),
+    'X': PAULI_X,
+    'Y': PAULI_Y,
+    'Z': PAULI_Z,
+}
+
+
+class PauliSum():
+    """Hamiltonian given as (coefficient, label) terms, e.g. [(0.5, 'ZZI'), (-1.0, 'IXX')].
+
+    Terms are partitioned once into groups whose Paulis agree on every
+    qubit they share. Each group is measured from a single rotated copy of
+    the state against a precomputed diagonal, so evaluation costs one
+    vectorized dot product per group. Terms made only of I and Z share the
+    unrotated probabilities.
+    """
+    def __init__(self, terms, constant=0.0):
+        self.terms = [(float(coeff), label.upper()) for coeff, label in terms]
+        self.constant = float(constant)
+        if not self.terms:
+            raise ValueError('PauliSum needs at least one term')
+
+        self.num_qubits = len(self.terms[0][1])
+        for coeff, label in self.terms:
+            if len(label) != self.num_qubits or set(label) - set(PAULI_MATRICES):
+                raise ValueError('Invalid Pauli label: ' + label)
+        self._groups = None
+
+    def __str__(self):
+        return 'PauliSum: qubits: ' + str(self.num_qubits) + ', terms: ' + str(len(self.terms)) + \
+            ', groups: ' + str(len(self.groups()))
+
+    @property
+    def is_diagonal(self):
+        return all(set(label) <= set('IZ') for coeff, label in self.terms)
+
+    def groups(self):
+        """Return a list of (basis, diagonal) pairs, building them on first use.
+
+        basis has one character per qubit, highest first, naming the Pauli
+        measured on it ('Z' also stands for qubits no term touches).
+        diagonal holds the group's summed term values for each basis state.
+        """
+        if self._groups is None:
+            self._groups = self._build_groups()
+        return self._groups
+
+    def _build_groups(self):
+        # Greedily place terms, those with the widest support first
+        order = sorted(range(len(self.terms)),
+                       key=lambda idx: -sum(char != 'I' for char in self.terms[idx][1]))
+        bases = []
+        members = []
+        for idx in order:
+            label = self.terms[idx][1]
+            for basis, group in zip(bases, members):
+                if all(a == 'I' or b == 'I' or a == b for a, b in zip(label, basis)):
+                    basis[:] = [b if a == 'I' else a for a, b in zip(label, basis)]
+                    group.append(idx)
+                    break
+            else:
+                bases.append(['I' if char == 'I' else char for char in label])
+                members.append([idx])
+
+        groups = []
+        diagonal_terms = [idx for basis, group in zip(bases, members) if set(basis) <= set('IZ')
+                          for idx in group]
+        if diagonal_terms:
+            groups.append(('Z' * self.num_qubits, self._group_diagonal(diagonal_terms)))
+        for basis, group in zip(bases, members):
+            if not set(basis) <= set('IZ'):
+                basis = ''.join('Z' if char == 'I' else char for char in basis)
+                groups.append((basis, self._group_diagonal(group)))
+        return groups
+
+    def _group_diagonal(self, term_indices):
+        indices = np.arange(2 ** self.num_qubits)
+        diagonal = np.zeros(2 ** self.num_qubits)
+        for idx in term_indices:
+            coeff, label = self.terms[idx]
+            parity = np.zeros(len(indices), dtype=int)
+            for qubit, char in enumerate(reversed(label)):
+                if char != 'I':
+                    parity ^= (indices >> qubit) & 1
+            diagonal += coeff * (1 - 2 * parity)
+        return diagonal
+
+    def diagonal(self):
+        """Diagonal of the Hamiltonian matrix in the computational basis"""
+        diagonal = np.full(2 ** self.num_qubits, self.constant)
+        diagonal_terms = [idx for idx, (coeff, label) in enumerate(self.terms) if set(label) <= set('IZ')]
+        if diagonal_terms:
+            diagonal += self._group_diagonal(diagonal_terms)
+        return diagonal
+
+    def expectation(self, states):
+        """Return the expectation value of a statevector, or one per row of a batch"""
+        states = np.asarray(states, dtype=complex)
+        batch = np.atleast_2d(states)
+        values = np.full(len(batch), self.constant)
+        for basis, diagonal in self.groups():
+            rotated = batch
+            if basis != 'Z' * self.num_qubits:
+                rotated = batch.copy()
+                for qubit, char in enumerate(reversed(basis)):
+                    if char in BASIS_ROTATIONS:
+                        apply_single_qubit_gate(rotated, self.num_qubits, qubit, BASIS_ROTATIONS[char])
+            values += (np.abs(rotated) ** 2) @ diagonal
+        return values[0] if states.ndim == 1 else values
+
+    def to_matrix(self):
+        """Dense matrix of the Hamiltonian, only practical for a handful of qubits"""
+        matrix = self.constant * np.eye(2 ** self.num_qubits, dtype=complex)
+        for coeff, label in self.terms:
+            term = np.ones((1, 1), dtype=complex)
+            for char in label:
+                term = np.kron(term, PAULI_MATRICES[char])
+            matrix += coeff * term
+        return matrix
+
+    def lowest_eigenvalue(self):
+        if self.is_diagonal:
+            return float(np.min(self.diagonal()))
+        return float(np.linalg.eigvalsh(self.to_matrix())[0])
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""QAOA simulation straight from the diagonal of the cost Hamiltonian.
+
+The cost layer exp(-i gamma H) of a diagonal H is an element-wise phase,
+and the mixer is an RX(2 beta) on every qubit, so each layer costs
+O(n * 2**n) with no gate-by-gate ZZ decomposition. Parameter vectors are
+(gamma_1, beta_1, gamma_2, beta_2, ...), as in model.QAOATemplate.
+"""
+import numpy as np
+
+
+def apply_rx_mixer(states, num_qubits, betas):
+    """Apply RX(2 * beta) to every qubit of a (batch, 2**n) array in place, one beta per state"""
+    cos = np.cos(betas).reshape((-1,) + (1,) * num_qubits)
+    sin = np.sin(betas).reshape((-1,) + (1,) * num_qubits)
+    tensor = states.reshape((len(states),) + (2,) * num_qubits)
+    for axis in range(1, num_qubits + 1):
+        tensor[...] = cos * tensor - 1j * sin * np.flip(tensor, axis)
+    return states
+
+
+def qaoa_statevector(eigenvalues, params):
+    """Return the QAOA state for a parameter vector, or one state per row of a (batch, 2p) array"""
+    eigenvalues = np.asarray(eigenvalues, dtype=float)
+    num_qubits = int(np.log2(len(eigenvalues)))
+    params = np.asarray(params, dtype=float)
+    batch_params = np.atleast_2d(params)
+
+    states = np.full((len(batch_params), len(eigenvalues)), 2 ** (-num_qubits / 2), dtype=complex)
+    for layer in range(batch_params.shape[1] // 2):
+        gammas = batch_params[:, 2 * layer]
+        betas = batch_params[:, 2 * layer + 1]
+        states *= np.exp(-1j * gammas[:, np.newaxis] * eigenvalues[np.newaxis, :])
+        apply_rx_mixer(states, num_qubits, betas)
+    return states[0] if params.ndim == 1 else states
+
+
+def qaoa_objective(eigenvalues):
+    """Return objective(params), the expectation value of the QAOA state"""
+    eigenvalues = np.asarray(eigenvalues, dtype=float)
+
+    def objective(params):
+        return float(np.dot(eigenvalues, np.abs(qaoa_statevector(eigenvalues, params)) ** 2))
+    return objective
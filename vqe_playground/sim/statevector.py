@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Batched statevector simulation of compiled gate tables.
+
+Qubit 0 is the least significant bit of a basis state index, as in Qiskit,
+so results line up with comp_basis_states() and the expectation grid.
+"""
+import numpy as np
+from vqe_playground.model import circuit_node_types as node_types
+
+PAULI_X = np.array([[0, 1], [1, 0]], dtype=complex)
+PAULI_Y = np.array([[0, -1j], [1j, 0]], dtype=complex)
+PAULI_Z = np.array([[1, 0], [0, -1]], dtype=complex)
+HADAMARD = np.array([[1, 1], [1, -1]], dtype=complex) / np.sqrt(2)
+S_GATE = np.diag([1, 1j])
+SDG_GATE = np.diag([1, -1j])
+T_GATE = np.diag([1, np.exp(1j * np.pi / 4)])
+TDG_GATE = np.diag([1, np.exp(-1j * np.pi / 4)])
+
+FIXED_GATES = {
+    node_types.X: PAULI_X,
+    node_types.Y: PAULI_Y,
+    node_types.Z: PAULI_Z,
+    node_types.H: HADAMARD,
+    node_types.S: S_GATE,
+    node_types.SDG: SDG_GATE,
+    node_types.T: T_GATE,
+    node_types.TDG: TDG_GATE,
+}
+
+
+def rotation_matrices(node_type, radians):
+    """Return one 2x2 rotation matrix per angle about the axis of node_type.
+
+    As in CircuitGridModel.compute_circuit, an angle of exactly zero
+    selects the Pauli gate rather than an identity rotation.
+    """
+    radians = np.asarray(radians, dtype=float).reshape(-1)
+    cos = np.cos(radians / 2)
+    sin = np.sin(radians / 2)
+    matrices = np.empty((len(radians), 2, 2), dtype=complex)
+    if node_type == node_types.X:
+        matrices[:, 0, 0] = cos
+        matrices[:, 0, 1] = -1j * sin
+        matrices[:, 1, 0] = -1j * sin
+        matrices[:, 1, 1] = cos
+    elif node_type == node_types.Y:
+        matrices[:, 0, 0] = cos
+        matrices[:, 0, 1] = -sin
+        matrices[:, 1, 0] = sin
+        matrices[:, 1, 1] = cos
+    else:
+        matrices[:, 0, 0] = np.exp(-0.5j * radians)
+        matrices[:, 0, 1] = 0
+        matrices[:, 1, 0] = 0
+        matrices[:, 1, 1] = np.exp(0.5j * radians)
+    matrices[radians == 0] = FIXED_GATES[node_type]
+    return matrices
+
+
+def _axis(num_qubits, qubit):
+    # Axis of a qubit in a (batch, 2, 2, ...) view, with qubit 0 last
+    return num_qubits - qubit
+
+
+def _controlled_view(states, num_qubits, controls):
+    tensor = states.reshape((states.shape[0],) + (2,) * num_qubits)
+    index = [slice(None)] * (num_qubits + 1)
+    for control in controls:
+        index[_axis(num_qubits, control)] = 1
+    return tensor[tuple(index)]
+
+
+def _view_axis(num_qubits, qubit, controls):
+    axis = _axis(num_qubits, qubit)
+    return axis - sum(1 for control in controls if _axis(num_qubits, control) < axis)
+
+
+def apply_single_qubit_gate(states, num_qubits, target, matrices, controls=()):
+    """Apply a 2x2 matrix, or one matrix per state, to a target qubit in place"""
+    sub = _controlled_view(states, num_qubits, controls)
+    moved = np.moveaxis(sub, _view_axis(num_qubits, target, controls), -1)
+    if matrices.ndim == 2:
+        moved[...] = moved @ matrices.T
+    else:
+        moved[...] = np.einsum('b...j,bij->b...i', moved, matrices)
+    return states
+
+
+def apply_swap(states, num_qubits, wire_a, wire_b, controls=()):
+    """Swap two qubits in place, optionally controlled"""
+    sub = _controlled_view(states, num_qubits, controls)
+    axis_a = _view_axis(num_qubits, wire_a, controls)
+    axis_b = _view_axis(num_qubits, wire_b, controls)
+    index_01 = [slice(None)] * sub.ndim
+    index_10 = [slice(None)] * sub.ndim
+    index_01[axis_a], index_01[axis_b] = 0, 1
+    index_10[axis_a], index_10[axis_b] = 1, 0
+    saved = sub[tuple(index_01)].copy()
+    sub[tuple(index_01)] = sub[tuple(index_10)]
+    sub[tuple(index_10)] = saved
+    return states
+
+
+def initial_states(num_qubits, batch_size=1):
+    states = np.zeros((batch_size, 2 ** num_qubits), dtype=complex)
+    states[:, 0] = 1
+    return states
+
+
+def apply_gate_table(states, gate_table, num_qubits, params=None):
+    """Apply every gate in a gate table to a batch of states, in place.
+
+    params is None to use the angles stored in the table, or a
+    (batch, num_params) array supplying the angle of each rotation gate.
+    """
+    for row in gate_table:
+        apply_gate(states, row, num_qubits, params)
+    return states
+
+
+def apply_gate(states, row, num_qubits, params=None):
+    """Apply the gate in one gate table row to a batch of states, in place"""
+    node_type = int(row['node_type'])
+    wire = int(row['wire'])
+    ctrl_a = int(row['ctrl_a'])
+    ctrl_b = int(row['ctrl_b'])
+    param = int(row['param'])
+    if param >= 0 and params is not None:
+        radians = params[:, param]
+    else:
+        radians = float(row['radians'])
+
+    if node_type == node_types.SWAP:
+        controls = (ctrl_a,) if ctrl_a != -1 else ()
+        apply_swap(states, num_qubits, wire, int(row['swap']), controls)
+    elif node_type in (node_types.X, node_types.Y, node_types.Z):
+        if np.all(np.asarray(radians) == 0):
+            controls = tuple(ctrl for ctrl in (ctrl_a, ctrl_b) if ctrl != -1)
+            if node_type != node_types.X:
+                controls = controls[:1]
+            apply_single_qubit_gate(states, num_qubits, wire, FIXED_GATES[node_type], controls)
+        else:
+            # Only rotations about Z keep their control, as in compute_circuit
+            controls = (ctrl_a,) if node_type == node_types.Z and ctrl_a != -1 else ()
+            matrices = rotation_matrices(node_type, radians)
+            if len(matrices) == 1:
+                matrices = matrices[0]
+            apply_single_qubit_gate(states, num_qubits, wire, matrices, controls)
+    elif node_type in FIXED_GATES:
+        controls = (ctrl_a,) if node_type == node_types.H and ctrl_a != -1 else ()
+        apply_single_qubit_gate(states, num_qubits, wire, FIXED_GATES[node_type], controls)
+    return states
+
+
+def simulate_statevector(gate_table, num_qubits, params=None):
+    """Simulate a gate table from |0...0>.
+
+    params may be None, a parameter vector, or a (batch, num_params) array.
+    Returns a statevector, or one statevector per row of params.
+    """
+    if params is None:
+        return apply_gate_table(initial_states(num_qubits), gate_table, num_qubits)[0]
+
+    params = np.asarray(params, dtype=float)
+    batch_params = np.atleast_2d(params)
+    states = apply_gate_table(initial_states(num_qubits, len(batch_params)),
+                              gate_table, num_qubits, batch_params)
+    return states[0] if params.ndim == 1 else states
+
+
+def statevector_probabilities(states):
+    return np.abs(states) ** 2
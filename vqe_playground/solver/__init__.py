@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Module for solving MaxCut instances outside of the Pygame UI"""
+from .maxcut import maxcut_eigenvalues, maxcut_cost_matrix, batch_expectation_values, maxcut_pauli_sum, \
+    cut_value, basis_state_to_solution
+from .stepping import stepping_search, SteppingOptimizer
+from .optimizers import make_optimizer, AskTellOptimizer, SPSAOptimizer, ScipyOptimizer, OPTIMIZERS
+from .checkpoint import OptimizerState, CheckpointWriter, load_matching_checkpoint
+from .exact import exact_maxcut, MaxCutSolution
+from .pipeline import simulated_objective, qiskit_objective, solve_maxcut, score_ansatz
+from .trace import TraceRecorder, consolidate_trace, open_consolidated, read_runs, read_run
+from .replay import TraceReplay
+from .results_cache import ResultsCache, canonical_order, solve_config
+from .warm_start import WarmStarts, graph_change
+from .stop_criteria import StopCriteria, optimal_basis_states, STOP_REASONS
+from .cvar import CVaR, sample_cvar, distribution_cvar, sample_basis_states
+from .symmetry import reduced_maxcut_eigenvalues, expand_reduced
+from .benchmark import generate_corpus, run_benchmark, compare_results
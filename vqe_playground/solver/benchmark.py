@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark corpus of MaxCut graphs, a runner recording solver speed and quality, and
+a comparison of runs against a baseline.
+
+Corpora are generated from a seed, so the same corpus can be regenerated
+anywhere instead of being checked in. Each instance is solved by
+solve_maxcut(), which simulates and searches as the playground does.
+"""
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+from vqe_playground.model.ansatz import hardware_efficient_ansatz, qaoa_ansatz
+from vqe_playground.utils.states import MAX_NUM_QUBITS
+from .exact import clear_solution_cache
+from .pipeline import solve_maxcut
+from .stop_criteria import StopCriteria
+
+FAMILIES = ('erdos_renyi', 'regular', 'weighted')
+MIN_NUM_NODES = 5
+EDGE_PROBABILITY = 0.5
+REGULAR_DEGREE = 3
+MAX_EDGE_WEIGHT = 3
+
+# Relative change in a metric, in the worse direction, flagged as a regression
+DEFAULT_THRESHOLD = 0.1
+
+# Wall time changes below this many seconds are timer noise, not regressions
+WALL_TIME_FLOOR = 0.005
+
+# Metric recorded per instance, and whether larger values are better
+METRICS = (
+    ('wall_time', False),
+    ('evaluations', False),
+    ('peak_memory', False),
+    ('approximation_ratio', True),
+)
+
+
+def _erdos_renyi(rng, num_nodes, weights=None):
+    # Redraw until there is at least one edge, so every instance has a nonzero cut
+    while True:
+        edges = np.triu(rng.random_sample((num_nodes, num_nodes)) < EDGE_PROBABILITY, 1)
+        if edges.any():
+            break
+    if weights is None:
+        adj_matrix = edges.astype(float)
+    else:
+        adj_matrix = edges * rng.randint(1, weights + 1, size=edges.shape).astype(float)
+    return adj_matrix + adj_matrix.T
+
+
+def _regular(rng, num_nodes, degree):
+    # Pair up degree stubs per node at random, rejecting pairings with loops or repeated edges
+    stubs = np.repeat(np.arange(num_nodes), degree)
+    for _ in range(1000):
+        pairs = rng.permutation(stubs).reshape(-1, 2)
+        if np.any(pairs[:, 0] == pairs[:, 1]):
+            continue
+        adj_matrix = np.zeros((num_nodes, num_nodes))
+        np.add.at(adj_matrix, (pairs[:, 0], pairs[:, 1]), 1)
+        np.add.at(adj_matrix, (pairs[:, 1], pairs[:, 0]), 1)
+        if adj_matrix.max() == 1:
+            return adj_matrix
+    raise ValueError('No {}-regular graph found on {} nodes'.format(degree, num_nodes))
+
+
+def generate_graph(family, num_nodes, rng):
+    """Random adjacency matrix of one family: erdos_renyi, regular or weighted"""
+    if family == 'erdos_renyi':
+        return _erdos_renyi(rng, num_nodes)
+    if family == 'regular':
+        # A regular graph needs an even number of edge ends
+        degree = REGULAR_DEGREE + (num_nodes * REGULAR_DEGREE) % 2
+        return _regular(rng, num_nodes, degree)
+    if family == 'weighted':
+        return _erdos_renyi(rng, num_nodes, MAX_EDGE_WEIGHT)
+    raise ValueError('Unknown graph family: ' + str(family))
+
+
+def generate_corpus(seed=0, min_nodes=MIN_NUM_NODES, max_nodes=MAX_NUM_QUBITS, instances_per_size=1,
+                    families=FAMILIES):
+    """Corpus dict of instances, each with name, family and adj_matrix, for every size and family.
+
+    Each instance has a random stream of its own, derived from the seed,
+    family, size and index, so changing the sizes or families of a corpus
+    leaves the instances they share unchanged.
+    """
+    instances = []
+    for num_nodes in range(min_nodes, max_nodes + 1):
+        for family in families:
+            for index in range(instances_per_size):
+                rng = np.random.RandomState([seed, FAMILIES.index(family), num_nodes, index])
+                instances.append({
+                    'name': '{}_{:02d}_{}'.format(family, num_nodes, index),
+                    'family': family,
+                    'adj_matrix': generate_graph(family, num_nodes, rng).tolist(),
+                })
+    return {
+        'seed': seed,
+        'min_nodes': min_nodes,
+        'max_nodes': max_nodes,
+        'instances_per_size': instances_per_size,
+        'families': list(families),
+        'instances': instances,
+    }
+
+
+def _solve(adj_matrix, qaoa_layers, num_epochs, optimizer, stop_criteria, cvar, symmetry):
+    if qaoa_layers:
+        ansatz = qaoa_ansatz(adj_matrix, qaoa_layers)
+    else:
+        ansatz = hardware_efficient_ansatz(len(adj_matrix) - symmetry)
+    return solve_maxcut(adj_matrix, ansatz, num_epochs, optimizer=optimizer, stop_criteria=stop_criteria, cvar=cvar,
+                        symmetry=symmetry)
+
+
+def run_instance(instance, qaoa_layers=0, num_epochs=1, measure_memory=True, optimizer='stepping',
+                 stop_criteria=None, cvar=None, symmetry=False):
+    """Solve one corpus instance, returning its metrics.
+
+    Peak memory is measured with tracemalloc in a second solve, so that
+    tracing doesn't slow down the timed one. It is None without measure_memory.
+    Both solves start without a cached exact solution, so both count finding it.
+    """
+    adj_matrix = np.array(instance['adj_matrix'], dtype=float)
+    clear_solution_cache()
+    start_time = time.perf_counter()
+    result = _solve(adj_matrix, qaoa_layers, num_epochs, optimizer, stop_criteria, cvar, symmetry)
+    wall_time = time.perf_counter() - start_time
+
+    peak_memory = None
+    if measure_memory:
+        clear_solution_cache()
+        tracemalloc.start()
+        try:
+            _solve(adj_matrix, qaoa_layers, num_epochs, optimizer, stop_criteria, cvar, symmetry)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'name': instance['name'],
+        'family': instance.get('family'),
+        'num_nodes': len(adj_matrix),
+        'wall_time': wall_time,
+        'evaluations': result['evaluations'],
+        'approximation_ratio': result['approximation_ratio'],
+        'reached_optimum': result['reached_optimum'],
+        'stop_reason': result['stop_reason'],
+        'peak_memory': peak_memory,
+    }
+
+
+def run_benchmark(corpus, qaoa_layers=0, num_epochs=1, measure_memory=True, progress=None, optimizer='stepping',
+                  stop_criteria=None, cvar=None, symmetry=False):
+    """Solve every instance of a corpus, returning a dict of the settings and per-instance results.
+
+    qaoa_layers chooses a QAOA ansatz with that many layers, or 0 for the
+    hardware-efficient ansatz. optimizer, stop_criteria, cvar and symmetry are passed to
+    solve_maxcut(). progress, if given, is called with each result.
+    """
+    results = []
+    for instance in corpus['instances']:
+        results.append(run_instance(instance, qaoa_layers, num_epochs, measure_memory, optimizer,
+                                    stop_criteria, cvar, symmetry))
+        if progress is not None:
+            progress(results[-1])
+
+    config = {key: value for key, value in corpus.items() if key != 'instances'}
+    config.update(qaoa_layers=qaoa_layers, num_epochs=num_epochs)
+    # Recorded only when set, so baselines from before they could be chosen still compare
+    if optimizer != 'stepping':
+        config.update(optimizer=optimizer)
+    if stop_criteria is not None and stop_criteria.rules() != StopCriteria().rules():
+        config.update(stop_criteria=stop_criteria.rules())
+    if cvar is not None:
+        config.update(cvar=cvar.rules())
+    if symmetry:
+        config.update(symmetry=True)
+    return {
+        'config': config,
+        'results': results,
+        'totals': {
+            'wall_time': sum(result['wall_time'] for result in results),
+            'evaluations': sum(result['evaluations'] for result in results),
+            'mean_approximation_ratio': float(np.mean([result['approximation_ratio'] for result in results])),
+        },
+    }
+
+
+def _regression(metric, higher_is_better, baseline_value, value, threshold):
+    if baseline_value is None or value is None:
+        return None
+    change = value - baseline_value
+    if higher_is_better:
+        change = -change
+    if metric == 'wall_time' and change < WALL_TIME_FLOOR:
+        return None
+    if change <= threshold * abs(baseline_value):
+        return None
+    return {'metric': metric, 'baseline': baseline_value, 'value': value,
+            'change': change / abs(baseline_value) if baseline_value else float('inf')}
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Regressions of a benchmark run against a baseline run, as a list of dicts.
+
+    A metric regresses when it's worse than the baseline by more than
+    threshold, relative to the baseline value. Instances missing from the
+    current run are reported with the metric 'missing'. Runs with different
+    settings can't be compared, and raise ValueError.
+    """
+    if baseline['config'] != current['config']:
+        raise ValueError('Benchmark settings differ from the baseline: {} != {}'.format(
+            current['config'], baseline['config']))
+
+    current_results = {result['name']: result for result in current['results']}
+    regressions = []
+    for baseline_result in baseline['results']:
+        name = baseline_result['name']
+        result = current_results.get(name)
+        if result is None:
+            regressions.append({'name': name, 'metric': 'missing'})
+            continue
+        for metric, higher_is_better in METRICS:
+            regression = _regression(metric, higher_is_better, baseline_result.get(metric),
+                                     result.get(metric), threshold)
+            if regression is not None:
+                regression['name'] = name
+                regressions.append(regression)
+    return regressions
+
+
+def save_json(data, path):
+    with open(path, 'w') as json_file:
+        json.dump(data, json_file, indent=1)
+
+
+def load_json(path):
+    with open(path) as json_file:
+        return json.load(json_file)
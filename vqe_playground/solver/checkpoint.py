@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Serializable optimizer state, with periodic atomic checkpoints to compressed .npz files"""
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from vqe_playground.model.circuit_grid_model import gate_table_structure_hash
+from .objective_cache import adjacency_hash
+from .results_cache import objective_config
+
+CHECKPOINT_INTERVAL_SECONDS = 30
+
+CHECKPOINT_VERSION = 1
+
+
+class OptimizerState():
+    """Everything needed to continue a stepping search exactly where it stopped.
+
+    The adjacency matrix and gate table of the problem being solved are
+    stored alongside, with the objective_config() of its CVaR and symmetry
+    settings, so a checkpoint is only resumed for the same problem.
+    """
+    SCALAR_FIELDS = ('num_epochs', 'move_radians', 'target_cost', 'target_tolerance',
+                     'epoch', 'rotation_num', 'min_cost', 'rotation_initialized',
+                     'rotation_iterations', 'direction', 'cur_ang_rad', 'proposed_ang_rad',
+                     'num_evaluations')
+
+    def __init__(self, rotations, num_epochs, move_radians, target_cost=None, target_tolerance=0.0):
+        self.rotations = np.array(rotations, dtype=float)
+        self.num_epochs = num_epochs
+        self.move_radians = move_radians
+        self.target_cost = target_cost
+        self.target_tolerance = target_tolerance
+        self.epoch = 0
+        self.rotation_num = 0
+        self.min_cost = None
+        self.rotation_initialized = False
+        self.rotation_iterations = 0
+        self.direction = 1
+        self.cur_ang_rad = 0.0
+        self.proposed_ang_rad = 0.0
+        self.num_evaluations = 0
+        self.adj_matrix = None
+        self.gate_table = None
+        self.objective = objective_config()
+
+    def __str__(self):
+        return 'OptimizerState: epoch: ' + str(self.epoch) + ', rotation: ' + str(self.rotation_num) + \
+            '/' + str(len(self.rotations)) + ', min cost: ' + str(self.min_cost) + \
+            ', evaluations: ' + str(self.num_evaluations)
+
+    @property
+    def finished(self):
+        return self.epoch >= self.num_epochs
+
+    @property
+    def reached_target(self):
+        return self.target_cost is not None and self.min_cost is not None and \
+            self.min_cost <= self.target_cost + self.target_tolerance
+
+    def set_problem(self, adj_matrix, gate_table, cvar=None, symmetry=False):
+        self.adj_matrix = np.array(adj_matrix, dtype=float)
+        self.gate_table = None if gate_table is None else np.array(gate_table)
+        self.objective = objective_config(cvar, symmetry)
+        return self
+
+    def matches(self, adj_matrix, gate_table, cvar=None, symmetry=False):
+        """True if this state was saved for the same graph, circuit structure and objective"""
+        if self.adj_matrix is None or adjacency_hash(self.adj_matrix) != adjacency_hash(adj_matrix):
+            return False
+        if self.objective != objective_config(cvar, symmetry):
+            return False
+        if gate_table is None or self.gate_table is None:
+            return gate_table is None and self.gate_table is None
+        return gate_table_structure_hash(self.gate_table) == gate_table_structure_hash(gate_table)
+
+    def save(self, path):
+        """Write the state to path atomically, so a crash mid-write keeps the previous checkpoint"""
+        arrays = {'version': np.array(CHECKPOINT_VERSION), 'rotations': self.rotations,
+                  'objective': np.array(json.dumps(self.objective, sort_keys=True))}
+        for field in self.SCALAR_FIELDS:
+            value = getattr(self, field)
+            arrays[field] = np.array(np.nan if value is None else value)
+        if self.adj_matrix is not None:
+            arrays['adj_matrix'] = self.adj_matrix
+        if self.gate_table is not None:
+            arrays['gate_table'] = self.gate_table
+
+        directory = os.path.dirname(os.path.abspath(path))
+        handle, temp_path = tempfile.mkstemp(prefix='.checkpoint-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(handle, 'wb') as temp_file:
+                np.savez_compressed(temp_file, **arrays)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            if int(arrays['version']) != CHECKPOINT_VERSION:
+                raise ValueError('Unsupported checkpoint version: ' + str(int(arrays['version'])))
+            state = cls(arrays['rotations'], int(arrays['num_epochs']), float(arrays['move_radians']))
+            for field in cls.SCALAR_FIELDS:
+                value = arrays[field].item()
+                if isinstance(value, float) and np.isnan(value):
+                    value = None
+                setattr(state, field, value)
+            state.adj_matrix = arrays['adj_matrix'] if 'adj_matrix' in arrays else None
+            state.gate_table = arrays['gate_table'] if 'gate_table' in arrays else None
+            # Checkpoints from before objectives were recorded are of the expectation value
+            state.objective = json.loads(str(arrays['objective'])) if 'objective' in arrays else {}
+        return state
+
+
+def load_matching_checkpoint(path, adj_matrix, gate_table, cvar=None, symmetry=False):
+    """Return the unfinished state checkpointed at path for this problem, or None"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        state = OptimizerState.load(path)
+    except (OSError, ValueError, KeyError) as error:
+        print('Ignoring unreadable checkpoint', path, ':', error)
+        return None
+    if state.finished or not state.matches(adj_matrix, gate_table, cvar, symmetry):
+        return None
+    return state
+
+
+class CheckpointWriter():
+    """Saves an OptimizerState to one path at most every interval_seconds"""
+    def __init__(self, path, interval_seconds=CHECKPOINT_INTERVAL_SECONDS):
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.last_save = time.monotonic()
+        self.num_saves = 0
+
+    def maybe_save(self, state):
+        if time.monotonic() - self.last_save >= self.interval_seconds:
+            self.save(state)
+
+    def save(self, state):
+        state.save(self.path)
+        self.last_save = time.monotonic()
+        self.num_saves += 1
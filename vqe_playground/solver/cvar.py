@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""CVaR objective: the mean of the best fraction of sampled cut values"""
+import json
+
+import numpy as np
+
+DEFAULT_NUM_SHOTS = 1024
+
+
+def sample_basis_states(probabilities, num_shots, rng):
+    """Draw num_shots basis state indices from a probability vector, as one array"""
+    cumulative = np.cumsum(probabilities)
+    shots = np.searchsorted(cumulative, rng.random(num_shots) * cumulative[-1], side='right')
+    # Rounding may leave the last cumulative probability just below the draw
+    return np.minimum(shots, len(cumulative) - 1)
+
+
+def sample_cvar(values, alpha):
+    """Mean of the lowest ceil(alpha * len(values)) values, found by a partial sort"""
+    values = np.asarray(values, dtype=float)
+    count = max(1, int(np.ceil(alpha * len(values))))
+    if count >= len(values):
+        return float(np.mean(values))
+    return float(np.mean(np.partition(values, count - 1)[:count]))
+
+
+def distribution_cvar(eigenvalues, probabilities, alpha):
+    """CVaR of the eigenvalues over a probability vector, the limit of sample_cvar() over infinitely many shots"""
+    eigenvalues = np.asarray(eigenvalues, dtype=float)
+    order = np.argsort(eigenvalues)
+    weights = np.minimum(np.cumsum(np.asarray(probabilities, dtype=float)[order]), alpha)
+    weights = np.diff(weights, prepend=0.0)
+    return float(np.dot(eigenvalues[order], weights) / alpha)
+
+
+def tail_basis_state(eigenvalues, probabilities, alpha):
+    """Most probable of the lowest-eigenvalue basis states that make up alpha of the probability.
+
+    This is the cut a CVaR optimization finds: once its cost reaches the
+    lowest eigenvalue, every state in the tail is an optimal cut, even if
+    some worse state is more probable overall.
+    """
+    probabilities = np.asarray(probabilities, dtype=float)
+    order = np.argsort(eigenvalues)
+    cumulative = np.cumsum(probabilities[order])
+    tail = order[:np.searchsorted(cumulative, alpha * cumulative[-1]) + 1]
+    return int(tail[np.argmax(probabilities[tail])])
+
+
+class CVaR():
+    """Conditional value at risk, an objective that averages only the best alpha
+    fraction of measured eigenvalues rather than all of them.
+
+    Each evaluation samples num_shots basis states from the ansatz state
+    and averages the lowest ceil(alpha * num_shots) of their eigenvalues, so
+    the cost only falls to the lowest eigenvalue once an optimal cut is
+    measured often enough. With num_shots None the CVaR is computed exactly
+    from the probabilities. seed makes the shots of each optimization repeatable.
+    """
+    def __init__(self, alpha, num_shots=DEFAULT_NUM_SHOTS, seed=None):
+        if not 0 < alpha <= 1:
+            raise ValueError('CVaR alpha must be in (0, 1], not ' + str(alpha))
+        if num_shots is not None and num_shots < 1:
+            raise ValueError('CVaR needs at least one shot, not ' + str(num_shots))
+        self.alpha = alpha
+        self.num_shots = num_shots
+        self.seed = seed
+
+    def __str__(self):
+        return 'CVaR: ' + ', '.join(name + ': ' + str(value) for name, value in self.rules().items())
+
+    def rules(self):
+        """The settings as a JSON-friendly dict of constructor arguments"""
+        return {'alpha': self.alpha, 'num_shots': self.num_shots, 'seed': self.seed}
+
+    def fingerprint(self):
+        return 'cvar' + json.dumps(self.rules(), sort_keys=True)
+
+    def basis_state(self, eigenvalues, probabilities):
+        return tail_basis_state(eigenvalues, probabilities, self.alpha)
+
+    def estimator(self, eigenvalues):
+        """Return estimate(probabilities), the CVaR of one evaluation.
+
+        Each estimator draws its shots from its own random stream, so one is
+        needed per optimization.
+        """
+        eigenvalues = np.asarray(eigenvalues, dtype=float)
+        rng = np.random.default_rng(self.seed)
+
+        def estimate(probabilities):
+            if self.num_shots is None:
+                return distribution_cvar(eigenvalues, probabilities, self.alpha)
+            return sample_cvar(eigenvalues[sample_basis_states(probabilities, self.num_shots, rng)], self.alpha)
+        return estimate
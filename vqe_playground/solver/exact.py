@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Exact classical MaxCut, used as a reference answer and as a stopping oracle"""
+import collections
+import threading
+
+import numpy as np
+
+from .maxcut import basis_bits
+from .objective_cache import adjacency_hash
+
+# Up to this many nodes every cut is enumerated, beyond it branch and bound is used
+GRAY_CODE_MAX_NODES = 26
+
+# Number of nodes whose assignments are enumerated together as one NumPy vector
+GRAY_CODE_VECTOR_BITS = 16
+
+SOLUTION_CACHE_SIZE = 256
+
+
+class MaxCutSolution():
+    """Optimal cut of a graph, with a basis state string in comp_basis_states() order"""
+    def __init__(self, cut_value, sides, method):
+        self.cut_value = float(cut_value)
+        self.sides = np.asarray(sides, dtype=int)
+        self.method = method
+
+    def __str__(self):
+        return 'MaxCutSolution: cut: ' + str(self.cut_value) + ', basis state: ' + \
+            self.basis_state + ', method: ' + self.method
+
+    @property
+    def basis_state(self):
+        return ''.join(str(side) for side in self.sides[::-1])
+
+    def lowest_eigenvalue(self, maxcut_shift):
+        """Lowest eigenvalue of the MaxCut Hamiltonian built by maxcut_eigenvalues()"""
+        return -self.cut_value - maxcut_shift
+
+
+_solution_cache = collections.OrderedDict()
+_solution_cache_lock = threading.Lock()
+
+
+def clear_solution_cache():
+    """Forget every solution exact_maxcut() has cached, e.g. so that a benchmark measures solving them"""
+    with _solution_cache_lock:
+        _solution_cache.clear()
+
+
+def exact_maxcut(adj_matrix):
+    """Return the optimal MaxCutSolution for a weighted adjacency matrix, cached per matrix"""
+    key = adjacency_hash(adj_matrix)
+    with _solution_cache_lock:
+        if key in _solution_cache:
+            _solution_cache.move_to_end(key)
+            return _solution_cache[key]
+
+    weights = np.tril(np.asarray(adj_matrix, dtype=float), -1)
+    weights = weights + weights.T
+    if weights.shape[0] <= GRAY_CODE_MAX_NODES:
+        solution = gray_code_maxcut(weights)
+    else:
+        solution = branch_and_bound_maxcut(weights)
+
+    with _solution_cache_lock:
+        _solution_cache[key] = solution
+        while len(_solution_cache) > SOLUTION_CACHE_SIZE:
+            _solution_cache.popitem(last=False)
+    return solution
+
+
+def gray_code_maxcut(weights):
+    """Enumerate every cut with the last node fixed to side 0.
+
+    The first free nodes form a vector of all their assignments. The rest
+    are walked in Gray code order, so each step flips one node and updates
+    the whole vector of cut values with a single vectorized add.
+    """
+    num_nodes = weights.shape[0]
+    if num_nodes < 2:
+        return MaxCutSolution(0, np.zeros(num_nodes), 'gray_code')
+
+    fixed = num_nodes - 1
+    num_low = min(fixed, GRAY_CODE_VECTOR_BITS)
+    low = np.arange(num_low)
+    high = np.arange(num_low, fixed)
+
+    low_bits = basis_bits(num_low).astype(float)
+    low_weights = weights[np.ix_(low, low)]
+    cuts = low_bits @ low_weights.sum(axis=1) - np.sum((low_bits @ low_weights) * low_bits, axis=1)
+    cuts += low_bits @ weights[low, fixed]
+
+    # Weight from each high node to the low nodes on side 1, for every low assignment
+    to_low_side_1 = low_bits @ weights[np.ix_(low, high)]
+    cuts += to_low_side_1.sum(axis=1)
+    to_low = weights[np.ix_(low, high)].sum(axis=0)
+
+    high_sides = np.zeros(len(high), dtype=int)
+    high_cut = 0.0
+    best_idx = int(np.argmax(cuts))
+    best_cut = cuts[best_idx]
+    best_high_sides = high_sides.copy()
+
+    for step in range(1, 2 ** len(high)):
+        flip = (step & -step).bit_length() - 1
+        node = high[flip]
+        sign = 1 - 2 * high_sides[flip]
+        cuts += sign * (to_low[flip] - 2 * to_low_side_1[:, flip])
+
+        same_side = high_sides == high_sides[flip]
+        same_side[flip] = False
+        high_weights = weights[node, high]
+        high_cut += np.sum(high_weights[same_side]) - np.sum(high_weights[~same_side]) + high_weights[flip]
+        high_cut += sign * weights[node, fixed]
+        high_sides[flip] ^= 1
+
+        idx = int(np.argmax(cuts))
+        if cuts[idx] + high_cut > best_cut:
+            best_cut = cuts[idx] + high_cut
+            best_idx = idx
+            best_high_sides = high_sides.copy()
+
+    sides = np.zeros(num_nodes, dtype=int)
+    sides[low] = (best_idx >> low) & 1
+    sides[high] = best_high_sides
+    return MaxCutSolution(best_cut, sides, 'gray_code')
+
+
+def branch_and_bound_maxcut(weights):
+    """Depth-first branch and bound over node sides.
+
+    The bound adds, for every unassigned node, the larger of its cut
+    weights to the assigned nodes on either side, plus all positive weight
+    between unassigned nodes. A local search supplies the first incumbent.
+    """
+    num_nodes = weights.shape[0]
+    order = np.argsort(-np.abs(weights).sum(axis=1), kind='stable')
+    ordered = weights[np.ix_(order, order)]
+    positive = np.maximum(ordered, 0)
+
+    incumbent_sides = _local_search(ordered)
+    incumbent = [_cut_weight(ordered, incumbent_sides), incumbent_sides]
+
+    sides = np.zeros(num_nodes, dtype=int)
+    # gains[s, u]: weight that would be cut by putting unassigned node u on side s
+    gains = np.zeros((2, num_nodes))
+    remaining_positive = np.sum(np.triu(positive, 1))
+
+    def branch(depth, cut, gains, remaining_positive):
+        if depth == num_nodes:
+            if cut > incumbent[0]:
+                incumbent[0] = cut
+                incumbent[1] = sides.copy()
+            return
+
+        unassigned = slice(depth, num_nodes)
+        bound = cut + np.sum(np.max(gains[:, unassigned], axis=0)) + remaining_positive
+        if bound <= incumbent[0] + 1e-9:
+            return
+
+        # The first node stays on side 0, as flipping every side gives the same cut
+        choices = (0,) if depth == 0 else tuple(np.argsort(-gains[:, depth], kind='stable'))
+        later = slice(depth + 1, num_nodes)
+        next_remaining = remaining_positive - np.sum(positive[depth, later])
+        for side in choices:
+            sides[depth] = side
+            next_gains = gains.copy()
+            next_gains[1 - side, later] += ordered[depth, later]
+            branch(depth + 1, cut + gains[side, depth], next_gains, next_remaining)
+
+    branch(0, 0.0, gains, remaining_positive)
+
+    result = np.zeros(num_nodes, dtype=int)
+    result[order] = incumbent[1]
+    if result[-1] == 1:
+        result ^= 1
+    return MaxCutSolution(incumbent[0], result, 'branch_and_bound')
+
+
+def _cut_weight(weights, sides):
+    crossing = sides[:, np.newaxis] != sides[np.newaxis, :]
+    return 0.5 * float(np.sum(weights * crossing))
+
+
+def _local_search(weights):
+    """Greedy single-node flips from an all-zero assignment until no flip improves the cut"""
+    sides = np.zeros(weights.shape[0], dtype=int)
+    while True:
+        spins = 1 - 2 * sides
+        # Cut gained by flipping each node
+        flip_gains = spins * (weights @ spins)
+        node = int(np.argmax(flip_gains))
+        if flip_gains[node] <= 1e-12:
+            return sides
+        sides[node] ^= 1
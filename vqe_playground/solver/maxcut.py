@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""MaxCut Hamiltonian construction, done directly on the diagonal"""
+import numpy as np
+
+from vqe_playground.sim.pauli import PauliSum
+
+
+def basis_bits(num_qubits):
+    """Return a (2**num_qubits, num_qubits) array whose [x, i] entry is bit i of x"""
+    return (np.arange(2 ** num_qubits)[:, np.newaxis] >> np.arange(num_qubits)) & 1
+
+
+def maxcut_eigenvalues(adj_matrix):
+    """Return the diagonal of the MaxCut Ising Hamiltonian, and its constant shift.
+
+    This matches the diagonal of Aqua's max_cut.get_operator(): each edge
+    (i, j) with i > j contributes 0.5 * w_ij * Z_i Z_j, so eigenvalue + shift
+    is minus the weight of the cut described by each basis state.
+    """
+    cost_matrix, shifts = maxcut_cost_matrix(np.asarray(adj_matrix)[np.newaxis])
+    return cost_matrix[0], shifts[0]
+
+
+def maxcut_cost_matrix(adj_matrices):
+    """Return a (graphs, 2**n) matrix of Hamiltonian diagonals for a stack of
+    (graphs, n, n) adjacency matrices, and the shift of each graph"""
+    weights = np.tril(np.asarray(adj_matrices, dtype=float), -1)
+    spins = (1 - 2 * basis_bits(weights.shape[-1])).astype(float)
+    cost_matrix = 0.5 * np.einsum('xj,gxj->gx', spins, np.einsum('xi,gij->gxj', spins, weights))
+    shifts = -0.5 * np.sum(weights, axis=(1, 2))
+    return cost_matrix, shifts
+
+
+def batch_expectation_values(cost_matrix, probabilities):
+    """Expectation value of every graph's Hamiltonian.
+
+    probabilities is one probability vector, giving a (graphs,) result from
+    one matrix-vector product, or a (states, 2**n) batch, giving (graphs, states).
+    """
+    probabilities = np.asarray(probabilities, dtype=float)
+    return cost_matrix @ probabilities.T
+
+
+def maxcut_pauli_sum(adj_matrix):
+    """Return the MaxCut Hamiltonian as a PauliSum of ZZ terms, and its constant shift"""
+    weights = np.tril(np.asarray(adj_matrix, dtype=float), -1)
+    num_qubits = weights.shape[0]
+    terms = []
+    for i, j in zip(*np.nonzero(weights)):
+        label = ['I'] * num_qubits
+        label[num_qubits - 1 - i] = label[num_qubits - 1 - j] = 'Z'
+        terms.append((0.5 * weights[i, j], ''.join(label)))
+    if not terms:
+        terms.append((0.0, 'I' * num_qubits))
+    return PauliSum(terms), -0.5 * np.sum(weights)
+
+
+def basis_state_to_solution(basis_state_str):
+    """Convert a basis state string, highest qubit first, into a 0/1 array of the same order"""
+    return np.array([int(char) for char in basis_state_str])
+
+
+def cut_value(adj_matrix, basis_state_str):
+    """Total weight of the edges cut by a basis state string (character 0 is the last node)"""
+    sides = basis_state_to_solution(basis_state_str)[::-1]
+    adj_matrix = np.asarray(adj_matrix, dtype=float)
+    crossing = sides[:, np.newaxis] != sides[np.newaxis, :]
+    return float(np.sum(np.tril(adj_matrix, -1) * crossing))
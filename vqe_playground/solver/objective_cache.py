@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Memoization of objective evaluations keyed by angle vectors.
+
+The stepping search only ever moves angles by multiples of pi/8, so its
+keys are quantized and revisited points hit even after rounding drift.
+Continuous optimizers such as COBYLA or SPSA evaluate points arbitrarily
+close together, which a quantized key would confuse, so their keys are
+the exact bytes of the angle vector.
+"""
+import collections
+import hashlib
+import threading
+
+import numpy as np
+
+DEFAULT_CACHE_SIZE = 4096
+
+# Angles are rounded to this resolution before being used as keys. It divides the
+# pi/8 steps of the stepping search, so revisited grid points always hit
+ANGLE_RESOLUTION = np.pi / 1024
+
+
+def adjacency_hash(adj_matrix):
+    adj_matrix = np.ascontiguousarray(adj_matrix, dtype=float)
+    return hashlib.sha1(str(adj_matrix.shape).encode() + adj_matrix.tobytes()).hexdigest()
+
+
+class ObjectiveCache():
+    """Bounded LRU cache of objective values with hit and miss counters.
+
+    Keys are (adjacency hash, structure hash, angles), so one cache can be
+    shared by solves of different graphs and circuits. The angles are
+    quantized to resolution, or with quantize=False kept exactly.
+    """
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, resolution=ANGLE_RESOLUTION):
+        self.maxsize = maxsize
+        self.resolution = resolution
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, adj_hash, structure_hash, rotations, quantize=True):
+        if not quantize:
+            return adj_hash, structure_hash, np.asarray(rotations, dtype=float).tobytes()
+        quantized = np.rint(np.asarray(rotations, dtype=float) / self.resolution).astype(np.int64)
+        return adj_hash, structure_hash, tuple(quantized.tolist())
+
+    def get(self, key):
+        """Return the cached value for key, or None, counting a hit or a miss"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def wrap(self, objective, adj_matrix, structure_hash, quantize=True):
+        """Return objective(rotations), evaluating the wrapped objective only on a miss"""
+        adj_hash = adjacency_hash(adj_matrix)
+
+        def cached_objective(rotations):
+            key = self.key(adj_hash, structure_hash, rotations, quantize)
+            value = self.get(key)
+            if value is None:
+                value = objective(rotations)
+                self.put(key, value)
+            return value
+        return cached_objective
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
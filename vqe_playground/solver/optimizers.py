@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Interchangeable optimizers over the rotation vector, all stepped one evaluation at a time.
+
+Every optimizer has the interface of SteppingOptimizer: step(objective)
+makes one objective evaluation, steps() yields the OptimizerState after
+each, and run() goes to completion. The state's rotations and min_cost
+are the best found so far, so the playground can show them while an
+optimizer of any kind is running, a few evaluations per frame.
+"""
+import queue
+import threading
+
+import numpy as np
+
+from vqe_playground.utils.imports import lazy_import
+from .checkpoint import OptimizerState
+from .stepping import SteppingOptimizer, MOVE_RADIANS, TARGET_TOLERANCE
+from .stop_criteria import StopCriteria
+
+OPTIMIZERS = ('stepping', 'cobyla', 'nelder-mead', 'powell', 'spsa')
+
+SCIPY_METHODS = {
+    'cobyla': 'COBYLA',
+    'nelder-mead': 'Nelder-Mead',
+    'powell': 'Powell',
+}
+
+# Evaluations allowed to optimizers with no natural end, unless evaluations or time are bounded
+DEFAULT_MAX_EVALUATIONS = 1000
+
+# SPSA gain sequences, from Spall's guidelines
+SPSA_ALPHA = 0.602
+SPSA_GAMMA = 0.101
+SPSA_PERTURBATION = 0.2
+
+# SPSA iterations that only measure gradients, to set the step size before moving
+SPSA_CALIBRATION_ITERATIONS = 5
+
+# Length of the first SPSA move, of all the angles together
+SPSA_FIRST_STEP = np.pi / 16
+
+
+class AskTellOptimizer():
+    """Base of optimizers driven by asking for a point and being told its cost.
+
+    Subclasses implement ask(), returning the next rotations to evaluate
+    or None when they have converged, and may implement _tell() to learn
+    the cost. The search also stops when the cost reaches target_cost or
+    one of stop_criteria applies, and stop_reason says why it stopped.
+    Criteria that bound neither evaluations nor time get a bound of
+    DEFAULT_MAX_EVALUATIONS. For the no_improvement criterion, an epoch is
+    as many evaluations as there are rotations.
+    """
+    resumable = False
+    # Points may be arbitrarily close together, so cache keys must be exact
+    quantized_angles = False
+
+    def __init__(self, initial_rotations, stop_criteria=None, target_cost=None, target_tolerance=TARGET_TOLERANCE):
+        # One epoch, ended by finish(). No single rotation is being moved, so rotation_num is past them all
+        self.state = OptimizerState(initial_rotations, 1, MOVE_RADIANS, target_cost, target_tolerance)
+        self.state.rotation_num = len(self.state.rotations)
+        stop_criteria = stop_criteria or StopCriteria()
+        if not stop_criteria.bounded:
+            stop_criteria = stop_criteria.replace(max_evaluations=DEFAULT_MAX_EVALUATIONS)
+        self.stop_monitor = stop_criteria.monitor()
+        self.stop_reason = None
+
+    @property
+    def finished(self):
+        return self.state.finished
+
+    @property
+    def reached_target(self):
+        return self.state.reached_target
+
+    @property
+    def completed_epochs(self):
+        return self.state.num_evaluations // max(len(self.state.rotations), 1)
+
+    def note_evaluation(self, rotations, basis_state):
+        """Called by objectives with the most probable basis state of the rotations they evaluate"""
+        self.stop_monitor.note_evaluation(rotations, basis_state)
+
+    def ask(self):
+        raise NotImplementedError
+
+    def tell(self, rotations, cost):
+        """Record the cost of rotations returned by ask(), keeping the best rotations in the state"""
+        state = self.state
+        state.num_evaluations += 1
+        if state.min_cost is None or cost < state.min_cost:
+            state.min_cost = cost
+            state.rotations[:] = rotations
+        if self.reached_target:
+            self.finish('target_cost')
+        else:
+            self._tell(rotations, cost)
+
+    def _tell(self, rotations, cost):
+        pass
+
+    def finish(self, reason):
+        self.stop_reason = reason
+        self.state.epoch = self.state.num_epochs
+        self.close()
+
+    def step(self, objective):
+        """Make one objective evaluation, returning False once the search has finished"""
+        if self.finished:
+            return False
+        reason = self.stop_monitor.check(self.state, self.completed_epochs)
+        if reason is not None:
+            self.finish(reason)
+            return False
+        rotations = self.ask()
+        if rotations is None:
+            self.finish('converged')
+        else:
+            self.tell(rotations, objective(rotations))
+        return not self.finished
+
+    def steps(self, objective):
+        while self.step(objective):
+            yield self.state
+
+    def run(self, objective, checkpoint=None, callback=None):
+        """Step until finished, calling callback with the state after every step.
+
+        States of these optimizers can't be resumed, so checkpoint is only
+        accepted for compatibility with SteppingOptimizer.run().
+        """
+        for state in self.steps(objective):
+            if callback is not None:
+                callback(state)
+        return self.state.rotations, self.state.min_cost, self.state.num_evaluations
+
+    def close(self):
+        """Release anything held by an unfinished search"""
+
+
+class SPSAOptimizer(AskTellOptimizer):
+    """Simultaneous perturbation stochastic approximation.
+
+    Each iteration evaluates two points, perturbed in opposite directions
+    along a random +-1 vector, and moves along the gradient they estimate,
+    with the gain a / (A + k + 1) ** alpha at iteration k. The gain a is
+    calibrated from the gradient norms of the first few iterations so that
+    a typical first move has length first_step, and no angle moves further
+    than move_radians in one iteration.
+    """
+    def __init__(self, initial_rotations, stop_criteria=None, target_cost=None, target_tolerance=TARGET_TOLERANCE,
+                 perturbation=SPSA_PERTURBATION, first_step=SPSA_FIRST_STEP, move_radians=MOVE_RADIANS, seed=0):
+        AskTellOptimizer.__init__(self, initial_rotations, stop_criteria, target_cost, target_tolerance)
+        self.perturbation = perturbation
+        self.first_step = first_step
+        self.move_radians = move_radians
+        self.rng = np.random.RandomState(seed)
+        self.rotations = self.state.rotations.copy()
+        self.iteration = 0
+        # Offset of the step size sequence, a tenth of the expected iterations
+        self.stability = 0.1 * (self.stop_monitor.criteria.max_evaluations or DEFAULT_MAX_EVALUATIONS) / 2
+        self.step_size = None
+        self.calibration = []
+        self.delta = None
+        self.plus_cost = None
+
+    def _perturbation(self):
+        return self.perturbation / (self.iteration + 1) ** SPSA_GAMMA
+
+    def ask(self):
+        if self.delta is None:
+            self.delta = self.rng.choice([-1.0, 1.0], size=len(self.rotations))
+            return self.rotations + self._perturbation() * self.delta
+        return self.rotations - self._perturbation() * self.delta
+
+    def _tell(self, rotations, cost):
+        if self.plus_cost is None:
+            self.plus_cost = cost
+            return
+
+        gradient = (self.plus_cost - cost) / (2 * self._perturbation()) * self.delta
+        self.delta = None
+        self.plus_cost = None
+        if self.step_size is None:
+            self.calibration.append(np.linalg.norm(gradient))
+            if len(self.calibration) < SPSA_CALIBRATION_ITERATIONS:
+                return
+            magnitude = np.mean(self.calibration)
+            self.step_size = self.first_step * (self.stability + 1) ** SPSA_ALPHA / magnitude if magnitude else \
+                self.first_step
+
+        gain = self.step_size / (self.iteration + 1 + self.stability) ** SPSA_ALPHA
+        self.rotations = self.rotations - np.clip(gain * gradient, -self.move_radians, self.move_radians)
+        self.iteration += 1
+
+
+class _Stopped(Exception):
+    pass
+
+
+class ScipyOptimizer(AskTellOptimizer):
+    """A scipy.optimize.minimize method, e.g. COBYLA, Nelder-Mead or Powell, driven by ask and tell.
+
+    minimize() runs on a thread of its own and blocks in the objective
+    until each point it asks for has been evaluated by whoever steps this
+    optimizer, so evaluations still happen on the caller's thread. An
+    exception raised by minimize() is raised again from ask() on that thread.
+    """
+    def __init__(self, initial_rotations, method='COBYLA', stop_criteria=None, target_cost=None,
+                 target_tolerance=TARGET_TOLERANCE, options=None):
+        AskTellOptimizer.__init__(self, initial_rotations, stop_criteria, target_cost, target_tolerance)
+        self.method = method
+        self.options = options or {}
+        # Imported here rather than on the minimize() thread, so a time budget doesn't include it
+        self.optimize = lazy_import('scipy.optimize')
+        self._requests = queue.Queue()
+        self._replies = queue.Queue()
+        self._thread = None
+        self._closed = False
+        self._error = None
+
+    def ask(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._minimize, name='scipy-' + self.method.lower(),
+                                            daemon=True)
+            self._thread.start()
+        rotations = self._requests.get()
+        if rotations is None and self._error is not None:
+            raise self._error
+        return rotations
+
+    def _tell(self, rotations, cost):
+        self._replies.put(cost)
+
+    def close(self):
+        # Stop minimize() the next time it waits for a cost, so its thread ends
+        if self._thread is not None and not self._closed:
+            self._closed = True
+            self._replies.put(None)
+
+    def _minimize(self):
+        try:
+            self.optimize.minimize(self._objective, self.state.rotations.copy(), method=self.method,
+                                   options=self.options)
+        except _Stopped:
+            pass
+        except Exception as error:
+            # Raised again by ask(), on the thread stepping this optimizer
+            self._error = error
+        finally:
+            self._requests.put(None)
+
+    def _objective(self, rotations):
+        self._requests.put(np.array(rotations, dtype=float))
+        cost = self._replies.get()
+        if cost is None:
+            raise _Stopped()
+        return cost
+
+
+def make_optimizer(name, initial_rotations, num_epochs=1, max_evaluations=None, target_cost=None,
+                   target_tolerance=TARGET_TOLERANCE, stop_criteria=None):
+    """Create an optimizer by name, one of OPTIMIZERS.
+
+    num_epochs only applies to the stepping search. The others run until
+    they converge, reach target_cost or meet stop_criteria, a StopCriteria.
+    max_evaluations, if given, replaces the evaluation budget of stop_criteria.
+    """
+    stop_criteria = stop_criteria or StopCriteria()
+    if max_evaluations is not None:
+        stop_criteria = stop_criteria.replace(max_evaluations=max_evaluations)
+    if name == 'stepping':
+        return SteppingOptimizer(initial_rotations, num_epochs, target_cost=target_cost,
+                                 target_tolerance=target_tolerance, stop_criteria=stop_criteria)
+    if name == 'spsa':
+        return SPSAOptimizer(initial_rotations, stop_criteria, target_cost, target_tolerance)
+    if name in SCIPY_METHODS:
+        return ScipyOptimizer(initial_rotations, SCIPY_METHODS[name], stop_criteria, target_cost,
+                              target_tolerance)
+    raise ValueError('Unknown optimizer: ' + str(name) + ', expected one of ' + ', '.join(OPTIMIZERS))
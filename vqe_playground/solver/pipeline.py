@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""MaxCut pipeline: Hamiltonian diagonal, simulated ansatz and a choice of optimizer"""
+import numpy as np
+
+from vqe_playground.model.ansatz import hardware_efficient_ansatz, QAOATemplate
+from vqe_playground.sim.qaoa import qaoa_objective, qaoa_statevector
+from vqe_playground.sim.parametric import parametric_statevector
+from vqe_playground.sim.statevector import simulate_statevector, statevector_probabilities
+from .checkpoint import CheckpointWriter, load_matching_checkpoint
+from .exact import exact_maxcut
+from .objective_cache import adjacency_hash
+from .results_cache import solve_config
+from .maxcut import maxcut_eigenvalues, maxcut_cost_matrix, batch_expectation_values, cut_value
+from .optimizers import make_optimizer
+from .stepping import SteppingOptimizer, TARGET_TOLERANCE
+from .stop_criteria import StopCriteria
+from .warm_start import choose_start
+from .symmetry import reduced_maxcut_eigenvalues, expand_reduced
+
+
+def simulated_objective(gate_table, num_qubits, eigenvalues):
+    """Return objective(rotations), the expectation value of the ansatz state"""
+    def objective(rotations):
+        state = simulate_statevector(gate_table, num_qubits, rotations)
+        return float(np.dot(eigenvalues, statevector_probabilities(state)))
+    return objective
+
+
+def qiskit_objective(gate_table, num_qubits, eigenvalues):
+    """Like simulated_objective(), but simulated by Qiskit, binding one circuit per structure"""
+    def objective(rotations):
+        state = parametric_statevector(gate_table, num_qubits, rotations)
+        return float(np.dot(eigenvalues, statevector_probabilities(np.asarray(state))))
+    return objective
+
+
+def ansatz_statevector(ansatz, eigenvalues, params):
+    """Simulate an ansatz, using the diagonal fast path for QAOA templates"""
+    if isinstance(ansatz, QAOATemplate):
+        return qaoa_statevector(eigenvalues, params)
+    return simulate_statevector(ansatz.gate_table(), ansatz.num_qubits, params)
+
+
+def solution_basis_state(eigenvalues, probs, cvar=None):
+    """Index of the basis state read out as the cut: the most probable one, or with a CVaR, its tail's"""
+    if cvar is None:
+        return int(np.argmax(probs))
+    return cvar.basis_state(eigenvalues, probs)
+
+
+def recording_objective(ansatz, eigenvalues, trace=None, optimizer=None, cvar=None, symmetry=False):
+    """Return objective(params) that records each evaluation, with its probabilities, to a TraceRecorder,
+    and reports its solution basis state to an optimizer, for its stop criteria.
+
+    The cost is the expectation value or, with a CVaR, its estimate from sampled shots.
+    With symmetry, the ansatz simulates a reduced problem, and the trace gets full-size probabilities.
+    """
+    estimate = cvar.estimator(eigenvalues) if cvar is not None else None
+
+    def objective(params):
+        probs = statevector_probabilities(ansatz_statevector(ansatz, eigenvalues, params))
+        cost = float(np.dot(eigenvalues, probs)) if estimate is None else estimate(probs)
+        basis_state = solution_basis_state(eigenvalues, probs, cvar)
+        if trace is not None:
+            trace.record(params, cost, basis_state, expand_reduced(probs) if symmetry else probs)
+        if optimizer is not None:
+            optimizer.note_evaluation(params, basis_state)
+        return cost
+    return objective
+
+
+def _recorded(objective, trace):
+    # Objectives supplied by callers only give a cost, so no basis state (-1) or probabilities
+    def recorded_objective(params):
+        cost = objective(params)
+        trace.record(params, cost, -1)
+        return cost
+    return recorded_objective
+
+
+def _noted(objective, ansatz, eigenvalues, optimizer, cvar):
+    # Objectives supplied by callers, or cached, only give a cost, so the basis state is simulated separately
+    def noted_objective(params):
+        cost = objective(params)
+        probs = statevector_probabilities(ansatz_statevector(ansatz, eigenvalues, params))
+        optimizer.note_evaluation(params, solution_basis_state(eigenvalues, probs, cvar))
+        return cost
+    return noted_objective
+
+
+def solve_maxcut(adj_matrix, ansatz=None, num_epochs=1, objective=None, cache=None, checkpoint_path=None,
+                 trace=None, results_cache=None, warm_starts=None, optimizer='stepping', max_evaluations=None,
+                 stop_criteria=None, cvar=None, symmetry=False):
+    """Optimize an ansatz for a MaxCut instance, returning a JSON-friendly dict of results.
+
+    objective defaults to simulated_objective(); callers may supply their
+    own, e.g. one that batches evaluations, as long as it computes the same cost.
+    Evaluations are memoized in cache, an ObjectiveCache, when one is given,
+    by exact angles unless the optimizer is the stepping search.
+    The search stops as soon as the exact optimum's eigenvalue is reached.
+    With checkpoint_path, progress is checkpointed there periodically and an
+    unfinished checkpoint of the same graph and ansatz is resumed.
+    Each evaluation is recorded as a new run in trace, a TraceRecorder, if one is given.
+    With results_cache, a ResultsCache, a graph solved before with the same
+    setup (or, for QAOA, any relabeling of it) returns at once, with 'cached' set.
+    Only solves that started from the initial angles are added to it.
+    With warm_starts, a WarmStarts, the search starts from the angles of
+    the nearest graph solved before, if it is close enough and starts at a
+    lower cost than the initial angles, with 'warm_start' set.
+    optimizer names one of optimizers.OPTIMIZERS, and max_evaluations
+    bounds its objective evaluations. Only the stepping search can be checkpointed.
+    stop_criteria, a StopCriteria, may stop the search early, and the result's
+    'stop_reason' says what ended it.
+    With cvar, a CVaR, every optimizer minimizes the CVaR of sampled eigenvalues
+    instead of the expectation value, so 'cost' is the CVaR and the result
+    also has the exact 'expectation_value' of the rotations found. Its
+    'basis_state' is then the most probable state of the best alpha of the probability.
+    The stop at the optimum compares the CVaR with the lowest eigenvalue, which
+    it reaches once optimal cuts make up alpha of the shots, while
+    'approximation_ratio' and 'reached_optimum' judge the expectation value.
+    With symmetry, the last node is kept on side 0 and the ansatz, by default
+    a hardware-efficient one, simulates the other n - 1 nodes. A QAOA template
+    of the whole graph simulates the reduced Hamiltonian.
+    """
+    if checkpoint_path and optimizer != 'stepping':
+        raise ValueError('Only the stepping search can be checkpointed, not ' + str(optimizer))
+    if cvar is not None and objective is not None:
+        raise ValueError('The CVaR is estimated from probabilities, so it needs the built-in objective')
+    adj_matrix = np.asarray(adj_matrix, dtype=float)
+    num_qubits = adj_matrix.shape[0]
+    sim_qubits = num_qubits - 1 if symmetry else num_qubits
+    ansatz = ansatz or hardware_efficient_ansatz(sim_qubits)
+    if not isinstance(ansatz, QAOATemplate) and ansatz.num_qubits != sim_qubits:
+        raise ValueError('The ansatz has {} qubits, but the graph needs {}'.format(ansatz.num_qubits, sim_qubits))
+    if symmetry:
+        eigenvalues, shift = reduced_maxcut_eigenvalues(adj_matrix)
+    else:
+        eigenvalues, shift = maxcut_eigenvalues(adj_matrix)
+    optimum = exact_maxcut(adj_matrix)
+    lowest_eigenvalue = optimum.lowest_eigenvalue(shift)
+    config, permutation_invariant = solve_config(ansatz, num_epochs, optimizer=optimizer,
+                                                 max_evaluations=max_evaluations, stop_criteria=stop_criteria,
+                                                 cvar=cvar, symmetry=symmetry)
+    if results_cache is not None:
+        cached = results_cache.get(adj_matrix, config, permutation_invariant)
+        if cached is not None:
+            expectation_value = None
+            if cvar is not None:
+                probs = statevector_probabilities(ansatz_statevector(ansatz, eigenvalues, cached['rotations']))
+                expectation_value = float(np.dot(eigenvalues, probs))
+            return _solve_result(adj_matrix, shift, optimum, cached['rotations'], cached['cost'],
+                                 cached['basis_state'], 0, cached=True, stop_reason='cached',
+                                 expectation_value=expectation_value)
+
+    initial_parameters = ansatz.initial_parameters()
+    warm_start = False
+    if warm_starts is not None:
+        def start_cost(params):
+            probs = statevector_probabilities(ansatz_statevector(ansatz, eigenvalues, params))
+            return float(np.dot(eigenvalues, probs))
+        initial_parameters, warm_start = choose_start(start_cost, warm_starts.get(config, adj_matrix),
+                                                      initial_parameters)
+
+    checkpoint = state = None
+    if checkpoint_path:
+        checkpoint = CheckpointWriter(checkpoint_path)
+        state = load_matching_checkpoint(checkpoint_path, adj_matrix, ansatz.gate_table(), cvar, symmetry)
+    stop_criteria = (stop_criteria or StopCriteria()).for_problem(eigenvalues, lowest_eigenvalue)
+    if max_evaluations is not None:
+        stop_criteria = stop_criteria.replace(max_evaluations=max_evaluations)
+    if state is not None:
+        search = SteppingOptimizer(state=state, stop_criteria=stop_criteria)
+    else:
+        search = make_optimizer(optimizer, initial_parameters, num_epochs, target_cost=lowest_eigenvalue,
+                                stop_criteria=stop_criteria)
+        search.state.set_problem(adj_matrix, ansatz.gate_table(), cvar, symmetry)
+
+    # Only the optimal basis state rule needs to hear the basis state of each evaluation.
+    # Cache hits skip the objective, so with a cache the basis state is simulated outside it
+    noted_optimizer = search if stop_criteria.optimal_basis_states is not None else None
+    noted_inside = noted_optimizer is not None and objective is None and cache is None
+    if trace is not None:
+        trace.start_run(ansatz=str(ansatz), adjacency=adjacency_hash(adj_matrix),
+                        adj_matrix=np.asarray(adj_matrix).tolist(), num_epochs=num_epochs)
+    if objective is not None:
+        if trace is not None:
+            objective = _recorded(objective, trace)
+    elif trace is not None or noted_inside or cvar is not None:
+        objective = recording_objective(ansatz, eigenvalues, trace, noted_optimizer if noted_inside else None,
+                                        cvar, symmetry)
+    elif isinstance(ansatz, QAOATemplate):
+        objective = qaoa_objective(eigenvalues)
+    else:
+        objective = simulated_objective(ansatz.gate_table(), sim_qubits, eigenvalues)
+    if cache is not None:
+        structure_hash = ansatz.structure_hash()
+        if cvar is not None:
+            # CVaR costs must not be mistaken for expectation values of the same angles
+            structure_hash += cvar.fingerprint()
+        if symmetry:
+            # A QAOA template is the same for the full and the reduced Hamiltonian
+            structure_hash += 'z2'
+        objective = cache.wrap(objective, adj_matrix, structure_hash, search.quantized_angles)
+    if noted_optimizer is not None and not noted_inside:
+        objective = _noted(objective, ansatz, eigenvalues, noted_optimizer, cvar)
+
+    rotations, cost, num_evaluations = search.run(objective, checkpoint)
+
+    probs = statevector_probabilities(ansatz_statevector(ansatz, eigenvalues, rotations))
+    basis_state = format(solution_basis_state(eigenvalues, probs, cvar), '0' + str(num_qubits) + 'b')
+    result = _solve_result(adj_matrix, shift, optimum, rotations, cost, basis_state, num_evaluations,
+                           warm_start=warm_start, stop_reason=search.stop_reason,
+                           expectation_value=float(np.dot(eigenvalues, probs)) if cvar is not None else None)
+    # The key describes the initial angles, so warm-started results aren't stored
+    if results_cache is not None and not warm_start:
+        results_cache.put(adj_matrix, config, result, permutation_invariant)
+    if warm_starts is not None:
+        warm_starts.put(config, adj_matrix, rotations)
+    return result
+
+
+def _solve_result(adj_matrix, shift, optimum, rotations, cost, basis_state, num_evaluations, cached=False,
+                  warm_start=False, stop_reason=None, expectation_value=None):
+    # The approximation ratio and reached_optimum always judge the expectation value,
+    # which is the cost unless a CVaR was minimized
+    lowest_eigenvalue = optimum.lowest_eigenvalue(shift)
+    quality_cost = cost if expectation_value is None else expectation_value
+    result = {
+        'rotations': np.asarray(rotations, dtype=float).tolist(),
+        'cost': float(cost),
+        'maxcut_shift': float(shift),
+        'basis_state': basis_state,
+        'cut_value': cut_value(adj_matrix, basis_state),
+        'evaluations': num_evaluations,
+        'optimal_cut_value': optimum.cut_value,
+        'optimal_basis_state': optimum.basis_state,
+        'approximation_ratio': float(-(quality_cost + shift) / optimum.cut_value) if optimum.cut_value > 0 else 1.0,
+        'reached_optimum': bool(quality_cost <= lowest_eigenvalue + TARGET_TOLERANCE),
+        'cached': cached,
+        'warm_start': warm_start,
+        'stop_reason': stop_reason,
+    }
+    if expectation_value is not None:
+        result['expectation_value'] = float(expectation_value)
+    return result
+
+
+def score_ansatz(adj_matrices, ansatz, rotations=None):
+    """Expectation values of one ansatz against a stack of same-size graphs.
+
+    rotations is None for the ansatz's initial angles, one parameter vector,
+    or a (states, num_params) batch. The states are simulated once and
+    scored against every graph together, giving (graphs,) or (graphs, states).
+    """
+    cost_matrix = maxcut_cost_matrix(adj_matrices)[0]
+    if rotations is None:
+        rotations = ansatz.initial_parameters()
+    states = simulate_statevector(ansatz.gate_table(), ansatz.num_qubits, rotations)
+    return batch_expectation_values(cost_matrix, statevector_probabilities(states))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Playback of a recorded optimization run, without simulating anything"""
+from collections import namedtuple
+
+import numpy as np
+
+from .trace import read_run
+
+# Recorded evaluations shown per second at speed 1
+DEFAULT_ROWS_PER_SECOND = 10.0
+
+MIN_SPEED = 0.125
+MAX_SPEED = 64.0
+
+ReplayFrame = namedtuple('ReplayFrame', ['frame_num', 'params', 'probabilities', 'cost', 'basis_state'])
+
+
+class TraceReplay():
+    """Steps through the rows of one traced run at an adjustable, seekable speed.
+
+    position is a fractional row number, moved on by advance() as time
+    passes and moved directly by seek(). next_frame() returns the row the
+    position falls on whenever it differs from the row returned last, so
+    a display only changes when there is something new to show.
+    """
+    def __init__(self, columns, metadata=None, rows_per_second=DEFAULT_ROWS_PER_SECOND):
+        if 'probabilities' not in columns:
+            raise ValueError('Run was traced without probabilities, so it cannot be replayed')
+        self.columns = columns
+        self.metadata = metadata or {}
+        self.rows_per_second = rows_per_second
+        self.speed = 1.0
+        self.paused = False
+        self.position = 0.0
+        self._shown_frame_num = None
+
+    @classmethod
+    def load(cls, path, run=None, rows_per_second=DEFAULT_ROWS_PER_SECOND):
+        columns, metadata = read_run(path, run)
+        return cls(columns, metadata, rows_per_second)
+
+    def __str__(self):
+        return 'TraceReplay: frame ' + str(self.frame_num + 1) + ' of ' + str(self.num_frames) + \
+            ', speed: ' + str(self.speed) + ('x, paused' if self.paused else 'x')
+
+    @property
+    def num_frames(self):
+        return len(self.columns['cost'])
+
+    @property
+    def num_parameters(self):
+        return self.columns['params'].shape[1]
+
+    @property
+    def frame_num(self):
+        return int(self.position)
+
+    @property
+    def finished(self):
+        return self.frame_num == self.num_frames - 1
+
+    def frame(self, frame_num):
+        return ReplayFrame(frame_num,
+                           np.asarray(self.columns['params'][frame_num], dtype=float),
+                           np.asarray(self.columns['probabilities'][frame_num], dtype=float),
+                           float(self.columns['cost'][frame_num]),
+                           int(self.columns['basis_state'][frame_num]))
+
+    def advance(self, seconds):
+        """Move the position on by the rows recorded in this much playback time"""
+        if not self.paused:
+            self.seek(self.position + seconds * self.rows_per_second * self.speed)
+
+    def seek(self, position):
+        self.position = float(np.clip(position, 0, self.num_frames - 1))
+
+    def seek_fraction(self, fraction):
+        self.seek(fraction * (self.num_frames - 1))
+
+    def set_speed(self, speed):
+        self.speed = float(np.clip(speed, MIN_SPEED, MAX_SPEED))
+
+    def toggle_paused(self):
+        self.paused = not self.paused
+
+    def next_frame(self):
+        """The frame at the current position, or None if it is already being shown"""
+        if self.frame_num == self._shown_frame_num:
+            return None
+        self._shown_frame_num = self.frame_num
+        return self.frame(self.frame_num)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Persistent cache of solve results, shared by graphs that are relabelings of each other.
+
+Graphs are keyed by a canonical form: the adjacency matrix with its nodes
+put in an order that is the same for every relabeling of the graph.
+Results are stored in that order and mapped back onto the caller's labels.
+"""
+import contextlib
+import itertools
+import json
+import math
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from .objective_cache import adjacency_hash
+from .stop_criteria import StopCriteria
+
+DEFAULT_MAX_ENTRIES = 10000
+
+# Most node orders searched for the smallest canonical matrix
+CANONICAL_SEARCH_LIMIT = 5040
+
+_SCHEMA = '''CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    rotations TEXT NOT NULL,
+    cost REAL NOT NULL,
+    cut_value REAL NOT NULL,
+    sides TEXT NOT NULL,
+    last_used REAL NOT NULL
+)'''
+
+
+def _refine_colors(adj_matrix):
+    # Colour refinement: split nodes by the weights and colours of their neighbours until stable
+    num_nodes = len(adj_matrix)
+    colors = [0] * num_nodes
+    num_colors = 1
+    while True:
+        signatures = [(colors[i], adj_matrix[i, i],
+                       tuple(sorted((adj_matrix[i, j], colors[j]) for j in range(num_nodes)
+                                    if j != i and adj_matrix[i, j] != 0)))
+                      for i in range(num_nodes)]
+        ranks = {signature: rank for rank, signature in enumerate(sorted(set(signatures)))}
+        colors = [ranks[signature] for signature in signatures]
+        if len(ranks) == num_colors:
+            return colors
+        num_colors = len(ranks)
+
+
+def canonical_order(adj_matrix, search_limit=CANONICAL_SEARCH_LIMIT):
+    """Node order that puts a weighted graph in canonical form, adj_matrix[np.ix_(order, order)].
+
+    Nodes are grouped by colour refinement, and every order within the
+    groups is tried, keeping the one giving the smallest matrix. Graphs
+    too symmetric for that to fit in search_limit orders get the first one,
+    so a relabeling of them may miss the cache, but never gets a wrong hit.
+    """
+    adj_matrix = np.round(np.asarray(adj_matrix, dtype=float), 9) + 0.0
+    colors = _refine_colors(adj_matrix)
+    cells = [[node for node in range(len(colors)) if colors[node] == color]
+             for color in range(max(colors, default=-1) + 1)]
+
+    num_orders = 1
+    for cell in cells:
+        num_orders *= math.factorial(len(cell))
+    if num_orders > search_limit:
+        return np.array([node for cell in cells for node in cell], dtype=int)
+
+    best_order = best_bytes = None
+    for cell_orders in itertools.product(*(itertools.permutations(cell) for cell in cells)):
+        order = np.array([node for cell_order in cell_orders for node in cell_order], dtype=int)
+        matrix_bytes = adj_matrix[np.ix_(order, order)].tobytes()
+        if best_bytes is None or matrix_bytes < best_bytes:
+            best_order, best_bytes = order, matrix_bytes
+    return best_order
+
+
+def objective_config(cvar=None, symmetry=False):
+    """Describe what a search minimizes, beyond the expectation value of the whole graph.
+    Empty for the default, so existing keys and checkpoints stay valid"""
+    config = {}
+    if cvar is not None:
+        config['cvar'] = cvar.rules()
+    if symmetry:
+        config['symmetry'] = True
+    return config
+
+
+def solve_config(ansatz, num_epochs, structure=None, initial_parameters=None, optimizer='stepping',
+                 max_evaluations=None, stop_criteria=None, cvar=None, symmetry=False):
+    """Describe an optimization setup for use in a cache key, returning (config, permutation_invariant).
+
+    Layered ansatzes are described by their circuit structure, which can
+    be given for circuits edited by hand, and their starting angles. QAOA
+    circuits follow the graph, so they are described by their layers alone.
+    The optimizer, its evaluation budget, stop criteria and CVaR are only described
+    when they aren't the defaults, so existing keys stay valid. With symmetry
+    the node kept on side 0 follows the labeling, so no ansatz is
+    permutation invariant.
+    """
+    permutation_invariant = bool(getattr(ansatz, 'permutation_invariant', False))
+    if initial_parameters is None:
+        initial_parameters = ansatz.initial_parameters()
+    if structure is None:
+        structure = 'qaoa-' + str(ansatz.num_layers) if permutation_invariant else ansatz.structure_hash()
+    config = {
+        'structure': structure,
+        'initial_parameters': np.round(initial_parameters, 9).tolist(),
+        'num_epochs': num_epochs,
+    }
+    if optimizer != 'stepping':
+        config['optimizer'] = optimizer
+    if max_evaluations is not None:
+        config['max_evaluations'] = max_evaluations
+    if stop_criteria is not None and stop_criteria.rules() != StopCriteria().rules():
+        config['stop_criteria'] = stop_criteria.rules()
+    config.update(objective_config(cvar, symmetry))
+    if symmetry:
+        permutation_invariant = False
+    config = json.dumps(config, sort_keys=True)
+    return config, permutation_invariant
+
+
+class ResultsCache():
+    """SQLite store of solve results keyed by canonical graph form and solve configuration.
+
+    Cut sides are stored in canonical node order, so a hit for any
+    relabeling of a stored graph returns its cut on the caller's labels.
+    Rotation angles only carry over between relabelings for ansatzes whose
+    parameters don't depend on wire order, such as QAOA; for the others the
+    key also records the node order, so only the same labeling hits. The
+    least recently used entries are evicted beyond max_entries.
+    """
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self._connect() as connection:
+            connection.execute(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One short-lived connection per operation, committed on success, so processes can share a file
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def __len__(self):
+        with self._lock, self._connect() as connection:
+            return connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def key(self, adj_matrix, config, permutation_invariant=False):
+        """Return (key, order), order being the canonical node order of the graph"""
+        order = canonical_order(adj_matrix)
+        canonical = np.asarray(adj_matrix, dtype=float)[np.ix_(order, order)]
+        key = {'graph': adjacency_hash(canonical), 'config': config}
+        if not permutation_invariant:
+            key['order'] = order.tolist()
+        return json.dumps(key, sort_keys=True), order
+
+    def get(self, adj_matrix, config, permutation_invariant=False):
+        """Return a stored result for this graph, with rotations, cost, cut_value and
+        basis_state on its own node labels, or None"""
+        key, order = self.key(adj_matrix, config, permutation_invariant)
+        with self._lock, self._connect() as connection:
+            row = connection.execute('SELECT rotations, cost, cut_value, sides FROM results WHERE key = ?',
+                                     (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute('UPDATE results SET last_used = ? WHERE key = ?', (time.time(), key))
+            self.hits += 1
+
+        rotations, cost, cut_value, canonical_sides = row
+        sides = np.empty(len(order), dtype=int)
+        sides[order] = [int(side) for side in canonical_sides]
+        return {
+            'rotations': json.loads(rotations),
+            'cost': cost,
+            'cut_value': cut_value,
+            'basis_state': ''.join(str(side) for side in sides[::-1]),
+        }
+
+    def put(self, adj_matrix, config, result, permutation_invariant=False):
+        """Store a result holding rotations, cost, cut_value and basis_state, evicting the least recently used"""
+        key, order = self.key(adj_matrix, config, permutation_invariant)
+        sides = np.array([int(char) for char in result['basis_state'][::-1]])
+        row = (key, json.dumps(np.asarray(result['rotations'], dtype=float).tolist()), float(result['cost']),
+               float(result['cut_value']), ''.join(str(side) for side in sides[order]), time.time())
+        with self._lock, self._connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)', row)
+            connection.execute('DELETE FROM results WHERE key IN (SELECT key FROM results '
+                               'ORDER BY last_used DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def clear(self):
+        with self._lock, self._connect() as connection:
+            connection.execute('DELETE FROM results')
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self),
+            'max_entries': self.max_entries,
+        }
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Loopback HTTP/JSON service that solves MaxCut instances without the Pygame UI.
+
+POST /solve with {"adj_matrix": [[...]], "depth": 4, "num_epochs": 1}
+returns the result of solve_maxcut(). A request may also give "optimizer",
+the stop criteria "max_evaluations", "max_seconds", "tolerance", "patience"
+and "stop_at_optimum", the CVaR settings "cvar_alpha", "shots" and
+"cvar_seed", and "symmetry", which allows one more node. GET /stats reports
+queue depths, batch sizes and solve latency percentiles.
+
+Solves run on a worker pool. Their objective evaluations go through an
+EvaluationBatcher, so concurrent solves with the same qubit count and
+ansatz are simulated together as one batch of parameter vectors.
+"""
+import collections
+import concurrent.futures
+import ipaddress
+import json
+import queue
+import socket
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from vqe_playground.model.ansatz import hardware_efficient_ansatz, DEFAULT_DEPTH
+from vqe_playground.sim.statevector import simulate_statevector, statevector_probabilities
+from .maxcut import maxcut_eigenvalues
+from .objective_cache import ObjectiveCache
+from .pipeline import solve_maxcut
+from .results_cache import ResultsCache
+from .stop_criteria import StopCriteria
+from .cvar import CVaR, DEFAULT_NUM_SHOTS
+from .symmetry import reduced_maxcut_eigenvalues
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8642
+MAX_SERVICE_QUBITS = 16
+LATENCY_WINDOW = 1000
+
+
+class EvaluationBatcher():
+    """Simulates objective evaluations from concurrent solves in batches.
+
+    Evaluations are grouped by (num_qubits, structure_key). A batch is
+    dispatched once every active solve has submitted an evaluation, once
+    max_batch_size is reached, or after max_wait_seconds.
+    """
+    def __init__(self, max_batch_size=64, max_wait_seconds=0.005):
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.batch_sizes = collections.deque(maxlen=LATENCY_WINDOW)
+        self._queue = queue.Queue()
+        self._active_clients = 0
+        self._active_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='evaluation-batcher', daemon=True)
+        self._thread.start()
+
+    def client_started(self):
+        with self._active_lock:
+            self._active_clients += 1
+
+    def client_finished(self):
+        with self._active_lock:
+            self._active_clients -= 1
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def evaluate(self, structure_key, gate_table, num_qubits, eigenvalues, rotations):
+        """Block until the batch containing this evaluation has been simulated, returning its cost"""
+        future = concurrent.futures.Future()
+        self._queue.put((num_qubits, structure_key, gate_table, eigenvalues,
+                         np.array(rotations, dtype=float), future))
+        return future.result()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            pending = [item]
+            deadline = time.monotonic() + self.max_wait_seconds
+            while len(pending) < min(self.max_batch_size, max(self._active_clients, 1)):
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._dispatch(pending)
+                    return
+                pending.append(item)
+            self._dispatch(pending)
+
+    def _dispatch(self, pending):
+        groups = collections.OrderedDict()
+        for item in pending:
+            groups.setdefault(item[:2], []).append(item)
+
+        for items in groups.values():
+            try:
+                num_qubits, gate_table = items[0][0], items[0][2]
+                params = np.stack([item[4] for item in items])
+                probs = statevector_probabilities(simulate_statevector(gate_table, num_qubits, params))
+                eigenvalues = np.stack([item[3] for item in items])
+                costs = np.einsum('bi,bi->b', eigenvalues, probs)
+                self.batch_sizes.append(len(items))
+                for item, cost in zip(items, costs):
+                    item[5].set_result(float(cost))
+            except Exception as error:
+                for item in items:
+                    item[5].set_exception(error)
+
+
+class SolveService():
+    """Worker pool and HTTP server around solve_maxcut(), bound to a loopback address"""
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, num_workers=4, max_batch_size=64,
+                 results_cache_path=None):
+        if not is_loopback(host):
+            raise ValueError('SolveService only binds to loopback addresses, not ' + str(host))
+
+        self.batcher = EvaluationBatcher(max_batch_size)
+        self.objective_cache = ObjectiveCache()
+        self.results_cache = ResultsCache(results_cache_path) if results_cache_path else None
+        self.executor = concurrent.futures.ThreadPoolExecutor(num_workers, thread_name_prefix='solve')
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.num_solved = 0
+        self._pending_solves = 0
+        self._lock = threading.Lock()
+        self._templates = {}
+        self._server_thread = None
+        self.server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self.server.daemon_threads = True
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def ansatz_for(self, num_qubits, depth):
+        key = (num_qubits, depth)
+        with self._lock:
+            if key not in self._templates:
+                self._templates[key] = hardware_efficient_ansatz(num_qubits, depth)
+            return self._templates[key]
+
+    def solve(self, request):
+        """Solve one request dict, with its objective evaluations batched with other solves"""
+        if not isinstance(request, dict):
+            raise ValueError('The request must be a JSON object')
+        adj_matrix = request_adj_matrix(request)
+        # With symmetry the last node isn't simulated, so graphs may have one more node
+        symmetry = bool(request.get('symmetry', False))
+        max_nodes = MAX_SERVICE_QUBITS + 1 if symmetry else MAX_SERVICE_QUBITS
+        if not 2 + symmetry <= adj_matrix.shape[0] <= max_nodes:
+            raise ValueError('adj_matrix must have between {} and {} nodes'.format(2 + symmetry, max_nodes))
+        num_qubits = adj_matrix.shape[0] - symmetry
+
+        depth = int(request.get('depth', DEFAULT_DEPTH))
+        ansatz = self.ansatz_for(num_qubits, depth)
+        gate_table = ansatz.gate_table()
+        if symmetry:
+            eigenvalues, _ = reduced_maxcut_eigenvalues(adj_matrix)
+        else:
+            eigenvalues, _ = maxcut_eigenvalues(adj_matrix)
+
+        def objective(rotations):
+            return self.batcher.evaluate(depth, gate_table, num_qubits, eigenvalues, rotations)
+
+        # Batches only give expectation values, so CVaR solves simulate on their own
+        cvar = request_cvar(request)
+        self.batcher.client_started()
+        try:
+            return solve_maxcut(adj_matrix, ansatz, int(request.get('num_epochs', 1)),
+                                objective if cvar is None else None, self.objective_cache,
+                                results_cache=self.results_cache, optimizer=request.get('optimizer', 'stepping'),
+                                stop_criteria=request_stop_criteria(request), cvar=cvar, symmetry=symmetry)
+        finally:
+            self.batcher.client_finished()
+
+    def submit(self, request):
+        """Queue a request on the worker pool, returning a future for its result"""
+        start = time.perf_counter()
+        with self._lock:
+            self._pending_solves += 1
+
+        def run():
+            try:
+                return self.solve(request)
+            finally:
+                with self._lock:
+                    self._pending_solves -= 1
+                    self.num_solved += 1
+                    self.latencies.append(time.perf_counter() - start)
+
+        return self.executor.submit(run)
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self.latencies)
+            pending_solves = self._pending_solves
+            num_solved = self.num_solved
+        batch_sizes = np.array(self.batcher.batch_sizes)
+        percentiles = {}
+        if len(latencies):
+            for percentile in (50, 90, 99):
+                percentiles['p' + str(percentile)] = float(np.percentile(latencies, percentile))
+        return {
+            'pending_solves': pending_solves,
+            'evaluation_queue_depth': self.batcher.queue_depth(),
+            'solved': num_solved,
+            'latency_seconds': percentiles,
+            'mean_batch_size': float(batch_sizes.mean()) if len(batch_sizes) else 0.0,
+            'objective_cache': self.objective_cache.stats(),
+            'results_cache': self.results_cache.stats() if self.results_cache is not None else None,
+        }
+
+    def start(self):
+        """Serve requests on a background thread"""
+        self._server_thread = threading.Thread(target=self.server.serve_forever,
+                                               name='solve-service', daemon=True)
+        self._server_thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.executor.shutdown()
+        self.batcher.close()
+
+
+def request_adj_matrix(request):
+    """The adj_matrix of a request as an array, checked to be a square, symmetric matrix of numbers"""
+    rows = request.get('adj_matrix')
+    if rows is None:
+        raise ValueError('The request has no adj_matrix')
+    if not isinstance(rows, list) or not all(isinstance(row, list) and len(row) == len(rows) for row in rows):
+        raise ValueError('adj_matrix must be a square list of rows')
+    if not all(isinstance(weight, (int, float)) and not isinstance(weight, bool) for row in rows for weight in row):
+        raise ValueError('adj_matrix must only contain numbers')
+    adj_matrix = np.array(rows, dtype=float).reshape(len(rows), len(rows))
+    if not np.all(np.isfinite(adj_matrix)):
+        raise ValueError('adj_matrix must only contain finite numbers')
+    if not np.array_equal(adj_matrix, adj_matrix.T):
+        raise ValueError('adj_matrix must be symmetric')
+    return adj_matrix
+
+
+def request_stop_criteria(request):
+    """StopCriteria from the optional max_evaluations, max_seconds, tolerance, patience and
+    stop_at_optimum keys of a request"""
+    def optional(key, kind):
+        return None if request.get(key) is None else kind(request[key])
+    return StopCriteria(optional('max_evaluations', int), optional('max_seconds', float),
+                        optional('tolerance', float), int(request.get('patience', 1)),
+                        bool(request.get('stop_at_optimum', False)))
+
+
+def request_cvar(request):
+    """CVaR from the cvar_alpha, and optional shots and cvar_seed, keys of a request, or None"""
+    if request.get('cvar_alpha') is None:
+        return None
+    shots = request.get('shots', DEFAULT_NUM_SHOTS)
+    seed = request.get('cvar_seed')
+    return CVaR(float(request['cvar_alpha']), None if shots is None else int(shots),
+                None if seed is None else int(seed))
+
+
+def is_loopback(host):
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (socket.error, ValueError):
+        return False
+
+
+def _make_handler(service):
+    class SolveRequestHandler(BaseHTTPRequestHandler):
+        """Handles /solve and /stats requests"""
+        def do_GET(self):
+            if self.path == '/stats':
+                self._send_json(200, service.stats())
+            else:
+                self._send_json(404, {'error': 'Unknown path: ' + self.path})
+
+        def do_POST(self):
+            if self.path != '/solve':
+                self._send_json(404, {'error': 'Unknown path: ' + self.path})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length).decode('utf-8'))
+                result = service.submit(request).result()
+            except (ValueError, KeyError, TypeError) as error:
+                self._send_json(400, {'error': str(error)})
+                return
+            except Exception as error:
+                # e.g. a simulation error re-raised by the batcher, or an optimizer failure
+                traceback.print_exc()
+                self._send_json(500, {'error': type(error).__name__ + ': ' + str(error)})
+                return
+            self._send_json(200, result)
+
+        def log_message(self, format, *args):
+            # Keep the console quiet; /stats reports on traffic
+            pass
+
+        def _send_json(self, status, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return SolveRequestHandler
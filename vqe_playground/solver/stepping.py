@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Coordinate-wise stepping search over rotation angles, as used by the playground"""
+import numpy as np
+
+from .checkpoint import OptimizerState
+from .stop_criteria import StopCriteria
+
+MOVE_RADIANS = np.pi / 8
+
+# How close to target_cost counts as having reached it
+TARGET_TOLERANCE = 1e-6
+
+
+class SteppingOptimizer():
+    """Resumable stepping search that advances by one objective evaluation per step().
+
+    For each rotation in turn, the angle is moved by move_radians toward
+    the side of pi it is on (reversing if that makes the cost worse), and
+    keeps moving while the cost decreases. The search stops early once the
+    cost reaches target_cost, e.g. the lowest eigenvalue from the exact
+    solver, or when one of stop_criteria, a StopCriteria, applies. The
+    reason it stopped is then in stop_reason. All progress lives in an
+    OptimizerState, so a search can be checkpointed between any two steps
+    and resumed later.
+    """
+    # Checkpointed states can be resumed with SteppingOptimizer(state=...)
+    resumable = True
+    # Every point evaluated is a whole number of moves from the start, so cache keys may be quantized
+    quantized_angles = True
+
+    def __init__(self, initial_rotations=None, num_epochs=1, move_radians=MOVE_RADIANS,
+                 target_cost=None, target_tolerance=TARGET_TOLERANCE, state=None, stop_criteria=None):
+        self.state = state or OptimizerState(initial_rotations, num_epochs, move_radians,
+                                             target_cost, target_tolerance)
+        self.stop_monitor = (stop_criteria or StopCriteria()).monitor()
+        self.stop_reason = None
+
+    @property
+    def finished(self):
+        return self.state.finished
+
+    @property
+    def reached_target(self):
+        return self.state.reached_target
+
+    @property
+    def completed_epochs(self):
+        return self.state.epoch
+
+    def note_evaluation(self, rotations, basis_state):
+        """Called by objectives with the most probable basis state of the rotations they evaluate"""
+        self.stop_monitor.note_evaluation(rotations, basis_state)
+
+    def stop(self, reason):
+        self.stop_reason = reason
+        self.state.epoch = self.state.num_epochs
+
+    def step(self, objective):
+        """Make one move of the search, returning False once it has finished"""
+        state = self.state
+        if state.finished:
+            return False
+
+        reason = self.stop_monitor.check(state, state.epoch)
+        if reason is not None:
+            self.stop(reason)
+        elif state.min_cost is None:
+            state.min_cost = self._evaluate(objective)
+        elif state.rotation_num >= len(state.rotations):
+            state.rotation_num = 0
+            state.epoch += 1
+        elif not state.rotation_initialized:
+            if self.reached_target:
+                self.stop('target_cost')
+            else:
+                self._start_rotation(objective)
+        else:
+            self._continue_rotation(objective)
+        if state.finished and self.stop_reason is None:
+            self.stop_reason = 'epochs'
+        return not state.finished
+
+    def steps(self, objective):
+        """Generator making one move per iteration and yielding the state after it.
+
+        A caller can resume it for as long as it has time to spare, e.g. a
+        few milliseconds of each frame, and stop at any point in between.
+        """
+        while self.step(objective):
+            yield self.state
+
+    def run(self, objective, checkpoint=None, callback=None):
+        """Step until finished, saving to checkpoint (a CheckpointWriter) along the way.
+
+        callback, if given, is called with the state after every step.
+        """
+        for state in self.steps(objective):
+            if checkpoint is not None:
+                checkpoint.maybe_save(state)
+            if callback is not None:
+                callback(state)
+        if checkpoint is not None:
+            checkpoint.save(self.state)
+        return self.state.rotations, self.state.min_cost, self.state.num_evaluations
+
+    def close(self):
+        """Release anything held by an unfinished search. A stepping search holds nothing"""
+
+    def _evaluate(self, objective):
+        self.state.num_evaluations += 1
+        return objective(self.state.rotations)
+
+    def _next_rotation(self):
+        self.state.rotation_num += 1
+        self.state.rotation_initialized = False
+
+    def _start_rotation(self, objective):
+        state = self.state
+        state.cur_ang_rad = state.rotations[state.rotation_num]
+
+        # Decide whether to increase or decrease angle
+        state.direction = -1 if state.cur_ang_rad > np.pi else 1
+        proposed_ang_rad = state.cur_ang_rad + state.move_radians * state.direction
+        if not 0.0 <= proposed_ang_rad < np.pi * 2 + 0.01:
+            self._next_rotation()
+            return
+
+        state.rotations[state.rotation_num] = proposed_ang_rad
+        cost = self._evaluate(objective)
+        if cost > state.min_cost:
+            # Moving in the wrong direction so restore the angle and switch direction
+            state.rotations[state.rotation_num] = state.cur_ang_rad
+            state.direction *= -1
+        else:
+            state.cur_ang_rad = proposed_ang_rad
+            state.min_cost = cost
+
+        state.proposed_ang_rad = state.cur_ang_rad
+        state.rotation_iterations = 0
+        state.rotation_initialized = True
+
+    def _continue_rotation(self, objective):
+        state = self.state
+        state.rotation_iterations += 1
+        proposed_ang_rad = state.proposed_ang_rad + state.move_radians * state.direction
+        if not 0.0 <= proposed_ang_rad <= np.pi * 2 + 0.01:
+            self._next_rotation()
+            return
+
+        state.rotations[state.rotation_num] = proposed_ang_rad
+        cost = self._evaluate(objective)
+        if cost >= state.min_cost:
+            # Cost is no longer decreasing so restore the angle and move on
+            state.rotations[state.rotation_num] = state.cur_ang_rad
+            self._next_rotation()
+            return
+
+        state.cur_ang_rad = state.proposed_ang_rad = proposed_ang_rad
+        state.min_cost = cost
+        if state.rotation_iterations > np.pi * 2 / state.move_radians:
+            self._next_rotation()
+
+
+def stepping_search(objective, initial_rotations, num_epochs=1, move_radians=MOVE_RADIANS,
+                    target_cost=None, checkpoint=None, state=None):
+    """Minimize objective(rotations) with a SteppingOptimizer run to completion.
+
+    Pass state, an OptimizerState, to resume a checkpointed search instead
+    of starting from initial_rotations. Returns the rotations, their cost
+    and the number of objective evaluations.
+    """
+    optimizer = SteppingOptimizer(initial_rotations, num_epochs, move_radians, target_cost, state=state)
+    return optimizer.run(objective, checkpoint)
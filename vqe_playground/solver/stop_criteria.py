@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Configurable stopping rules for optimizers, and the reason each run stopped"""
+import time
+
+import numpy as np
+
+# Why an optimizer stopped: its own end (all epochs run, or converged), the
+# target cost, or one of the StopCriteria. Results with a cached answer say 'cached'
+STOP_REASONS = ('epochs', 'converged', 'target_cost', 'max_evaluations', 'time_budget', 'no_improvement',
+                'optimal_basis_state', 'cached')
+
+
+def optimal_basis_states(eigenvalues, lowest_eigenvalue, tolerance=1e-9):
+    """Indices of the basis states that are optimal cuts, e.g. for StopCriteria(optimal_basis_states=...)"""
+    return frozenset(np.flatnonzero(np.asarray(eigenvalues) <= lowest_eigenvalue + tolerance).tolist())
+
+
+class StopCriteria():
+    """Rules that stop an optimization before it ends by itself.
+
+    max_evaluations bounds the objective evaluations and max_seconds the
+    wall-clock time since the first step. With tolerance, the search stops
+    once the best cost has improved by no more than tolerance, relative to
+    its value patience epochs earlier. With optimal_basis_states, a set of
+    basis state indices, it stops as soon as the best rotations make one of
+    them the most probable basis state, which the objective reports through
+    the optimizer's note_evaluation(). stop_at_optimum asks whoever knows the
+    graph to fill them in with for_problem(). Rules left as None don't apply.
+    """
+    def __init__(self, max_evaluations=None, max_seconds=None, tolerance=None, patience=1,
+                 stop_at_optimum=False, optimal_basis_states=None):
+        self.max_evaluations = max_evaluations
+        self.max_seconds = max_seconds
+        self.tolerance = tolerance
+        self.patience = patience
+        self.stop_at_optimum = stop_at_optimum
+        self.optimal_basis_states = None if optimal_basis_states is None else frozenset(optimal_basis_states)
+
+    def __str__(self):
+        return 'StopCriteria: ' + ', '.join(name + ': ' + str(value) for name, value in self.rules().items())
+
+    def rules(self):
+        """The rules as a JSON-friendly dict of constructor arguments"""
+        return {
+            'max_evaluations': self.max_evaluations,
+            'max_seconds': self.max_seconds,
+            'tolerance': self.tolerance,
+            'patience': self.patience,
+            'stop_at_optimum': self.stop_at_optimum,
+            'optimal_basis_states': None if self.optimal_basis_states is None else sorted(self.optimal_basis_states),
+        }
+
+    @property
+    def bounded(self):
+        """True if the evaluations or time are bounded, so any search ends"""
+        return self.max_evaluations is not None or self.max_seconds is not None
+
+    def replace(self, **changes):
+        """Copy of these criteria with some rules changed"""
+        rules = self.rules()
+        rules.update(changes)
+        return StopCriteria(**rules)
+
+    def for_problem(self, eigenvalues, lowest_eigenvalue):
+        """These criteria for one graph, with its optimal basis states if stop_at_optimum is set"""
+        if not self.stop_at_optimum:
+            return self
+        return self.replace(optimal_basis_states=optimal_basis_states(eigenvalues, lowest_eigenvalue))
+
+    def monitor(self):
+        return StopMonitor(self)
+
+
+class StopMonitor():
+    """Progress of one optimization against its StopCriteria"""
+    def __init__(self, criteria):
+        self.criteria = criteria
+        self.start_time = None
+        self.epoch = None
+        self.epoch_costs = []
+        self.evaluation = None
+
+    def note_evaluation(self, rotations, basis_state):
+        """Record the most probable basis state of rotations, which are being evaluated"""
+        self.evaluation = (np.array(rotations, dtype=float), basis_state)
+
+    def check(self, state, epoch):
+        """Return the reason to stop before the next evaluation, or None.
+
+        state is the optimizer's OptimizerState and epoch the number of
+        epochs it has completed.
+        """
+        criteria = self.criteria
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+
+        evaluation, self.evaluation = self.evaluation, None
+        if criteria.optimal_basis_states is not None and evaluation is not None:
+            # The optimizer keeps the rotations evaluated only if they were its best yet
+            rotations, basis_state = evaluation
+            if basis_state in criteria.optimal_basis_states and np.array_equal(rotations, state.rotations):
+                return 'optimal_basis_state'
+
+        if criteria.max_evaluations is not None and state.num_evaluations >= criteria.max_evaluations:
+            return 'max_evaluations'
+        if criteria.max_seconds is not None and time.perf_counter() - self.start_time >= criteria.max_seconds:
+            return 'time_budget'
+
+        if criteria.tolerance is not None and state.min_cost is not None and epoch != self.epoch:
+            self.epoch = epoch
+            self.epoch_costs.append(state.min_cost)
+            if len(self.epoch_costs) > criteria.patience:
+                earlier_cost = self.epoch_costs[-1 - criteria.patience]
+                if earlier_cost - state.min_cost <= criteria.tolerance * abs(earlier_cost):
+                    return 'no_improvement'
+        return None
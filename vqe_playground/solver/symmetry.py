@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Z2 symmetry reduction: a cut and its complement have the same weight.
+
+Flipping every spin leaves the MaxCut Hamiltonian unchanged, so the last
+node is kept on side 0 and only the other n - 1 nodes are simulated. Its
+qubit is the most significant bit, so reduced basis state indices are also
+the indices of the full basis states they stand for.
+
+The playground shows reduced states in full, with the fixed node on side
+0, and goes back to simulating every qubit once a gate is put on its idle
+wire. A QAOA ansatz over the reduced qubits is a slightly different ansatz,
+a little weaker with few layers, so the playground only reduces the
+default layered ansatz.
+"""
+import numpy as np
+
+from .maxcut import basis_bits
+
+
+def reduced_maxcut_eigenvalues(adj_matrix):
+    """maxcut_eigenvalues() of just the 2**(n-1) basis states with the last node on side 0,
+    computed without the other half, and the constant shift"""
+    weights = np.tril(np.asarray(adj_matrix, dtype=float), -1)
+    num_qubits = len(weights)
+    spins = np.ones((2 ** (num_qubits - 1), num_qubits))
+    spins[:, :-1] -= 2 * basis_bits(num_qubits - 1)
+    eigenvalues = 0.5 * np.einsum('xj,xj->x', spins, spins @ weights)
+    return eigenvalues, -0.5 * np.sum(weights)
+
+
+def expand_reduced(states):
+    """Embed reduced statevectors or probabilities, one or a batch, in the full basis,
+    with zeros for the states that have the last node on side 1"""
+    states = np.asarray(states)
+    return np.concatenate([states, np.zeros_like(states)], axis=-1)
+
+
+def wire_is_idle(gate_table, wire):
+    """True if no gate in a gate table acts on, controls or swaps with wire"""
+    table = np.asarray(gate_table)
+    return not np.any((table['wire'] == wire) | (table['ctrl_a'] == wire) | (table['ctrl_b'] == wire) |
+                      (table['swap'] == wire))
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Recording of every objective evaluation to a chunked, compressed columnar trace file.
+
+A trace file is a zip archive holding one compressed .npy member per column
+per chunk, plus a JSON member describing each run. Rows are buffered in
+preallocated arrays and whole chunks are compressed and appended by a
+background thread, so recording an evaluation is a few array copies.
+consolidate_trace() turns a trace into one uncompressed .npy per column
+for memory-mapped analysis.
+"""
+import io
+import json
+import os
+import queue
+import re
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+DEFAULT_CHUNK_ROWS = 1024
+
+# A partial chunk is handed to the writer once it is this old, so short runs reach the disk too
+DEFAULT_FLUSH_SECONDS = 5.0
+
+SCALAR_COLUMNS = {
+    'run': np.int32,
+    'timestamp': np.float64,
+    'cost': np.float64,
+    'basis_state': np.int64,
+}
+
+_CHUNK_MEMBER = re.compile(r'chunk_(\d+)/(\w+)\.npy$')
+_RUN_MEMBER = re.compile(r'run_(\d+)\.json$')
+
+
+class TraceRecorder():
+    """Appends (run, timestamp, cost, basis_state, params, probabilities) rows to a trace file.
+
+    Parameters are stored as float64 and probabilities, when recorded, as
+    float32. Call start_run() before each optimization, and close() (or use
+    the recorder as a context manager) to write the last partial chunk.
+    """
+    def __init__(self, path, chunk_rows=DEFAULT_CHUNK_ROWS, record_probabilities=True,
+                 flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.record_probabilities = record_probabilities
+        self.flush_seconds = flush_seconds
+        self.num_recorded = 0
+
+        runs, chunks = _existing_members(path)
+        self.run = max(runs, default=-1)
+        self._next_chunk = max(chunks, default=-1) + 1
+        self._buffers = None
+        self._num_rows = 0
+        self._chunk_started = time.monotonic()
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_chunks, name='trace-writer', daemon=True)
+        self._writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start_run(self, **metadata):
+        """Begin a new run, stored with metadata such as the optimizer or ansatz used"""
+        self.flush()
+        self.run += 1
+        metadata['started'] = time.time()
+        self._queue.put(('run', self.run, metadata))
+        return self.run
+
+    def record(self, params, cost, basis_state, probabilities=None):
+        params = np.asarray(params, dtype=float)
+        if probabilities is not None and not self.record_probabilities:
+            probabilities = None
+        if self._buffers is None or not self._fits(params, probabilities):
+            self.flush()
+            self._allocate(params, probabilities)
+
+        row = self._num_rows
+        self._buffers['run'][row] = self.run
+        self._buffers['timestamp'][row] = time.time()
+        self._buffers['cost'][row] = cost
+        self._buffers['basis_state'][row] = basis_state
+        self._buffers['params'][row] = params
+        if 'probabilities' in self._buffers:
+            self._buffers['probabilities'][row] = probabilities
+        self._num_rows += 1
+        self.num_recorded += 1
+
+        if self._num_rows == self.chunk_rows or \
+                time.monotonic() - self._chunk_started >= self.flush_seconds:
+            self.flush()
+
+    def _fits(self, params, probabilities):
+        if self._buffers['params'].shape[1] != len(params):
+            return False
+        if probabilities is None:
+            return 'probabilities' not in self._buffers
+        return 'probabilities' in self._buffers and self._buffers['probabilities'].shape[1] == len(probabilities)
+
+    def _allocate(self, params, probabilities):
+        self._buffers = {name: np.empty(self.chunk_rows, dtype=dtype) for name, dtype in SCALAR_COLUMNS.items()}
+        self._buffers['params'] = np.empty((self.chunk_rows, len(params)))
+        if probabilities is not None:
+            self._buffers['probabilities'] = np.empty((self.chunk_rows, len(probabilities)), dtype=np.float32)
+        self._num_rows = 0
+        self._chunk_started = time.monotonic()
+
+    def flush(self):
+        """Hand any buffered rows to the writer thread"""
+        if self._buffers is not None and self._num_rows > 0:
+            chunk = {name: column[:self._num_rows] for name, column in self._buffers.items()}
+            self._queue.put(('chunk', self._next_chunk, chunk))
+            self._next_chunk += 1
+        self._buffers = None
+        self._num_rows = 0
+
+    def close(self):
+        """Write everything recorded so far and stop the writer thread"""
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_chunks(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            kind, number, payload = item
+            with zipfile.ZipFile(self.path, 'a', zipfile.ZIP_DEFLATED) as trace_file:
+                if kind == 'run':
+                    trace_file.writestr('run_{:06d}.json'.format(number), json.dumps(payload))
+                else:
+                    for name, column in payload.items():
+                        buffer = io.BytesIO()
+                        np.save(buffer, column)
+                        trace_file.writestr('chunk_{:06d}/{}.npy'.format(number, name), buffer.getvalue())
+
+
+def _existing_members(path):
+    runs, chunks = [], []
+    if os.path.exists(path):
+        with zipfile.ZipFile(path) as trace_file:
+            for name in trace_file.namelist():
+                if _RUN_MEMBER.match(name):
+                    runs.append(int(_RUN_MEMBER.match(name).group(1)))
+                elif _CHUNK_MEMBER.match(name):
+                    chunks.append(int(_CHUNK_MEMBER.match(name).group(1)))
+    return runs, chunks
+
+
+def _chunk_columns(trace_file):
+    """Map chunk number to {column name: member name}, in chunk order"""
+    chunks = {}
+    for name in trace_file.namelist():
+        match = _CHUNK_MEMBER.match(name)
+        if match:
+            chunks.setdefault(int(match.group(1)), {})[match.group(2)] = name
+    return [chunks[number] for number in sorted(chunks)]
+
+
+def _load_member(trace_file, name):
+    with trace_file.open(name) as member:
+        return np.load(io.BytesIO(member.read()), allow_pickle=False)
+
+
+def _member_shape(trace_file, name):
+    # Only the .npy header is decompressed, not the array
+    with trace_file.open(name) as member:
+        if np.lib.format.read_magic(member) == (1, 0):
+            return np.lib.format.read_array_header_1_0(member)[0]
+        return np.lib.format.read_array_header_2_0(member)[0]
+
+
+def read_runs(path):
+    """Return {run number: metadata} for a trace file"""
+    with zipfile.ZipFile(path) as trace_file:
+        return {int(_RUN_MEMBER.match(name).group(1)): json.loads(trace_file.read(name))
+                for name in trace_file.namelist() if _RUN_MEMBER.match(name)}
+
+
+def consolidate_trace(path, out_dir):
+    """Write each column of a trace to out_dir as an uncompressed .npy, returning memory-mapped arrays.
+
+    Chunks whose params or probabilities are narrower than the widest are
+    padded with NaN, so runs of different ansatzes can share one trace.
+    """
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+
+    with zipfile.ZipFile(path) as trace_file:
+        chunks = _chunk_columns(trace_file)
+        num_rows = 0
+        widths = {'params': 0, 'probabilities': 0}
+        for chunk in chunks:
+            num_rows += len(_load_member(trace_file, chunk['cost']))
+            for name in widths:
+                if name in chunk:
+                    widths[name] = max(widths[name], _member_shape(trace_file, chunk[name])[1])
+
+        columns = {}
+        for name, dtype in SCALAR_COLUMNS.items():
+            columns[name] = np.lib.format.open_memmap(os.path.join(out_dir, name + '.npy'), mode='w+',
+                                                      dtype=dtype, shape=(num_rows,))
+        for name, dtype in (('params', np.float64), ('probabilities', np.float32)):
+            if widths[name] > 0:
+                columns[name] = np.lib.format.open_memmap(os.path.join(out_dir, name + '.npy'), mode='w+',
+                                                          dtype=dtype, shape=(num_rows, widths[name]))
+                columns[name][:] = np.nan
+
+        row = 0
+        for chunk in chunks:
+            for name, member_name in chunk.items():
+                values = _load_member(trace_file, member_name)
+                if values.ndim == 1:
+                    columns[name][row:row + len(values)] = values
+                else:
+                    columns[name][row:row + len(values), :values.shape[1]] = values
+            row += len(values)
+
+    for column in columns.values():
+        column.flush()
+    with open(os.path.join(out_dir, 'runs.json'), 'w') as runs_file:
+        json.dump(read_runs(path), runs_file)
+    return open_consolidated(out_dir)
+
+
+def open_consolidated(out_dir):
+    """Memory-map the columns written by consolidate_trace()"""
+    columns = {}
+    for name in list(SCALAR_COLUMNS) + ['params', 'probabilities']:
+        column_path = os.path.join(out_dir, name + '.npy')
+        if os.path.exists(column_path):
+            columns[name] = np.load(column_path, mmap_mode='r')
+    return columns
+
+
+def read_run(path, run=None):
+    """Return (columns, metadata) for one run, by default the last one started.
+
+    path is a trace file, or a directory written by consolidate_trace(), in
+    which case the columns are memory-mapped slices and NaN padding is dropped.
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, 'runs.json')) as runs_file:
+            runs = {int(number): metadata for number, metadata in json.load(runs_file).items()}
+    else:
+        runs = read_runs(path)
+    if run is None:
+        run = max(runs, default=-1)
+    if run not in runs:
+        raise ValueError('No run ' + str(run) + ' in trace ' + path)
+
+    if os.path.isdir(path):
+        columns = _consolidated_run(open_consolidated(path), run)
+    else:
+        columns = _trace_run(path, run)
+    if columns is None:
+        raise ValueError('Run ' + str(run) + ' in trace ' + path + ' has no recorded evaluations')
+    return columns, runs[run]
+
+
+def _consolidated_run(columns, run):
+    # Runs are recorded one after another, so each occupies a contiguous block of rows
+    start, stop = np.searchsorted(columns['run'], [run, run + 1])
+    if start == stop:
+        return None
+    rows = {}
+    for name, column in columns.items():
+        rows[name] = column[start:stop]
+        if column.ndim == 2:
+            rows[name] = rows[name][:, :int(np.count_nonzero(~np.isnan(column[start])))]
+    return rows
+
+
+def _trace_run(path, run):
+    parts = {}
+    with zipfile.ZipFile(path) as trace_file:
+        for chunk in _chunk_columns(trace_file):
+            in_run = _load_member(trace_file, chunk['run']) == run
+            if np.any(in_run):
+                for name, member_name in chunk.items():
+                    parts.setdefault(name, []).append(_load_member(trace_file, member_name)[in_run])
+    if not parts:
+        return None
+    return {name: np.concatenate(values) for name, values in parts.items()}
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Starting angles carried over from the last solve of a similar graph.
+
+Warm starts need far fewer evaluations, but an edit can leave the earlier
+angles in a worse basin, so a warm-started result is occasionally a little
+worse than a fresh one. Since a results cache key describes the initial
+angles, warm-started results are not stored in one.
+"""
+import threading
+
+import numpy as np
+
+# Largest change in edge weights, relative to the total weight, still started from an earlier solve
+MAX_GRAPH_CHANGE = 0.25
+
+# Lineages of edited graphs remembered per optimization setup
+MAX_LINEAGES = 16
+
+
+def graph_change(adj_matrix_a, adj_matrix_b):
+    """Total change in edge weights between two graphs, relative to the larger total weight.
+
+    Graphs with different numbers of nodes are infinitely far apart.
+    """
+    adj_matrix_a = np.asarray(adj_matrix_a, dtype=float)
+    adj_matrix_b = np.asarray(adj_matrix_b, dtype=float)
+    if adj_matrix_a.shape != adj_matrix_b.shape:
+        return np.inf
+    total_weight = max(np.abs(adj_matrix_a).sum(), np.abs(adj_matrix_b).sum())
+    if total_weight == 0:
+        return 0.0
+    return float(np.abs(adj_matrix_a - adj_matrix_b).sum() / total_weight)
+
+
+def choose_start(cost, warm_parameters, cold_parameters):
+    """Return (parameters, warm_start): the warm angles, unless the cold ones have a lower cost(parameters).
+
+    An edit can move the optimum far enough that the earlier angles start
+    in a worse basin than the initial ones, and the search then ends worse.
+    """
+    if warm_parameters is None or cost(cold_parameters) < cost(warm_parameters):
+        return cold_parameters, False
+    return warm_parameters, True
+
+
+class WarmStarts():
+    """Converged angles of recently solved graphs, to start solves of edited graphs from.
+
+    Graphs that are edits of each other form a lineage, which keeps only
+    the angles of its latest solve. A graph within max_change of a lineage
+    starts from its angles, and one further from all of them starts afresh.
+    Lineages are kept per optimization setup, e.g. a solve_config(), as
+    angles only carry over between solves of the same circuit.
+    """
+    def __init__(self, max_change=MAX_GRAPH_CHANGE, max_lineages=MAX_LINEAGES):
+        self.max_change = max_change
+        self.max_lineages = max_lineages
+        self.hits = 0
+        self.misses = 0
+        # Per setup, a list of [adj_matrix, rotations], most recently used last
+        self._lineages = {}
+        self._lock = threading.Lock()
+
+    def _nearest(self, lineages, adj_matrix):
+        changes = [graph_change(lineage_adj_matrix, adj_matrix) for lineage_adj_matrix, _ in lineages]
+        if not changes or min(changes) > self.max_change:
+            return None
+        return int(np.argmin(changes))
+
+    def get(self, config, adj_matrix):
+        """Angles to start a solve of adj_matrix from, or None to start afresh, counting a hit or a miss"""
+        with self._lock:
+            lineages = self._lineages.get(config, [])
+            idx = self._nearest(lineages, adj_matrix)
+            if idx is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            lineages.append(lineages.pop(idx))
+            return lineages[-1][1].copy()
+
+    def put(self, config, adj_matrix, rotations):
+        """Record the converged angles of a solve, continuing the lineage of the nearest graph"""
+        entry = [np.array(adj_matrix, dtype=float), np.array(rotations, dtype=float)]
+        with self._lock:
+            lineages = self._lineages.setdefault(config, [])
+            idx = self._nearest(lineages, adj_matrix)
+            if idx is not None:
+                del lineages[idx]
+            lineages.append(entry)
+            del lineages[:-self.max_lineages]
+
+    def clear(self):
+        with self._lock:
+            self._lineages.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'lineages': sum(len(lineages) for lineages in self._lineages.values()),
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -14,13 +14,27 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import os
+
 import pygame
 
+
+# Fonts are loaded from the file shipped with pygame rather than scanned for
+# with SysFont, which walks every installed system font and dominates startup time.
+
+def default_font_path():
+    return os.path.join(os.path.dirname(pygame.font.__file__), pygame.font.get_default_font())
+
+
+def load_font(size):
+    return pygame.font.Font(default_font_path(), size)
+
+
 pygame.font.init()
-ARIAL_48 = pygame.font.SysFont('Arial', 44)
-ARIAL_36 = pygame.font.SysFont('Arial', 30)
-ARIAL_30 = pygame.font.SysFont('Arial', 26)
-ARIAL_24 = pygame.font.SysFont('Arial', 20)
-ARIAL_22 = pygame.font.SysFont('Arial', 18)
-ARIAL_20 = pygame.font.SysFont('Arial', 16)
-ARIAL_16 = pygame.font.SysFont('Arial', 12)
+ARIAL_48 = load_font(44)
+ARIAL_36 = load_font(30)
+ARIAL_30 = load_font(26)
+ARIAL_24 = load_font(20)
+ARIAL_22 = load_font(18)
+ARIAL_20 = load_font(16)
+ARIAL_16 = load_font(12)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Deferred imports of heavy modules, timed so startup regressions are visible.
+
+The WARM_MODULES are imported on a background thread while the window
+opens, and the first frame needs none of them: its state is simulated with
+NumPy and the network graph appears once it has been rendered. Set
+VQE_PLAYGROUND_IMPORT_REPORT=1 to print how long each import took.
+"""
+import importlib
+import os
+import threading
+import time
+
+# Modules that are slow to import and are only needed once a component is first used
+WARM_MODULES = (
+    'qiskit',
+    'networkx',
+    'matplotlib',
+)
+
+IMPORT_REPORT_ENV = 'VQE_PLAYGROUND_IMPORT_REPORT'
+
+_import_times = {}
+_import_times_lock = threading.Lock()
+_process_start = time.perf_counter()
+
+
+def lazy_import(module_name):
+    """Import a module on first use, recording how long the first import took"""
+    if module_name in _import_times:
+        return importlib.import_module(module_name)
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+    with _import_times_lock:
+        if module_name not in _import_times:
+            _import_times[module_name] = (elapsed, threading.current_thread().name)
+    return module
+
+
+def warm_imports(module_names=WARM_MODULES, callback=None):
+    """Import modules on a background thread so first use doesn't stall the UI"""
+    def warm():
+        for module_name in module_names:
+            try:
+                lazy_import(module_name)
+            except ImportError as error:
+                print('Could not warm import', module_name, ':', error)
+        if callback:
+            callback()
+
+    thread = threading.Thread(target=warm, name='warm-imports', daemon=True)
+    thread.start()
+    return thread
+
+
+def import_report():
+    """Return (module name, seconds, thread name) tuples, slowest first"""
+    with _import_times_lock:
+        entries = [(name, elapsed, thread_name)
+                   for name, (elapsed, thread_name) in _import_times.items()]
+    return sorted(entries, key=lambda entry: entry[1], reverse=True)
+
+
+def import_report_enabled():
+    return os.environ.get(IMPORT_REPORT_ENV, '') not in ('', '0')
+
+
+def print_import_report(label='Startup'):
+    print(label + ' import report (' +
+          str(round(time.perf_counter() - _process_start, 3)) + 's since start):')
+    for name, elapsed, thread_name in import_report():
+        print('  {:<55s} {:8.3f}s  [{}]'.format(name, elapsed, thread_name))
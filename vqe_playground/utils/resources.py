@@ -20,6 +20,8 @@ import pygame
 from pygame.compat import geterror
 from pygame.constants import RLEACCEL
 
+from vqe_playground.utils.surfaces import count_surface_allocations
+
 main_dir = os.path.split(os.path.abspath(__file__))[0]
 # main_dir = 'vqe_playground/utils/data'
 data_dir = os.path.join(main_dir, 'data')
@@ -34,6 +36,7 @@ def load_image(name, colorkey=None):
     except pygame.error:
         print ('Cannot load image!:', fullname)
         raise SystemExit(str(geterror()))
+    count_surface_allocations()
     image = image.convert()
     if colorkey is not None:
         if colorkey is -1:
@@ -49,6 +52,7 @@ def load_mem_image(buf, colorkey=None):
     except pygame.error:
         print ('Cannot load mem image!:', buf)
         raise SystemExit(str(geterror()))
+    count_surface_allocations()
     image = image.convert()
     if colorkey is not None:
         if colorkey is -1:
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Surface allocation in one place, with a counter showing which frames allocate"""
+import collections
+import os
+
+import pygame
+
+SURFACE_REPORT_ENV = 'VQE_PLAYGROUND_SURFACE_REPORT'
+
+# Rendered strings kept for reuse; labels repeat, and so do rounded values
+TEXT_CACHE_SIZE = 1024
+
+_num_allocations = 0
+_text_cache = collections.OrderedDict()
+
+
+def count_surface_allocations(count=1):
+    """Record surfaces created outside new_surface(), e.g. by loading an image"""
+    global _num_allocations
+    _num_allocations += count
+
+
+def new_surface(size, flags=0):
+    """Create a surface, counting it. Components create theirs once and redraw them in place"""
+    count_surface_allocations()
+    return pygame.Surface(size, flags)
+
+
+def render_text(font, text, color, antialias=False):
+    """Render text, reusing the surface from an earlier identical render.
+
+    Callers blit the result and must not draw on it, as it may be shared.
+    """
+    key = (font, text, color, antialias)
+    surface = _text_cache.get(key)
+    if surface is None:
+        count_surface_allocations()
+        surface = font.render(text, antialias, color)
+        _text_cache[key] = surface
+        while len(_text_cache) > TEXT_CACHE_SIZE:
+            _text_cache.popitem(last=False)
+    else:
+        _text_cache.move_to_end(key)
+    return surface
+
+
+def take_surface_allocations():
+    """Return the number of surfaces allocated since the last call, e.g. once per frame"""
+    global _num_allocations
+    num_allocations = _num_allocations
+    _num_allocations = 0
+    return num_allocations
+
+
+def surface_report_enabled():
+    return os.environ.get(SURFACE_REPORT_ENV, '') not in ('', '0')
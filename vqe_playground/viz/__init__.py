@@ -14,5 +14,24 @@
 # limitations under the License.
 #
 """Module for quantum vizualizations"""
-from .circuit_diagram import CircuitDiagram
-from .qsphere import QSphere
+import importlib
+
+# Visualizations are imported on first access, as several of them pull in
+# Qiskit and matplotlib, which are slow to import
+_LAZY_ATTRS = {
+    'CircuitDiagram': '.circuit_diagram',
+    'QSphere': '.qsphere',
+    'MeasurementsHistogram': '.measurements_histogram',
+    'ExpectationGrid': '.expectation_grid',
+    'NetworkGraph': '.network_graph',
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+    globals()[name] = value
+    return value
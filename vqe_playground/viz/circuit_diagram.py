@@ -14,29 +14,25 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-import pygame
+from vqe_playground.utils.imports import lazy_import
+from vqe_playground.viz.render_pool import PooledRenderSprite, PYPLOT_LOCK, figure_png
 
-from vqe_playground.utils.resources import load_image
 
-
-class CircuitDiagram(pygame.sprite.Sprite):
+class CircuitDiagram(PooledRenderSprite):
     """Displays a circuit diagram"""
-    def __init__(self, circuit):
-        pygame.sprite.Sprite.__init__(self)
-        self.image = None
-        self.rect = None
+    def __init__(self, circuit, render_pool=None):
+        PooledRenderSprite.__init__(self, render_pool)
         self.set_circuit(circuit)
 
-    # def update(self):
-    #     # Nothing yet
-    #     a = 1
-
     def set_circuit(self, circuit):
-        circuit_drawing = circuit.draw(output='mpl')
+        """Submit a render of the circuit, shown once receive_render() picks it up"""
+        self.request_render(render_circuit_diagram, circuit)
 
-        # TODO: Create a save_fig method that works cross-platform
-        #       and has exception handling
-        circuit_drawing.savefig("vqe_playground/utils/data/bell_circuit.png")
 
-        self.image, self.rect = load_image('bell_circuit.png', -1)
-        self.image.convert()
+def render_circuit_diagram(circuit):
+    plt = lazy_import('matplotlib.pyplot')
+    with PYPLOT_LOCK:
+        circuit_drawing = circuit.draw(output='mpl')
+        png = figure_png(circuit_drawing)
+        plt.close(circuit_drawing)
+    return png
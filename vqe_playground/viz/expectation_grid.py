@@ -16,34 +16,42 @@
 #
 import pygame
 import numpy as np
-from qiskit import BasicAer, execute
-from qiskit.optimization.applications.ising import max_cut
-from qiskit.aqua.operators.legacy import op_converter as op_c
 from vqe_playground.utils.colors import WHITE, BLACK
 from vqe_playground.utils.fonts import ARIAL_30, ARIAL_36
+from vqe_playground.utils.imports import lazy_import
+from vqe_playground.utils.surfaces import new_surface, render_text
+from vqe_playground.solver.maxcut import maxcut_eigenvalues, maxcut_cost_matrix, batch_expectation_values
+from vqe_playground.solver.exact import exact_maxcut
 from vqe_playground.utils.labels import graph_node_labels_reversed_str
 from vqe_playground.utils.states import comp_basis_states, NUM_QUBITS, NUM_STATE_DIMS
 
 
 class ExpectationGrid(pygame.sprite.Sprite):
     """Displays a grid that contains basis states, eigenvalues, and probabilities"""
-    def __init__(self, circuit, adj_matrix):
+    def __init__(self, statevector, adj_matrix):
         pygame.sprite.Sprite.__init__(self)
         self.eigenvalues = None
         self.maxcut_shift = 0
-        self.image = None
-        self.rect = None
+        self.optimal_solution = None
+        self.lowest_eigenvalue = 0
+        self.hamiltonian = None
+        # Redrawn in place, so new states and graphs don't allocate a surface
+        self.image = new_surface([(NUM_QUBITS + 1) * 50 + 450, 100 + NUM_STATE_DIMS * 50])
+        self.rect = self.image.get_rect()
         self.basis_states = comp_basis_states(NUM_QUBITS)
         self.quantum_state = None
         self.cur_exp_val = 0
+        # (mean, standard error) from noisy trajectories, replacing the ideal expectation value
+        self.noise_estimate = None
         self.cur_basis_state_idx = 0
         self.basis_state_dirty = False
 
-        # When setting circuit this first time,
+        # When setting the state this first time,
         # don't calculate the expectation value
         # or draw the expectation grid, as the
-        # adjacency matrix hasn't yet been supplied
-        self.set_circuit(circuit, recalc=False)
+        # adjacency matrix hasn't yet been supplied.
+        # The state is simulated by the caller, so Qiskit isn't needed yet
+        self.set_statevector(statevector, recalc=False)
         self.set_adj_matrix(adj_matrix)
 
     # def update(self):
@@ -51,64 +59,102 @@ class ExpectationGrid(pygame.sprite.Sprite):
     #     a = 1
 
     def set_circuit(self, circuit, recalc=True):
-        backend_sv_sim = BasicAer.get_backend('statevector_simulator')
-        job_sim = execute(circuit, backend_sv_sim)
+        qiskit = lazy_import('qiskit')
+        backend_sv_sim = qiskit.BasicAer.get_backend('statevector_simulator')
+        job_sim = qiskit.execute(circuit, backend_sv_sim)
         result_sim = job_sim.result()
-        self.quantum_state = result_sim.get_statevector(circuit, decimals=3)
+        self.set_statevector(result_sim.get_statevector(circuit, decimals=3), recalc)
+
+    def set_statevector(self, statevector, recalc=True, draw=True):
+        """Display a statevector simulated elsewhere, e.g. by the QAOA fast path.
+        Without draw, the expectation value is updated but the grid isn't redrawn."""
+        self.quantum_state = statevector
+        self.noise_estimate = None
 
         if recalc:
             self.calc_expectation_value()
-            self.draw_expectation_grid()
+            if draw:
+                self.draw_expectation_grid()
+
+    def set_probabilities(self, probabilities, recalc=True):
+        """Display recorded measurement probabilities, e.g. from a replayed trace.
+
+        Only magnitudes are drawn, so real amplitudes stand in for the statevector.
+        """
+        self.set_statevector(np.sqrt(np.asarray(probabilities, dtype=float)), recalc)
 
     def set_adj_matrix(self, adj_matrix):
-        maxcut_op, self.maxcut_shift = max_cut.get_operator(adj_matrix)
-        # print("maxcut_op: ", maxcut_op, ", maxcut_shift: ", maxcut_shift)
+        self.hamiltonian = None
+        self.eigenvalues, self.maxcut_shift = maxcut_eigenvalues(adj_matrix)
+        self.optimal_solution = exact_maxcut(adj_matrix)
+        self.lowest_eigenvalue = self.optimal_solution.lowest_eigenvalue(self.maxcut_shift)
 
-        maxcut_to_matrix = op_c.to_matrix_operator(maxcut_op)
-        self.eigenvalues = maxcut_to_matrix.dia_matrix
+        self.calc_expectation_value()
+        self.draw_expectation_grid()
+
+    def set_noise_estimate(self, exp_val, std_error, draw=True):
+        """Show an expectation value estimated from noisy trajectories, until the next set_circuit"""
+        self.noise_estimate = (exp_val, std_error)
+        self.calc_expectation_value()
+        if draw:
+            self.draw_expectation_grid()
+
+    def set_hamiltonian(self, hamiltonian):
+        """Use a PauliSum, possibly non-diagonal, in place of the MaxCut Hamiltonian.
+
+        The grid column then shows the diagonal of the Hamiltonian, and the
+        expectation value is measured group by group from the statevector.
+        """
+        self.hamiltonian = hamiltonian
+        self.eigenvalues = hamiltonian.diagonal()
+        self.maxcut_shift = 0
+        self.optimal_solution = None
+        self.lowest_eigenvalue = hamiltonian.lowest_eigenvalue()
 
         self.calc_expectation_value()
         self.draw_expectation_grid()
 
     def draw_expectation_grid(self):
-        self.image = pygame.Surface([(NUM_QUBITS + 1) * 50 + 450, 100 + NUM_STATE_DIMS * 50])
-        self.image.convert()
         self.image.fill(WHITE)
-        self.rect = self.image.get_rect()
 
         block_size = 26
         x_offset = 400
         y_offset = 10
 
         # Display expectation value and other relevant values
-        text_surface = ARIAL_36.render('Weighted average: ' + str(round(self.cur_exp_val, 2)), False, (0, 0, 0))
+        weighted_average = str(round(self.cur_exp_val, 2))
+        if self.noise_estimate is not None:
+            weighted_average += ' +/- ' + str(round(self.noise_estimate[1], 2))
+        text_surface = render_text(ARIAL_36, 'Weighted average: ' + weighted_average, BLACK)
         self.image.blit(text_surface, (0, y_offset + block_size * 13))
 
-        text_surface = ARIAL_36.render('Lowest eigenvalue: ' + str(round(min(self.eigenvalues), 1)), False, (0, 0, 0))
+        text_surface = render_text(ARIAL_36, 'Lowest eigenvalue: ' + str(round(self.lowest_eigenvalue, 1)), BLACK)
         self.image.blit(text_surface, (0, y_offset + block_size * 14))
 
-        maxcut_cost = round(self.cur_exp_val - min(self.eigenvalues), 2)
-        text_surface = ARIAL_36.render('Maxcut cost: ' + str(maxcut_cost), False, (0, 0, 0))
+        maxcut_cost = round(self.cur_exp_val - self.lowest_eigenvalue, 2)
+        text_surface = render_text(ARIAL_36, 'Maxcut cost: ' + str(maxcut_cost), BLACK)
         self.image.blit(text_surface, (0, y_offset + block_size * 15))
 
-        text_surface = ARIAL_36.render('Basis state: ' + str(self.basis_states[self.cur_basis_state_idx]),
-                                       False, (0, 0, 0))
+        text_surface = render_text(ARIAL_36, 'Basis state: ' + str(self.basis_states[self.cur_basis_state_idx]), BLACK)
         self.image.blit(text_surface, (0, y_offset + block_size * 16))
 
-        text_surface = ARIAL_36.render('Maxcut eigenval shift: ' + str(round(self.maxcut_shift, 1)), False, (0, 0, 0))
+        text_surface = render_text(ARIAL_36, 'Maxcut eigenval shift: ' + str(round(self.maxcut_shift, 1)), BLACK)
         self.image.blit(text_surface, (0, y_offset + block_size * 17))
 
-        text_surface = ARIAL_36.render('Maxcut weight total: ' + str(round(self.cur_exp_val + self.maxcut_shift, 2)), False, (0, 0, 0))
+        text_surface = render_text(ARIAL_36, 'Maxcut weight total: ' + str(round(self.cur_exp_val + self.maxcut_shift, 2)), BLACK)
         self.image.blit(text_surface, (0, y_offset + block_size * 18))
 
+        if self.optimal_solution is not None:
+            text_surface = render_text(ARIAL_36, 'Approximation ratio: ' + str(round(self.approximation_ratio(), 3)), BLACK)
+            self.image.blit(text_surface, (0, y_offset + block_size * 19))
+
         # Display column headings
         node_letter_str = graph_node_labels_reversed_str(NUM_QUBITS)
-        text_surface = ARIAL_30.render(node_letter_str + '  Eigenval  Prob', False, (0, 0, 0))
+        text_surface = render_text(ARIAL_30, node_letter_str + '  Eigenval  Prob', BLACK)
         self.image.blit(text_surface, (x_offset, y_offset + block_size / 2))
 
         for y in range(NUM_STATE_DIMS):
-            text_surface = ARIAL_36.render(self.basis_states[y] + ":  " + str(round(self.eigenvalues[y], 1)),
-                                           False, (0, 0, 0))
+            text_surface = render_text(ARIAL_36, self.basis_states[y] + ":  " + str(round(self.eigenvalues[y], 1)), BLACK)
             self.image.blit(text_surface, (x_offset, (y + 2) * block_size + y_offset))
 
             prop_square_side = abs(self.quantum_state[y]) * block_size
@@ -119,9 +165,26 @@ class ExpectationGrid(pygame.sprite.Sprite):
             if abs(self.quantum_state[y]) > 0:
                 pygame.draw.rect(self.image, BLACK, rect, 2)
 
+    def expectation_values_for(self, adj_matrices):
+        """Expectation value of the current state for each graph in a stack of
+        adjacency matrices, without changing the graph this grid displays"""
+        cost_matrix = maxcut_cost_matrix(adj_matrices)[0]
+        return batch_expectation_values(cost_matrix, np.absolute(self.quantum_state) ** 2)
+
+    def approximation_ratio(self):
+        """Expected cut weight of the current state as a fraction of the optimal cut"""
+        if self.optimal_solution.cut_value <= 0:
+            return 1.0
+        return -(self.cur_exp_val + self.maxcut_shift) / self.optimal_solution.cut_value
+
     def calc_expectation_value(self):
         statevector_probs = np.absolute(self.quantum_state) ** 2
-        exp_val = np.sum(self.eigenvalues * statevector_probs)
+        if self.noise_estimate is not None:
+            exp_val = self.noise_estimate[0]
+        elif self.hamiltonian is None:
+            exp_val = np.sum(self.eigenvalues * statevector_probs)
+        else:
+            exp_val = self.hamiltonian.expectation(self.quantum_state)
         self.cur_exp_val = exp_val
 
         basis_state_idx = np.argmax(statevector_probs)
@@ -14,44 +14,43 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-import pygame
-from qiskit import BasicAer, QuantumRegister, ClassicalRegister, QuantumCircuit, execute
-from qiskit.tools.visualization import plot_histogram
-
-from vqe_playground.utils.resources import load_image
+from vqe_playground.utils.imports import lazy_import
+from vqe_playground.viz.render_pool import PooledRenderSprite, PYPLOT_LOCK, figure_png
 
 DEFAULT_NUM_SHOTS = 100
 
-class MeasurementsHistogram(pygame.sprite.Sprite):
+class MeasurementsHistogram(PooledRenderSprite):
     """Displays a histogram with measurements"""
-    def __init__(self, circuit, num_shots=DEFAULT_NUM_SHOTS):
-        pygame.sprite.Sprite.__init__(self)
-        self.image = None
-        self.rect = None
+    def __init__(self, circuit, num_shots=DEFAULT_NUM_SHOTS, render_pool=None):
+        PooledRenderSprite.__init__(self, render_pool)
         self.set_circuit(circuit, num_shots)
 
-    # def update(self):
-    #     # Nothing yet
-    #     a = 1
-
     def set_circuit(self, circuit, num_shots=DEFAULT_NUM_SHOTS):
-        backend_sim = BasicAer.get_backend('qasm_simulator')
-        qr = QuantumRegister(circuit.width(), 'q')
-        cr = ClassicalRegister(circuit.width(), 'c')
-        meas_circ = QuantumCircuit(qr, cr)
-        meas_circ.barrier(qr)
-        meas_circ.measure(qr, cr)
-        complete_circuit = circuit + meas_circ
-
-        job_sim = execute(complete_circuit, backend_sim, shots=num_shots)
-
-        result_sim = job_sim.result()
-
-        counts = result_sim.get_counts(complete_circuit)
-        print(counts)
-
-        histogram = plot_histogram(counts)
-        histogram.savefig("vqe_playground/utils/data/bell_histogram.png")
-
-        self.image, self.rect = load_image('bell_histogram.png', -1)
-        self.image.convert()
+        """Submit a render of measurement counts, shown once receive_render() picks it up"""
+        self.request_render(render_measurements_histogram, circuit, num_shots)
+
+
+def render_measurements_histogram(circuit, num_shots):
+    qiskit = lazy_import('qiskit')
+    visualization = lazy_import('qiskit.tools.visualization')
+    plt = lazy_import('matplotlib.pyplot')
+    backend_sim = qiskit.BasicAer.get_backend('qasm_simulator')
+    qr = qiskit.QuantumRegister(circuit.width(), 'q')
+    cr = qiskit.ClassicalRegister(circuit.width(), 'c')
+    meas_circ = qiskit.QuantumCircuit(qr, cr)
+    meas_circ.barrier(qr)
+    meas_circ.measure(qr, cr)
+    complete_circuit = circuit + meas_circ
+
+    job_sim = qiskit.execute(complete_circuit, backend_sim, shots=num_shots)
+
+    result_sim = job_sim.result()
+
+    counts = result_sim.get_counts(complete_circuit)
+    print(counts)
+
+    with PYPLOT_LOCK:
+        histogram = visualization.plot_histogram(counts)
+        png = figure_png(histogram)
+        plt.close(histogram)
+    return png
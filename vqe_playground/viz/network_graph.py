@@ -14,52 +14,40 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-import pygame
 import numpy as np
-import matplotlib.pyplot as plt
-import networkx as nx
 from cmath import isclose
-import io
 
-from vqe_playground.utils.resources import load_mem_image
+from vqe_playground.utils.imports import lazy_import
 from vqe_playground.utils.labels import comp_graph_node_labels
+from vqe_playground.viz.render_pool import PooledRenderSprite, figure_png
 
 
-class NetworkGraph(pygame.sprite.Sprite):
-    """Displays a network graph"""
-    def __init__(self, adj_matrix):
-        pygame.sprite.Sprite.__init__(self)
-        self.image = None
-        self.rect = None
+class NetworkGraph(PooledRenderSprite):
+    """Displays a network graph, drawn on the render pool.
+
+    The graph and its layout are built on the render worker too, so
+    networkx is never imported on the main thread. Each graph gets one
+    layout seed, so redrawing it with a new solution keeps its layout.
+    """
+    # Blank until the first render arrives, so the first frame doesn't wait for matplotlib.
+    # Renders are 7 x 5 inch figures at 100 dpi
+    placeholder_size = (700, 500)
+
+    def __init__(self, adj_matrix, layout_seed=None, render_pool=None):
+        PooledRenderSprite.__init__(self, render_pool)
+        self.layout_seed = layout_seed
+        self.graph_layout_seed = None
         self.adj_matrix = None
         self.solution = None
-        self.graph = nx.Graph()
-        self.graph_pos = None
         self.num_nodes = adj_matrix.shape[0] # Number of nodes in graph
         self.set_adj_matrix(adj_matrix)
 
-    def update(self):
-        self.draw_network_graph(self.calc_node_colors())
-
     def set_adj_matrix(self, adj_matrix):
-        self.graph = nx.Graph()
         self.adj_matrix = adj_matrix
         self.solution = np.zeros(self.num_nodes)
-
-        fig = plt.figure(figsize=(7, 5))
-
-        self.graph.add_nodes_from(np.arange(0, self.num_nodes, 1))
-
-        # tuple is (i,j,weight) where (i,j) is the edge
-        edge_list = []
-        for i in range(self.num_nodes):
-            for j in range(i + 1, self.num_nodes):
-                if not isclose(adj_matrix[i, j], 0.0):
-                    edge_list.append((i, j, adj_matrix[i, j]))
-
-        self.graph.add_weighted_edges_from(edge_list)
-
-        self.graph_pos = nx.spring_layout(self.graph)
+        self.graph_layout_seed = self.layout_seed
+        if self.graph_layout_seed is None:
+            self.graph_layout_seed = np.random.randint(2 ** 31)
         self.draw_network_graph(self.calc_node_colors())
 
     def set_solution(self, solution):
@@ -68,20 +56,43 @@ class NetworkGraph(pygame.sprite.Sprite):
         self.draw_network_graph(self.calc_node_colors())
 
     def draw_network_graph(self, colors):
-        edge_labels = dict([((u, v,), self.adj_matrix[u, v]) for u, v, d in self.graph.edges(data=True)])
-        nx.draw_networkx_edge_labels(self.graph, self.graph_pos, edge_labels=edge_labels)
-
-        labels = comp_graph_node_labels(self.num_nodes)
-        nx.draw_networkx_labels(self.graph, self.graph_pos, labels, font_size=16, font_color='white')
-
-        nx.draw_networkx(self.graph, self.graph_pos, with_labels=False, node_color=colors, node_size=600, alpha=.8, font_color='white')
-        plt.axis('off')
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png")
-
-        self.image, self.rect = load_mem_image(buf, -1)
-        self.image.convert()
+        """Submit a render of the graph, which replaces the image once receive_render() picks it up"""
+        # The adjacency matrix control edits its matrix in place, so the render gets a copy
+        self.request_render(render_network_graph, np.array(self.adj_matrix), self.graph_layout_seed,
+                            comp_graph_node_labels(self.num_nodes), colors)
 
     def calc_node_colors(self):
         return ['r' if self.solution[self.num_nodes - i - 1] == 0 else 'b' for i in range(self.num_nodes)]
 
+
+def render_network_graph(adj_matrix, layout_seed, labels, colors):
+    """Draw a graph to PNG bytes. Runs on a render worker, so it uses a Figure rather than pyplot"""
+    nx = lazy_import('networkx')
+    figure_module = lazy_import('matplotlib.figure')
+    backend_agg = lazy_import('matplotlib.backends.backend_agg')
+
+    num_nodes = adj_matrix.shape[0]
+    graph = nx.Graph()
+    graph.add_nodes_from(np.arange(0, num_nodes, 1))
+
+    # tuple is (i,j,weight) where (i,j) is the edge
+    edge_list = []
+    for i in range(num_nodes):
+        for j in range(i + 1, num_nodes):
+            if not isclose(adj_matrix[i, j], 0.0):
+                edge_list.append((i, j, adj_matrix[i, j]))
+
+    graph.add_weighted_edges_from(edge_list)
+    graph_pos = nx.spring_layout(graph, seed=layout_seed)
+    edge_labels = dict([((u, v,), adj_matrix[u, v]) for u, v, d in graph.edges(data=True)])
+
+    figure = figure_module.Figure(figsize=(7, 5))
+    backend_agg.FigureCanvasAgg(figure)
+    ax = figure.add_subplot(1, 1, 1)
+
+    nx.draw_networkx_edge_labels(graph, graph_pos, edge_labels=edge_labels, ax=ax)
+    nx.draw_networkx_labels(graph, graph_pos, labels, font_size=16, font_color='white', ax=ax)
+    nx.draw_networkx(graph, graph_pos, with_labels=False, node_color=colors, node_size=600, alpha=.8,
+                     font_color='white', ax=ax)
+    ax.axis('off')
+    return figure_png(figure)
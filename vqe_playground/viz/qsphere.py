@@ -14,34 +14,34 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
-import pygame
-from qiskit import BasicAer, execute
-from qiskit.tools.visualization import plot_state_qsphere
+from vqe_playground.utils.imports import lazy_import
+from vqe_playground.viz.render_pool import PooledRenderSprite, PYPLOT_LOCK, figure_png
 
-from vqe_playground.utils.resources import load_image
 
-
-class QSphere(pygame.sprite.Sprite):
+class QSphere(PooledRenderSprite):
     """Displays a qsphere"""
-    def __init__(self, circuit):
-        pygame.sprite.Sprite.__init__(self)
-        self.image = None
-        self.rect = None
-        self.set_circuit(circuit)
+    rect_inflation = (-100, -100)
 
-    # def update(self):
-    #     # Nothing yet
-    #     a = 1
+    def __init__(self, circuit, render_pool=None):
+        PooledRenderSprite.__init__(self, render_pool)
+        self.set_circuit(circuit)
 
     def set_circuit(self, circuit):
-        backend_sv_sim = BasicAer.get_backend('statevector_simulator')
-        job_sim = execute(circuit, backend_sv_sim)
-        result_sim = job_sim.result()
+        """Submit a render of the circuit's qsphere, shown once receive_render() picks it up"""
+        self.request_render(render_qsphere, circuit)
+
 
-        quantum_state = result_sim.get_statevector(circuit, decimals=3)
-        qsphere = plot_state_qsphere(quantum_state)
-        qsphere.savefig("vqe_playground/utils/data/bell_qsphere.png")
+def render_qsphere(circuit):
+    qiskit = lazy_import('qiskit')
+    visualization = lazy_import('qiskit.tools.visualization')
+    plt = lazy_import('matplotlib.pyplot')
+    backend_sv_sim = qiskit.BasicAer.get_backend('statevector_simulator')
+    job_sim = qiskit.execute(circuit, backend_sv_sim)
+    result_sim = job_sim.result()
 
-        self.image, self.rect = load_image('bell_qsphere.png', -1)
-        self.rect.inflate_ip(-100, -100)
-        self.image.convert()
+    quantum_state = result_sim.get_statevector(circuit, decimals=3)
+    with PYPLOT_LOCK:
+        qsphere = visualization.plot_state_qsphere(quantum_state)
+        png = figure_png(qsphere)
+        plt.close(qsphere)
+    return png
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+#
+# Copyright 2019 the original author or authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Rendering of matplotlib figures on worker threads, so drawing them doesn't stall input.
+
+Renders return PNG bytes. Only turning those into a pygame surface happens
+on the main thread, in PooledRenderSprite.receive_render().
+"""
+import concurrent.futures
+import io
+import threading
+
+import pygame
+
+from vqe_playground.utils.colors import WHITE
+from vqe_playground.utils.resources import load_mem_image
+from vqe_playground.utils.surfaces import new_surface
+
+DEFAULT_RENDER_WORKERS = 2
+
+# pyplot keeps global figure state, so renders that go through it (such as
+# Qiskit's plots) take turns, while renders using Figure objects directly run freely
+PYPLOT_LOCK = threading.Lock()
+
+
+class RenderPool():
+    """Worker threads rendering figures, with at most one pending render per key.
+
+    Submitting a render for a key replaces any earlier one still pending
+    for it: the earlier one is cancelled if it hasn't started, and its
+    result is ignored if it has. submit() and take() are called from the
+    main thread only.
+    """
+    def __init__(self, max_workers=DEFAULT_RENDER_WORKERS):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                              thread_name_prefix='render')
+        self._pending = {}
+
+    def submit(self, key, render, *args):
+        stale = self._pending.get(key)
+        if stale is not None:
+            stale.cancel()
+        future = self.executor.submit(render, *args)
+        self._pending[key] = future
+        return future
+
+    def pending(self, key):
+        return key in self._pending
+
+    def take(self, key, wait=False):
+        """The result of the latest render for key once it is done (or, with wait, once it finishes),
+        otherwise None. A render that raised re-raises here."""
+        future = self._pending.get(key)
+        if future is None or not (wait or future.done()):
+            return None
+        del self._pending[key]
+        return future.result()
+
+    def shutdown(self):
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self.executor.shutdown()
+
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def default_render_pool():
+    """Render pool shared by the visualizations, created on first use"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = RenderPool()
+        return _render_pool
+
+
+def shutdown_render_pool():
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown()
+            _render_pool = None
+
+
+def figure_png(figure):
+    buf = io.BytesIO()
+    figure.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+class PooledRenderSprite(pygame.sprite.Sprite):
+    """Sprite whose image is a figure rendered on a RenderPool.
+
+    request_render() submits a render returning PNG bytes, and the current
+    image stays on display until receive_render() swaps in the result. A
+    sprite with no image yet waits for its first render, so it always has
+    a rect to lay out, unless it has a placeholder_size to show blank until then.
+    """
+    # Added to the size of each rendered image's rect, around its centre
+    rect_inflation = (0, 0)
+    # Size of the rendered images, if known, for a blank image shown until the first render
+    placeholder_size = None
+
+    def __init__(self, render_pool=None):
+        pygame.sprite.Sprite.__init__(self)
+        self.image = None
+        self.rect = None
+        self.render_pool = render_pool or default_render_pool()
+        if self.placeholder_size is not None:
+            self.image = new_surface(self.placeholder_size)
+            self.image.fill(WHITE)
+            self.rect = self.image.get_rect().inflate(*self.rect_inflation)
+
+    def update(self):
+        self.receive_render()
+
+    def request_render(self, render, *args):
+        return self.render_pool.submit(self, render, *args)
+
+    def receive_render(self, wait=False):
+        """Show the latest finished render, returning True if the image changed"""
+        png = self.render_pool.take(self, wait or self.image is None)
+        if png is None:
+            return False
+
+        image, rect = load_mem_image(io.BytesIO(png), -1)
+        rect.inflate_ip(*self.rect_inflation)
+        if self.rect is not None:
+            rect.topleft = self.rect.topleft
+        self.image, self.rect = image, rect
+        return True
@@ -26,33 +26,82 @@
 # TODO:     - move vertices to each's side of the cut
 # TODO: Make TSP and other demos, including chemistry
 # TODO: Make displays update during optimization
-# TODO: Modify optimizer to fit pluggable Aqua framework
 # TODO: Create network graph component?
 # TODO: Update QSphere visualization and leverage it here
 #
 """Demonstrate Variational Quantum Eigensolver (VQE) concepts using Qiskit and Pygame"""
 
+import os
+import time
 from pygame.locals import *
-from qiskit import ClassicalRegister
-from qiskit import execute
 # from qiskit.optimization.applications.ising import max_cut
 from .containers import *
 from .controls.circuit_grid import *
 from .model.circuit_grid_model import *
+from .model.ansatz import hardware_efficient_ansatz, DEFAULT_DEPTH, QAOATemplate
 from .utils.gamepad import *
 from .utils.states import NUM_QUBITS, NUM_STATE_DIMS
+from .solver.objective_cache import ObjectiveCache, adjacency_hash
+from .solver.checkpoint import CheckpointWriter, load_matching_checkpoint
+from .solver.trace import TraceRecorder
+from .solver.results_cache import ResultsCache, solve_config
+from .solver.warm_start import WarmStarts, choose_start
+from .solver.maxcut import cut_value
+from .solver.stepping import SteppingOptimizer
+from .solver.optimizers import make_optimizer
+from .solver.stop_criteria import StopCriteria
+from .solver.symmetry import expand_reduced, wire_is_idle
+from .sim.noise import noisy_expectation, shutdown_trajectory_executor
+from .sim.qaoa import qaoa_statevector
+from .sim.parametric import parametric_statevector
+from .sim.statevector import simulate_statevector
+from .utils.imports import warm_imports, import_report_enabled, print_import_report
+from .utils.surfaces import surface_report_enabled, take_surface_allocations
 from .viz.expectation_grid import ExpectationGrid
 from .viz.network_graph import NetworkGraph
+from .viz.render_pool import shutdown_render_pool
 from .controls.adjacency_matrix import AdjacencyMatrix
 from .controls.button import Button
 
 WINDOW_SIZE = 1650, 950
 NUM_OPTIMIZATION_EPOCHS = 1
 
+# Statevectors are rounded for display, so reaching the optimum is judged loosely
+OPTIMUM_TOLERANCE = 0.01
+ANSATZ_DEPTH = DEFAULT_DEPTH
+
+# Milliseconds of each frame given to the optimizer, and how often the display follows it
+OPTIMIZATION_FRAME_BUDGET_MS = 20
+VIZ_REFRESH_HZ = 10
+
+# Page Up and Page Down move a replay by this fraction of the run
+REPLAY_SEEK_FRACTION = 0.05
+
+INITIAL_ADJ_MATRIX = np.array([
+    [0, 3, 1, 3, 0],
+    [3, 0, 0, 0, 2],
+    [1, 0, 0, 3, 0],
+    [3, 0, 3, 0, 2],
+    [0, 2, 0, 2, 0]
+])
+
 
 class VQEPlayground():
     """Main object for application"""
-    def __init__(self):
+    def __init__(self, ansatz=None, headless=False, checkpoint_path=None, trace_path=None, replay=None,
+                 frame_budget_ms=OPTIMIZATION_FRAME_BUDGET_MS, viz_refresh_hz=VIZ_REFRESH_HZ,
+                 results_cache_path=None, warm_start=True, optimizer='stepping', max_evaluations=None,
+                 num_epochs=NUM_OPTIMIZATION_EPOCHS, stop_criteria=None, cvar=None, symmetry=False,
+                 noise_model=None):
+        if headless:
+            # Render into off-screen surfaces without opening a window
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        self.headless = headless
+        if symmetry and isinstance(ansatz, QAOATemplate):
+            raise ValueError('Symmetry reduction needs a layered ansatz, as the QAOA circuit acts on every node')
+        # With symmetry the last node stays on side 0, so its wire is left idle and isn't simulated
+        self.symmetry = symmetry
+        self.ansatz = ansatz or hardware_efficient_ansatz(NUM_QUBITS - symmetry, ANSATZ_DEPTH)
         self.screen = pygame.display.set_mode(WINDOW_SIZE)
         self.background = pygame.Surface(self.screen.get_size())
         self.circuit_grid_model = None
@@ -69,22 +118,55 @@ class VQEPlayground():
         # the optimizing algorithm is running
         self.optimization_desired = False
         self.optimization_initialized = False
+        self.optimizer = None
+        # Which of optimizers.OPTIMIZERS to run, for how many epochs of the stepping
+        # search, and the StopCriteria that may end it sooner
+        self.optimizer_name = optimizer
+        self.num_epochs = num_epochs
+        self.stop_criteria = stop_criteria or StopCriteria()
+        if max_evaluations is not None:
+            self.stop_criteria = self.stop_criteria.replace(max_evaluations=max_evaluations)
+        # A CVaR to minimize in place of the expectation value, and its estimator for this optimization
+        self.cvar = cvar
+        self.cvar_estimate = None
+        self.optimizer_steps = None
         self.optimized_rotations = None
-        self.cur_optimization_epoch = 0
-        self.cur_rotation_num = 0
-        self.min_distance = None
-        self.rotation_initialized = False
-        self.finished_rotating = True
-        self.rotation_iterations = 0
-        self.proposed_cur_ang_rad = 0
-        self.cur_ang_rad = 0
+        self.rotation_gate_nodes = None
         self.frequent_viz_update = True
 
+        # Each frame runs the optimizer for up to frame_budget_ms, while the
+        # display catches up with it at most viz_refresh_hz times a second
+        self.frame_budget_ms = frame_budget_ms
+        self.viz_refresh_hz = viz_refresh_hz
+        self.next_viz_refresh = 0.0
+        self.objective_cache = ObjectiveCache()
+        self.structure_hash = None
+        self.checkpoint = CheckpointWriter(checkpoint_path) if checkpoint_path else None
+        self.trace = TraceRecorder(trace_path) if trace_path else None
+        self.results_cache = ResultsCache(results_cache_path) if results_cache_path else None
+        # Optimizing after editing a few edges starts from the angles found before the edit
+        self.warm_starts = WarmStarts() if warm_start else None
+        # Whether the current optimization started from such angles
+        self.warm_started = False
+
+        # A NoiseModel to simulate the circuit with, or None for ideal simulation
+        self.noise_model = noise_model
+
+        # A TraceReplay to play back instead of optimizing
+        self.replay = replay
+        # In QAOA mode, the gammas and betas of the state on display
+        self.qaoa_parameters = None
+
     def main(self):
+        # Start importing Qiskit, networkx and matplotlib while the window comes up.
+        # The first frame needs none of them: its state is simulated with NumPy,
+        # and the network graph is blank until its first render arrives
+        warm_imports()
+
         if not pygame.font: print('Warning, fonts disabled')
         if not pygame.mixer: print('Warning, sound disabled')
 
-        pygame.init()
+        self.init_display()
 
         pygame.joystick.init()
         num_joysticks = pygame.joystick.get_count()
@@ -94,117 +176,33 @@ class VQEPlayground():
             joystick = pygame.joystick.Joystick(0)
             joystick.init()
 
-        self.background = pygame.Surface(self.screen.get_size())
-        self.background = self.background.convert()
-        self.background.fill(WHITE)
-
-        pygame.font.init()
-
-        self.circuit_grid_model = CircuitGridModel(NUM_QUBITS, 21)
-
-        pygame.display.set_caption('VQE Playground')
-
-        self.screen.blit(self.background, (0, 0))
-        pygame.display.flip()
-
         # Prepare objects
         clock = pygame.time.Clock()
 
-        self.circuit_grid_model.set_node(0, 0, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(1, 0, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(2, 0, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(3, 0, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(4, 0, CircuitGridNode(node_types.Y, np.pi))
-
-        self.circuit_grid_model.set_node(1, 1, CircuitGridNode(node_types.X, 0, 0))
-        self.circuit_grid_model.set_node(2, 2, CircuitGridNode(node_types.X, 0, 1))
-        self.circuit_grid_model.set_node(3, 3, CircuitGridNode(node_types.X, 0, 2))
-        self.circuit_grid_model.set_node(4, 4, CircuitGridNode(node_types.X, 0, 3))
-
-        self.circuit_grid_model.set_node(0, 5, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(1, 5, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(2, 5, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(3, 5, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(4, 5, CircuitGridNode(node_types.Y, np.pi))
-
-        self.circuit_grid_model.set_node(1, 6, CircuitGridNode(node_types.X, 0, 0))
-        self.circuit_grid_model.set_node(2, 7, CircuitGridNode(node_types.X, 0, 1))
-        self.circuit_grid_model.set_node(3, 8, CircuitGridNode(node_types.X, 0, 2))
-        self.circuit_grid_model.set_node(4, 9, CircuitGridNode(node_types.X, 0, 3))
-
-        self.circuit_grid_model.set_node(0, 10, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(1, 10, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(2, 10, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(3, 10, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(4, 10, CircuitGridNode(node_types.Y, np.pi))
-
-        self.circuit_grid_model.set_node(1, 11, CircuitGridNode(node_types.X, 0, 0))
-        self.circuit_grid_model.set_node(2, 12, CircuitGridNode(node_types.X, 0, 1))
-        self.circuit_grid_model.set_node(3, 13, CircuitGridNode(node_types.X, 0, 2))
-        self.circuit_grid_model.set_node(4, 14, CircuitGridNode(node_types.X, 0, 3))
-
-        self.circuit_grid_model.set_node(0, 15, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(1, 15, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(2, 15, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(3, 15, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(4, 15, CircuitGridNode(node_types.Y, np.pi))
-
-        self.circuit_grid_model.set_node(1, 16, CircuitGridNode(node_types.X, 0, 0))
-        self.circuit_grid_model.set_node(2, 17, CircuitGridNode(node_types.X, 0, 1))
-        self.circuit_grid_model.set_node(3, 18, CircuitGridNode(node_types.X, 0, 2))
-        self.circuit_grid_model.set_node(4, 19, CircuitGridNode(node_types.X, 0, 3))
-
-        self.circuit_grid_model.set_node(0, 20, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(1, 20, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(2, 20, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(3, 20, CircuitGridNode(node_types.Y, np.pi))
-        self.circuit_grid_model.set_node(4, 20, CircuitGridNode(node_types.Y, np.pi))
-
-        circuit = self.circuit_grid_model.compute_circuit()
-
-        initial_adj_matrix = np.array([
-            [0, 3, 1, 3, 0],
-            [3, 0, 0, 0, 2],
-            [1, 0, 0, 3, 0],
-            [3, 0, 3, 0, 2],
-            [0, 2, 0, 2, 0]
-        ])
-
-        # maxcut_op, maxcut_shift = maxcut.get_maxcut_qubitops(initial_adj_matrix)
-        # # print("maxcut_op: ", maxcut_op, ", maxcut_shift: ", maxcut_shift)
-        #
-        # # TODO: Find different approach of calculating and retrieving diagonal
-        # maxcut_op._paulis_to_matrix()
-        # eigenvectors = maxcut_op._dia_matrix
-
-        self.adjacency_matrix = AdjacencyMatrix(950, 10, initial_adj_matrix)
-        self.expectation_grid = ExpectationGrid(circuit,
-                                                self.adjacency_matrix.adj_matrix_numeric)
-
-        self.network_graph = NetworkGraph(self.adjacency_matrix.adj_matrix_numeric)
-        self.optimize_button = Button("Optimize", 150, 40)
-
-        self.top_sprites = HBox(50, 20, self.network_graph, self.optimize_button)
-        self.right_sprites = VBox(1010, 0, self.expectation_grid)
-
-        self.circuit_grid = CircuitGrid(10, 540, self.circuit_grid_model)
-        self.screen.blit(self.background, (0, 0))
-
-        self.top_sprites.draw(self.screen)
-        self.right_sprites.draw(self.screen)
-        self.circuit_grid.draw(self.screen)
-        self.adjacency_matrix.draw(self.screen)
+        self.create_components(INITIAL_ADJ_MATRIX)
+        if self.replay is not None:
+            self.start_replay(self.replay)
+        self.draw_all()
         pygame.display.flip()
 
+        if import_report_enabled():
+            print_import_report()
+
         gamepad_repeat_delay = 100
         gamepad_neutral = True
         gamepad_pressed_timer = 0
         gamepad_last_update = pygame.time.get_ticks()
 
+        # Surfaces allocated while starting up aren't reported
+        report_surfaces = surface_report_enabled()
+        take_surface_allocations()
+        frame_num = 0
+
         # Main Loop
         going = True
         while going:
-            clock.tick(30)
+            elapsed_ms = clock.tick(30)
+            frame_num += 1
 
             pygame.time.wait(10)
 
@@ -246,6 +244,10 @@ class VQEPlayground():
                 # if event.type != MOUSEMOTION:
                 #     print("event: ", event)
                 if event.type == QUIT:
+                    self.save_checkpoint()
+                    self.close_trace()
+                    shutdown_render_pool()
+                    shutdown_trajectory_executor()
                     pygame.quit()
                     print("Quitting VQE Playground")
                     return
@@ -261,6 +263,7 @@ class VQEPlayground():
                             if picker.rect.collidepoint(event.pos):
                                 self.adjacency_matrix.handle_element_clicked(picker)
                                 self.expectation_grid.set_adj_matrix(self.adjacency_matrix.adj_matrix_numeric)
+                                self.update_qaoa_circuit()
                                 self.circ_viz_dirty = True
                                 if self.adjacency_matrix.adj_matrix_graph_dirty:
                                     self.network_graph.set_adj_matrix(self.adjacency_matrix.adj_matrix_numeric)
@@ -359,176 +362,447 @@ class VQEPlayground():
                         if self.optimize_button.get_enabled():
                             self.optimize_button.set_enabled(False)
                             self.optimization_desired = True
+                    elif self.replay is not None:
+                        self.handle_replay_key(event.key)
 
-            if self.optimization_desired:
-                if self.cur_optimization_epoch < NUM_OPTIMIZATION_EPOCHS:
-                    if not self.optimization_initialized:
-                        self.expectation_grid.draw_expectation_grid()
-                        rotation_gate_nodes = self.circuit_grid_model.get_rotation_gate_nodes()
-
-                        self.optimized_rotations = np.full(len(rotation_gate_nodes), np.pi)
-                        self.cur_optimization_epoch = 0
-                        self.cur_rotation_num = 0
-
-                        rotation_bounds = np.zeros((len(rotation_gate_nodes), 2))
-
-                        self.optimization_initialized = True
-
-                    self.optimize_rotations(self.expectation_value_objective_function,
-                                            self.circuit_grid, self.expectation_grid, rotation_gate_nodes)
-
-                    # print('opt_rotations: ', self.optimized_rotations)
-
-                    cost, basis_state_str = self.expectation_grid.calc_expectation_value()
-                    print('cost: ', cost, 'basis_state_str: ', basis_state_str)
-
-                    solution = np.zeros(NUM_STATE_DIMS)
-                    for idx, char in enumerate(basis_state_str):
-                        solution[idx] = int(char)
+            self.step_replay(elapsed_ms / 1000.0)
+            self.step_optimization()
+            self.refresh_basis_state()
 
-                    # TODO: Uncomment to update display more often?
-                    # self.network_graph.set_solution(solution)
+            # The network graph is drawn on the render pool, so show it whenever a render arrives
+            if self.network_graph.receive_render() and not self.circ_viz_dirty:
+                self.draw_all()
+                pygame.display.flip()
 
-                else:
-                    self.optimization_initialized = False
-                    self.optimization_desired = False
-                    self.cur_optimization_epoch = 0
-                    self.optimize_button.set_enabled(True)
-
-                    # Select top-left node in circuit, regardless of gate type
-                    self.circuit_grid.highlight_selected_node(0, 0)
+            if self.circ_viz_dirty:
+                self.update_circ_viz()
+                self.circ_viz_dirty = False
 
-                    self.circ_viz_dirty = True
-                    print("Finished")
-                    # self.network_graph.set_solution(solution)
+            if report_surfaces:
+                num_allocations = take_surface_allocations()
+                if num_allocations:
+                    print('Frame', frame_num, 'allocated', num_allocations, 'surfaces')
 
-            if self.expectation_grid.basis_state_dirty:
-                cost, basis_state_str = self.expectation_grid.calc_expectation_value()
+        self.save_checkpoint()
+        self.close_trace()
+        shutdown_render_pool()
+        shutdown_trajectory_executor()
+        pygame.quit()
 
-                solution = np.zeros(NUM_STATE_DIMS)
-                for idx, char in enumerate(basis_state_str):
-                    solution[idx] = int(char)
+    def init_display(self):
+        pygame.init()
 
-                self.network_graph.set_solution(solution)
+        self.background = pygame.Surface(self.screen.get_size())
+        self.background = self.background.convert()
+        self.background.fill(WHITE)
 
-                self.circ_viz_dirty = True
-                self.expectation_grid.basis_state_dirty = False
+        pygame.font.init()
 
-            if self.circ_viz_dirty:
-                self.update_circ_viz()
-                self.circ_viz_dirty = False
+        pygame.display.set_caption('VQE Playground')
 
-        pygame.quit()
+        self.screen.blit(self.background, (0, 0))
+        pygame.display.flip()
 
-    def optimize_rotations(self, objective_function, circuit_grid, expectation_grid, rotation_gate_nodes):
+    def create_components(self, adj_matrix):
+        self.circuit_grid_model = self.ansatz.build_model(max_wires=NUM_QUBITS)
+        self.circuit_grid_model.noise_model = self.noise_model
+        # Simulated with NumPy, so the first frame doesn't wait for Qiskit to import
+        statevector = simulate_statevector(self.circuit_grid_model.gate_table(), self.circuit_grid_model.max_wires)
 
-        move_radians = np.pi / 8
+        # The adjacency matrix control edits its matrix in place, so give it a copy
+        self.adjacency_matrix = AdjacencyMatrix(950, 10, np.array(adj_matrix))
+        self.expectation_grid = ExpectationGrid(statevector,
+                                                self.adjacency_matrix.adj_matrix_numeric)
 
-        # For each rotation this will be either 1 or -1, signifying direction of movement
-        unit_direction_array = np.ones(len(self.optimized_rotations))
+        self.network_graph = NetworkGraph(self.adjacency_matrix.adj_matrix_numeric)
+        self.optimize_button = Button("Optimize", 150, 40)
 
-        self.min_distance = objective_function(circuit_grid, expectation_grid, rotation_gate_nodes)
+        self.top_sprites = HBox(50, 20, self.network_graph, self.optimize_button)
+        self.right_sprites = VBox(1010, 0, self.expectation_grid)
 
-        # print('self.cur_optimization_epoch: ', self.cur_optimization_epoch)
-        # print('self.cur_rotation_num: ', self.cur_rotation_num)
-        if self.cur_optimization_epoch < NUM_OPTIMIZATION_EPOCHS:
-            if self.cur_rotation_num < len(self.optimized_rotations):
-                if not self.rotation_initialized:
-                    self.cur_ang_rad = self.optimized_rotations[self.cur_rotation_num]
-                    self.proposed_cur_ang_rad = self.cur_ang_rad
+        self.circuit_grid = CircuitGrid(10, 540, self.circuit_grid_model)
+        self.update_qaoa_circuit()
+        self.show_noise_estimate()
 
-                    # Highlight gate being operated on
-                    cur_wire_num = rotation_gate_nodes[self.cur_rotation_num].wire_num
-                    cur_column_num = rotation_gate_nodes[self.cur_rotation_num].column_num
-                    self.circuit_grid.highlight_selected_node(cur_wire_num, cur_column_num)
-                    if self.frequent_viz_update:
-                        self.circ_viz_dirty = True
+    def draw_all(self):
+        self.screen.blit(self.background, (0, 0))
+        self.top_sprites.draw(self.screen)
+        self.right_sprites.draw(self.screen)
+        self.circuit_grid.draw(self.screen)
+        self.adjacency_matrix.draw(self.screen)
 
-                    self.rotation_initialized = True
-
-                    # Decide whether to increase or decrease angle
-                    unit_direction_array[self.cur_rotation_num] = 1
-                    if self.cur_ang_rad > np.pi:
-                        unit_direction_array[self.cur_rotation_num] = -1
-                    self.proposed_cur_ang_rad += move_radians * unit_direction_array[self.cur_rotation_num]
-                    if 0.0 <= self.proposed_cur_ang_rad < np.pi * 2 + 0.01:
-                        self.optimized_rotations[self.cur_rotation_num] = self.proposed_cur_ang_rad
-
-                        temp_distance = objective_function(circuit_grid, expectation_grid, rotation_gate_nodes)
-                        if temp_distance > self.min_distance:
-                            # Moving in the wrong direction so restore the angle in the array and switch direction
-                            self.optimized_rotations[self.cur_rotation_num] = self.cur_ang_rad
-                            unit_direction_array[self.cur_rotation_num] *= -1
-                        else:
-                            # Moving in the right direction so use the proposed angle
-                            self.cur_ang_rad = self.proposed_cur_ang_rad
-                            self.min_distance = temp_distance
-
-                        self.finished_rotating = False
-                        self.rotation_iterations = 0
-
-                elif self.rotation_initialized and not self.finished_rotating:
-                    self.rotation_iterations += 1
-                    self.proposed_cur_ang_rad += move_radians * unit_direction_array[self.cur_rotation_num]
-                    if 0.0 <= self.proposed_cur_ang_rad <= np.pi * 2 + 0.01:
-                        self.optimized_rotations[self.cur_rotation_num] = self.proposed_cur_ang_rad
-                        temp_distance = objective_function(circuit_grid, expectation_grid, rotation_gate_nodes)
-
-                        if temp_distance >= self.min_distance: # TODO: Better?
-                        # if temp_distance > self.min_distance:
-                            # Distance is increasing so restore the angle in the array and leave the loop
-                            self.optimized_rotations[self.cur_rotation_num] = self.cur_ang_rad
-                            self.finished_rotating = True
-                            self.cur_rotation_num += 1
-                            self.rotation_initialized = False
-                        elif self.rotation_iterations > np.pi * 2 / move_radians:
-                            print("Unexpected: self.rotation_iterations: ",  self.rotation_iterations)
-                            self.finished_rotating = True
-                            self.cur_rotation_num += 1
-                            self.rotation_initialized = False
-                        else:
-                            # Distance is not increasing, so use the proposed angle
-                            self.cur_ang_rad = self.proposed_cur_ang_rad
-                            self.min_distance = temp_distance
-                            if self.frequent_viz_update:
-                                self.circ_viz_dirty = True
-                    else:
-                        self.finished_rotating = True
-                        self.cur_rotation_num += 1
-                        self.rotation_initialized = False
+    def set_adj_matrix(self, adj_matrix):
+        """Load a whole adjacency matrix, as if each element had been edited"""
+        self.adjacency_matrix.set_adj_matrix(adj_matrix)
+        self.expectation_grid.set_adj_matrix(self.adjacency_matrix.adj_matrix_numeric)
+        self.network_graph.set_adj_matrix(self.adjacency_matrix.adj_matrix_numeric)
+        self.update_qaoa_circuit()
+        self.adjacency_matrix.adj_matrix_graph_dirty = False
+        self.expectation_grid.basis_state_dirty = True
+        self.circ_viz_dirty = True
+
+    def set_rotations(self, rotations):
+        """Set the angle of every rotation gate, in get_rotation_gate_nodes() order"""
+        for node, radians in zip(self.circuit_grid_model.get_rotation_gate_nodes(), rotations):
+            node.radians = radians
+            self.circuit_grid_model.set_node(node.wire_num, node.column_num, node)
+        self.circuit_grid.update()
+        self.expectation_grid.set_circuit(self.circuit_grid_model.compute_circuit())
+        self.show_noise_estimate()
+        self.circ_viz_dirty = True
+
+    def step_optimization(self):
+        """Advance the optimization by one step, if one has been requested"""
+        if self.optimization_desired:
+            if not self.optimization_initialized:
+                self.expectation_grid.draw_expectation_grid()
+                self.rotation_gate_nodes = self.circuit_grid_model.get_rotation_gate_nodes()
+                self.structure_hash = self.circuit_grid_model.structure_hash()
+                if self.circuit_grid_model.noise_model is not None:
+                    self.structure_hash += self.circuit_grid_model.noise_model.fingerprint()
+                if self.cvar is not None:
+                    self.structure_hash += self.cvar.fingerprint()
+                    self.cvar_estimate = self.cvar.estimator(self.expectation_grid.eigenvalues)
+                self.optimizer = self.create_optimizer()
+                self.optimizer_steps = self.optimizer.steps(self.rotations_objective)
+                self.next_viz_refresh = time.perf_counter()
+                if self.trace is not None:
+                    adj_matrix = self.adjacency_matrix.adj_matrix_numeric
+                    self.trace.start_run(ansatz=str(self.ansatz), structure=self.structure_hash,
+                                         adjacency=adjacency_hash(adj_matrix), adj_matrix=adj_matrix.tolist())
+                self.optimized_rotations = self.optimizer.state.rotations
+
+                self.optimization_initialized = True
+
+            if not self.optimizer.finished:
+                # Make as many moves as fit in this frame's budget, then show where the search is
+                deadline = time.perf_counter() + self.frame_budget_ms / 1000.0
+                for state in self.optimizer_steps:
+                    if self.checkpoint is not None and self.optimizer.resumable:
+                        self.checkpoint.maybe_save(state)
+                    if time.perf_counter() >= deadline:
+                        break
+
+                if self.frequent_viz_update and time.perf_counter() >= self.next_viz_refresh:
+                    self.next_viz_refresh = time.perf_counter() + 1.0 / self.viz_refresh_hz
+                    self.refresh_optimization_display()
 
-                # self.cur_rotation_num += 1
             else:
-                self.cur_rotation_num = 0
-                self.cur_optimization_epoch += 1
-                # print('self.min_distance: ', self.min_distance)
-
-            objective_function(circuit_grid, expectation_grid, rotation_gate_nodes)
-            # print('exp_val: ', expectation_grid.calc_expectation_value())
+                self.refresh_optimization_display()
+                self.optimization_initialized = False
+                self.optimization_desired = False
+                self.optimizer_steps = None
+                self.optimize_button.set_enabled(True)
+                self.save_checkpoint()
+                self.store_result()
+                if self.warm_starts is not None:
+                    self.warm_starts.put(self.results_cache_config()[0], self.adjacency_matrix.adj_matrix_numeric,
+                                         self.optimizer.state.rotations)
+
+                # Select top-left node in circuit, regardless of gate type
+                self.circuit_grid.highlight_selected_node(0, 0)
 
+                self.circ_viz_dirty = True
+                if self.optimizer.reached_target:
+                    # The exact solver says no better state exists
+                    print('Reached the optimal cut of', self.expectation_grid.optimal_solution.cut_value)
+                print('Stopped by', self.optimizer.stop_reason, 'after', self.optimizer.state.num_evaluations,
+                      'evaluations')
+                print("Finished, objective cache: ", self.objective_cache.stats())
+                # self.network_graph.set_solution(solution)
+
+    def refresh_optimization_display(self):
+        """Highlight the gate being optimized and show the best rotations found so far"""
+        state = self.optimizer.state
+        if state.rotation_num < len(state.rotations):
+            rotation_idx = state.rotation_num
+            if isinstance(self.ansatz, QAOATemplate):
+                rotation_idx = self.ansatz.rotation_index_for_parameter(rotation_idx)
+            node = self.rotation_gate_nodes[rotation_idx]
+            self.circuit_grid.highlight_selected_node(node.wire_num, node.column_num)
+
+        # Evaluations may have left a rejected move on display, so show the current rotations
+        self.optimized_rotations = state.rotations
+        self.apply_optimized_rotations(self.circuit_grid, self.expectation_grid, self.rotation_gate_nodes,
+                                       draw=True)
+        self.circ_viz_dirty = True
+
+        if not self.headless:
+            # Headless batches render thousands of instances, so only the window reports progress
+            cost, basis_state_str = self.expectation_grid.calc_expectation_value()
+            print('cost: ', cost, 'basis_state_str: ', basis_state_str)
+
+    def create_optimizer(self):
+        """Reuse a cached result for this graph and circuit, or resume from a checkpoint
+        of them if there is one, otherwise start from the angles found for a similar
+        graph, or afresh"""
+        if self.optimizer is not None:
+            # An optimization may have been abandoned part way, e.g. by editing the graph
+            self.optimizer.close()
+        adj_matrix = self.adjacency_matrix.adj_matrix_numeric
+        if self.results_cache is not None:
+            cached = self.results_cache.get(adj_matrix, *self.results_cache_config())
+            if cached is not None:
+                print('Reusing cached result from', self.results_cache.path, ':', cached)
+                # No epochs left to run, so the optimizer finishes with the cached rotations
+                optimizer = SteppingOptimizer(cached['rotations'], 0,
+                                              target_cost=self.expectation_grid.lowest_eigenvalue,
+                                              target_tolerance=OPTIMUM_TOLERANCE)
+                optimizer.state.min_cost = cached['cost']
+                optimizer.stop_reason = 'cached'
+                return optimizer
+
+        gate_table = self.circuit_grid_model.gate_table()
+        stop_criteria = self.stop_criteria.for_problem(self.expectation_grid.eigenvalues,
+                                                       self.expectation_grid.lowest_eigenvalue)
+        state = None
+        if self.checkpoint is not None and self.optimizer_name == 'stepping':
+            state = load_matching_checkpoint(self.checkpoint.path, adj_matrix, gate_table, self.cvar, self.symmetry)
+        if state is not None:
+            print('Resuming optimization from', self.checkpoint.path, ':', state)
+            return SteppingOptimizer(state=state, stop_criteria=stop_criteria)
+
+        initial_parameters = self.initial_parameters()
+        self.warm_started = False
+        if self.warm_starts is not None:
+            initial_parameters, self.warm_started = choose_start(
+                self.start_cost, self.warm_starts.get(self.results_cache_config()[0], adj_matrix),
+                initial_parameters)
+        if self.warm_started:
+            print('Starting from the rotations found for a similar graph')
+
+        optimizer = make_optimizer(self.optimizer_name, initial_parameters, self.num_epochs,
+                                   target_cost=self.expectation_grid.lowest_eigenvalue,
+                                   target_tolerance=OPTIMUM_TOLERANCE, stop_criteria=stop_criteria)
+        optimizer.state.set_problem(adj_matrix, gate_table, self.cvar, self.symmetry)
+        return optimizer
+
+    def start_cost(self, params):
+        """Ideal expectation value of a parameter vector, simulated without touching the display"""
+        eigenvalues = self.expectation_grid.eigenvalues
+        if isinstance(self.ansatz, QAOATemplate):
+            state = qaoa_statevector(eigenvalues, params)
+        else:
+            model = self.circuit_grid_model
+            state = simulate_statevector(model.gate_table(), model.max_wires, params)
+        return float(np.dot(eigenvalues, np.abs(state) ** 2))
+
+    def results_cache_config(self):
+        # Circuits may have been edited by hand, so they are described by their structure
+        structure = None if isinstance(self.ansatz, QAOATemplate) else self.structure_hash
+        return solve_config(self.ansatz, self.num_epochs, structure, self.initial_parameters(), self.optimizer_name,
+                            stop_criteria=self.stop_criteria, cvar=self.cvar, symmetry=self.symmetry)
+
+    def store_result(self):
+        """Add a finished optimization to the results cache, unless it came from there.
+        Warm-started results aren't stored either, as the key describes the initial angles"""
+        state = self.optimizer.state
+        if self.results_cache is None or state.num_evaluations == 0 or self.warm_started:
+            return
+        adj_matrix = self.adjacency_matrix.adj_matrix_numeric
+        cost, basis_state_str = self.expectation_grid.calc_expectation_value()
+        config, permutation_invariant = self.results_cache_config()
+        self.results_cache.put(adj_matrix, config, {
+            'rotations': state.rotations,
+            'cost': state.min_cost,
+            'cut_value': cut_value(adj_matrix, basis_state_str),
+            'basis_state': basis_state_str,
+        }, permutation_invariant)
+
+    def initial_parameters(self):
+        if isinstance(self.ansatz, QAOATemplate):
+            return self.ansatz.initial_parameters()
+        return np.full(len(self.rotation_gate_nodes), np.pi)
+
+    def update_qaoa_circuit(self):
+        """Rebuild the QAOA circuit for the current graph, as its cost layer follows the edges"""
+        if isinstance(self.ansatz, QAOATemplate):
+            self.ansatz = self.ansatz.for_adj_matrix(self.adjacency_matrix.adj_matrix_numeric)
+            self.ansatz.populate_model(self.circuit_grid_model)
+            self.circuit_grid.update()
+            self.qaoa_parameters = self.ansatz.initial_parameters()
+            self.expectation_grid.set_statevector(
+                qaoa_statevector(self.expectation_grid.eigenvalues, self.qaoa_parameters))
+            self.circ_viz_dirty = True
+
+    def start_replay(self, replay):
+        """Play back a traced run instead of optimizing, on the graph it was recorded for"""
+        if 'adj_matrix' in replay.metadata:
+            self.set_adj_matrix(np.array(replay.metadata['adj_matrix']))
+        self.rotation_gate_nodes = self.circuit_grid_model.get_rotation_gate_nodes()
+        num_parameters = len(self.initial_parameters())
+        if replay.num_parameters != num_parameters:
+            raise ValueError('Traced run has ' + str(replay.num_parameters) +
+                             ' parameters, but the circuit has ' + str(num_parameters))
+        self.replay = replay
+        self.optimize_button.set_enabled(False)
+        self.step_replay(0.0)
+
+    def step_replay(self, seconds):
+        """Advance the replay, if there is one, showing the frame it reaches"""
+        if self.replay is not None:
+            self.replay.advance(seconds)
+            frame = self.replay.next_frame()
+            if frame is not None:
+                self.show_replay_frame(frame)
+
+    def show_replay_frame(self, frame):
+        """Show the gate angles and probabilities of a recorded evaluation, without simulating"""
+        rotations = frame.params
+        if isinstance(self.ansatz, QAOATemplate):
+            rotations = self.ansatz.parameters_to_rotations(frame.params)
+        for node, radians in zip(self.rotation_gate_nodes, rotations):
+            self.circuit_grid.rotate_gate_absolute(node, radians)
+        self.expectation_grid.set_probabilities(frame.probabilities)
+        self.circ_viz_dirty = True
+
+    def handle_replay_key(self, key):
+        if key == K_SPACE:
+            self.replay.toggle_paused()
+        elif key == K_EQUALS:
+            self.replay.set_speed(self.replay.speed * 2)
+        elif key == K_MINUS:
+            self.replay.set_speed(self.replay.speed / 2)
+        elif key == K_PAGEUP:
+            self.replay.seek(self.replay.position - REPLAY_SEEK_FRACTION * self.replay.num_frames)
+        elif key == K_PAGEDOWN:
+            self.replay.seek(self.replay.position + REPLAY_SEEK_FRACTION * self.replay.num_frames)
+        elif key == K_HOME:
+            self.replay.seek(0)
+        elif key == K_END:
+            self.replay.seek_fraction(1.0)
+        else:
+            return
+        print(self.replay)
+
+    def close_trace(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    def save_checkpoint(self):
+        if self.checkpoint is not None and self.optimizer is not None and self.optimizer.resumable:
+            self.checkpoint.save(self.optimizer.state)
+
+    def refresh_basis_state(self):
+        """Show the most probable basis state as a cut on the network graph"""
+        if self.expectation_grid.basis_state_dirty:
+            cost, basis_state_str = self.expectation_grid.calc_expectation_value()
+
+            solution = np.zeros(NUM_STATE_DIMS)
+            for idx, char in enumerate(basis_state_str):
+                solution[idx] = int(char)
+
+            self.network_graph.set_solution(solution)
+
+            self.circ_viz_dirty = True
+            self.expectation_grid.basis_state_dirty = False
+
+    def rotations_objective(self, rotations):
+        self.optimized_rotations = rotations
+        return self.expectation_value_objective_function(self.circuit_grid, self.expectation_grid,
+                                                         self.rotation_gate_nodes)
 
     def expectation_value_objective_function(self, circuit_grid,
                                              expectation_grid, rotation_gate_nodes):
+        # The stepping search revisits the same angles often, so only simulate on a cache miss.
+        # The most probable basis state is cached with the cost, for the optimizer's stop criteria
+        key = self.objective_cache.key(adjacency_hash(self.adjacency_matrix.adj_matrix_numeric),
+                                       self.structure_hash, self.optimized_rotations,
+                                       self.optimizer.quantized_angles)
+        cached = self.objective_cache.get(key)
+        if cached is None:
+            cost = self.apply_optimized_rotations(circuit_grid, expectation_grid, rotation_gate_nodes)
+            basis_state_idx = expectation_grid.cur_basis_state_idx
+            if self.cvar_estimate is not None:
+                # Sampled from the ideal state, while the grid keeps showing the expectation value
+                probs = np.absolute(expectation_grid.quantum_state) ** 2
+                cost = self.cvar_estimate(probs)
+                basis_state_idx = self.cvar.basis_state(expectation_grid.eigenvalues, probs)
+            self.objective_cache.put(key, (cost, basis_state_idx))
+            if self.trace is not None:
+                self.trace.record(self.optimized_rotations, cost, basis_state_idx,
+                                  np.absolute(expectation_grid.quantum_state) ** 2)
+        else:
+            cost, basis_state_idx = cached
+        if self.optimizer is not None:
+            self.optimizer.note_evaluation(self.optimized_rotations, basis_state_idx)
+        return cost
+
+    def apply_optimized_rotations(self, circuit_grid, expectation_grid, rotation_gate_nodes, draw=False):
+        """Rotate the gates to optimized_rotations and simulate, returning the expectation value.
+
+        In QAOA mode optimized_rotations holds the gammas and betas, which are
+        spread over the gates for display while the state comes from the fast path.
+        Objective evaluations only write the angles to the model and simulate;
+        with draw, the circuit and expectation grids are redrawn as well.
+        """
+        rotations = self.optimized_rotations
+        if isinstance(self.ansatz, QAOATemplate):
+            rotations = self.ansatz.parameters_to_rotations(self.optimized_rotations)
         for idx in range(len(rotation_gate_nodes)):
-            circuit_grid.rotate_gate_absolute(rotation_gate_nodes[idx], self.optimized_rotations[idx])
-        expectation_grid.set_circuit(circuit_grid.circuit_grid_model.compute_circuit())
+            circuit_grid.rotate_gate_absolute(rotation_gate_nodes[idx], rotations[idx], redraw=False)
+        model = circuit_grid.circuit_grid_model
+        if isinstance(self.ansatz, QAOATemplate):
+            self.qaoa_parameters = np.array(self.optimized_rotations, dtype=float)
+            expectation_grid.set_statevector(qaoa_statevector(expectation_grid.eigenvalues, self.qaoa_parameters),
+                                             draw=draw)
+        else:
+            # The circuit for this structure is built and transpiled once, then only rebound
+            gate_table, num_qubits, eigenvalues = self.simulated_problem()
+            statevector = parametric_statevector(gate_table, num_qubits)
+            reduced = num_qubits < model.max_wires
+            expectation_grid.set_statevector(expand_reduced(statevector) if reduced else statevector, draw=draw)
+            self.show_noise_estimate(draw)
+        if draw:
+            circuit_grid.update()
         cost, basis_state = expectation_grid.calc_expectation_value()
 
         # print("self.optimized_rotations: ", self.optimized_rotations, ", cost: ", cost, ", basis_state: ", basis_state)
         return cost
 
+    def simulated_problem(self):
+        """Gate table, qubit count and eigenvalues of the circuit as simulated.
+        With symmetry the idle last wire is left out, unless a gate has been put on it"""
+        model = self.circuit_grid_model
+        gate_table = model.gate_table()
+        num_qubits = model.max_wires
+        eigenvalues = self.expectation_grid.eigenvalues
+        if self.symmetry and wire_is_idle(gate_table, num_qubits - 1):
+            num_qubits -= 1
+            eigenvalues = eigenvalues[:2 ** num_qubits]
+        return gate_table, num_qubits, eigenvalues
+
+    def show_noise_estimate(self, draw=True):
+        """Show the expectation value estimated under the circuit's noise model, if it has one"""
+        noise_model = self.circuit_grid_model.noise_model
+        if noise_model is None or self.expectation_grid.hamiltonian is not None or \
+                isinstance(self.ansatz, QAOATemplate):
+            return
+        gate_table, num_qubits, eigenvalues = self.simulated_problem()
+        self.expectation_grid.set_noise_estimate(*noisy_expectation(gate_table, num_qubits, eigenvalues,
+                                                                    noise_model), draw=draw)
+
+    def show_circuit_state(self):
+        """Simulate the circuit on display into the expectation grid"""
+        if isinstance(self.ansatz, QAOATemplate):
+            # The drawn circuit compiles a gamma of exactly 0 as a Pauli Z, so it isn't simulated.
+            # The state on display comes from the fast path, as during optimization
+            self.expectation_grid.set_statevector(
+                qaoa_statevector(self.expectation_grid.eigenvalues, self.qaoa_parameters))
+        else:
+            circuit = self.circuit_grid_model.compute_circuit()
+            self.expectation_grid.set_circuit(circuit)
+            self.show_noise_estimate()
+
     def update_circ_viz(self):
         # print("in update_circ_viz")
-        self.screen.blit(self.background, (0, 0))
-        circuit = self.circuit_grid_model.compute_circuit()
-        self.expectation_grid.set_circuit(circuit)
+        if self.replay is None:
+            self.show_circuit_state()
         self.top_sprites.arrange()
         self.right_sprites.arrange()
-        self.top_sprites.draw(self.screen)
-        self.right_sprites.draw(self.screen)
         self.adjacency_matrix.arrange()
-        self.adjacency_matrix.draw(self.screen)
-        self.circuit_grid.draw(self.screen)
+        self.draw_all()
         pygame.display.flip()
 
     def move_update_circuit_grid_display(self, direction):